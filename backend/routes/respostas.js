@@ -9,6 +9,7 @@ const { promisify } = require('util');
 const { authenticateToken } = require('../middleware/auth');
 const { generateUUID } = require('../db');
 const { garantirDisciplinaQuestao } = require('../utils/disciplinaClassifier');
+const { executarNoWorker } = require('../utils/pythonWorkerPool');
 
 const execAsync = promisify(exec);
 
@@ -526,55 +527,24 @@ router.delete('/:id', async (req, res) => {
 });
 
 /**
- * Função auxiliar para detectar o tipo de imagem (processada ou original)
+ * Função auxiliar para executar o script de processamento
+ * Usa o pool de workers persistentes e recorre ao script avulso se o pool estiver indisponível
  */
-async function detectarTipoImagem(imagemPath) {
-  const scriptDetecao = path.join(__dirname, '../scripts/detectar_tipo_imagem.py');
-
-  if (!fs.existsSync(scriptDetecao)) {
-    console.log('[PROCESSAR-IMAGEM] Script de detecção não encontrado, usando script original por padrão');
-    return 'original'; // Fallback: assume que precisa de processamento
-  }
-
+async function executarScriptProcessamento(scriptPath, imagemPath, modo) {
   try {
-    const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
-    const scriptPathNormalizado = path.resolve(scriptDetecao).replace(/\\/g, '/');
-    const imagemPathNormalizado = path.resolve(imagemPath).replace(/\\/g, '/');
-
-    const comando = `${pythonCommand} "${scriptPathNormalizado}" "${imagemPathNormalizado}"`;
-
-    const { stdout, stderr } = await execAsync(comando, {
-      maxBuffer: 10 * 1024 * 1024,
-      encoding: 'utf8'
-    });
-
-    if (stderr && stderr.trim()) {
-      console.log('[PROCESSAR-IMAGEM] Stderr da detecção:', stderr);
-    }
-
-    // Parsear JSON retornado
-    const jsonMatch = stdout.match(/\{[\s\S]*\}/);
-    if (jsonMatch) {
-      const resultado = JSON.parse(jsonMatch[0]);
-      if (resultado.sucesso && resultado.tipo) {
-        console.log(`[PROCESSAR-IMAGEM] Imagem detectada como: ${resultado.tipo}`);
-        return resultado.tipo;
-      }
-    }
-
-    console.log('[PROCESSAR-IMAGEM] Detecção falhou, usando script original por padrão');
-    return 'original'; // Fallback
-  } catch (error) {
-    console.error('[PROCESSAR-IMAGEM] Erro ao detectar tipo de imagem:', error.message);
-    console.log('[PROCESSAR-IMAGEM] Usando script original por padrão');
-    return 'original'; // Fallback: em caso de erro, usa o script completo
+    const resultadoWorker = await executarNoWorker(modo, imagemPath);
+    if (!resultadoWorker.sucesso) {
+      throw new Error(resultadoWorker.erro || 'Erro no processamento Python');
+    }
+    console.log(`[PROCESSAR-IMAGEM] Processado pelo worker em ${resultadoWorker.tempo_ms}ms`);
+    return resultadoWorker;
+  } catch (workerError) {
+    // Só falhas do pool (worker ausente/morto) caem para o script avulso; um job que
+    // excedeu o tempo não é reprocessado, para a mesma imagem não custar o timeout duas vezes
+    if (!workerError.erroWorker) throw workerError;
+    console.log('[PROCESSAR-IMAGEM] Worker indisponível, executando script diretamente:', workerError.message);
   }
-}
 
-/**
- * Função auxiliar para executar o script de processamento
- */
-async function executarScriptProcessamento(scriptPath, imagemPath) {
   const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
   const scriptPathNormalizado = path.resolve(scriptPath).replace(/\\/g, '/');
   const imagemPathNormalizado = path.resolve(imagemPath).replace(/\\/g, '/');
@@ -611,9 +581,11 @@ async function executarScriptProcessamento(scriptPath, imagemPath) {
  * Processa uma imagem de folha de resposta e extrai as marcações
  * 
  * A imagem é salva TEMPORARIAMENTE até que a correção seja finalizada.
- * A detecção automática decide qual script usar:
+ * processar_respostas_auto.py classifica a imagem e usa o leitor correspondente
+ * na mesma chamada (reaproveitando as detecções YOLO nas folhas ENEM):
  * - processar_respostas_Imagem_original.py: para imagens que precisam de correção de perspectiva
  * - processar_respostas_imagem_processadas.py: para imagens já processadas
+ * - processar_respostas_enem_mobile.py: para folhas ENEM (enem_completo/enem_recorte)
  */
 router.post('/processar-imagem', uploadImagemTemp.single('imagem'), async (req, res) => {
   try {
@@ -627,40 +599,26 @@ router.post('/processar-imagem', uploadImagemTemp.single('imagem'), async (req,
     const imagemPath = req.file.path;
     const imagemFilename = req.file.filename;
 
-    // 1. Detectar o tipo de imagem (processada, original, enem_completo, enem_recorte)
-    console.log('[PROCESSAR-IMAGEM] Detectando tipo de imagem...');
-    const tipoImagem = await detectarTipoImagem(imagemPath);
-
-    // 2. Escolher o script apropriado baseado na detecção
-    let scriptPath;
-    let isEnem = false;
-
-    if (tipoImagem === 'enem_completo' || tipoImagem === 'enem_recorte') {
-      // Folha ENEM detectada - usar script ENEM mobile
-      scriptPath = path.join(__dirname, '../scripts/processar_respostas_enem_mobile.py');
-      console.log(`[PROCESSAR-IMAGEM] Folha ENEM detectada (${tipoImagem}). Usando script ENEM mobile.`);
-      isEnem = true;
-    } else if (tipoImagem === 'processada') {
-      scriptPath = path.join(__dirname, '../scripts/processar_respostas_imagem_processadas.py');
-      console.log('[PROCESSAR-IMAGEM] Usando script para imagens processadas');
-    } else {
-      scriptPath = path.join(__dirname, '../scripts/processar_respostas_Imagem_original.py');
-      console.log('[PROCESSAR-IMAGEM] Usando script para imagens originais (com correção de perspectiva)');
-    }
-
-    // 3. Verificar se o script existe
+    // 1. Classificar (enem_completo, enem_recorte, processada, original) e processar
+    //    em uma única chamada: uma decodificação e no máximo uma inferência YOLO
+    const scriptPath = path.join(__dirname, '../scripts/processar_respostas_auto.py');
     if (!fs.existsSync(scriptPath)) {
       throw new Error(`Script de processamento Python não encontrado em: ${scriptPath}`);
     }
 
     let respostasExtraidas = [];
     let detalhesProcessamento = {};
+    let resultadoPython;
+    let tipoImagem;
 
     try {
-      // 4. Executar o script de processamento apropriado
-      const resultadoPython = await executarScriptProcessamento(scriptPath, imagemPath);
+      // 2. Executar a classificação + processamento
+      console.log('[PROCESSAR-IMAGEM] Classificando e processando imagem...');
+      resultadoPython = await executarScriptProcessamento(scriptPath, imagemPath, 'auto');
+      tipoImagem = resultadoPython.tipo_imagem;
+      console.log(`[PROCESSAR-IMAGEM] Imagem detectada como: ${tipoImagem} (${resultadoPython.script_utilizado})`);
 
-      // 5. Extrair respostas do formato retornado
+      // 3. Extrair respostas do formato retornado
       respostasExtraidas = resultadoPython.respostas || [];
       detalhesProcessamento = {
         total_bolhas_detectadas: resultadoPython.total_bolhas_detectadas || 0,
@@ -670,7 +628,7 @@ router.post('/processar-imagem', uploadImagemTemp.single('imagem'), async (req,
         questoes_invalidas_detalhes: resultadoPython.questoes_invalidas_detalhes || [],
         avisos: resultadoPython.avisos || [],
         tipo_imagem_detectado: tipoImagem,
-        script_utilizado: tipoImagem === 'processada' ? 'processar_respostas_imagem_processadas.py' : 'processar_respostas_Imagem_original.py'
+        script_utilizado: resultadoPython.script_utilizado
       };
 
     } catch (execError) {
@@ -719,6 +677,7 @@ router.post('/processar-imagem', uploadImagemTemp.single('imagem'), async (req,
     };
 
     // Adicionar informações específicas ENEM se for folha ENEM
+    const isEnem = tipoImagem === 'enem_completo' || tipoImagem === 'enem_recorte';
     if (isEnem && resultadoPython.dia_detectado) {
       response.dia_detectado = resultadoPython.dia_detectado;
       response.questao_inicial = resultadoPython.questao_inicial;
@@ -888,8 +847,11 @@ router.post('/processar-frame-mobile', uploadImagemTemp.single('frame'), async (
 
       // Chamar endpoint de Live Detection
       console.log('[FRAME-MOBILE] Chamando Gradio /detect...');
+      // cliente_id identifica a sessão de câmera: frames sem movimento reaproveitam a última detecção
       const result = await client.predict("/detect", {
-        image: imageBlob
+        image: imageBlob,
+        debug: false,
+        cliente_id: req.body.cliente_id || ''
       });
 
       console.log('[FRAME-MOBILE] Resposta Gradio:', JSON.stringify(result, null, 2));
@@ -918,7 +880,8 @@ router.post('/processar-frame-mobile', uploadImagemTemp.single('frame'), async (
         detectado: data.detectado || false,
         rois: data.rois || {},
         feedback: feedback,
-        total_deteccoes: data.total_deteccoes || 0
+        total_deteccoes: data.total_deteccoes || 0,
+        ao_vivo: data.ao_vivo || null
       });
 
     } catch (apiError) {
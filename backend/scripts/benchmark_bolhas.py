@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark da leitura de bolhas (processar_bolhas_answer_area) em uma answer_area
+ENEM sintética de 90 questões (3 colunas x 30 questões x 5 alternativas).
+
+Compara o cálculo de preenchimento antigo (máscara do tamanho da imagem por
+contorno) com o cálculo local ao bounding box, conferindo que as respostas
+são idênticas.
+
+Uso: python benchmark_bolhas.py [largura_px] [iteracoes]
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+# O detector YOLO/OCR fica em huggingface-space/ quando rodando a partir do repositório
+sys.path.append(str(Path(__file__).resolve().parents[2] / "huggingface-space"))
+
+import leitor_bolhas
+import processar_respostas_enem_mobile as enem_mobile
+from gerador_folhas import gerar_answer_area
+
+
+def proporcao_preenchimento_imagem_inteira(mascara, contorno):
+    """Implementação anterior (O(pixels) por contorno), mantida apenas como referência"""
+    mascara_local = np.zeros_like(mascara)
+    cv2.drawContours(mascara_local, [contorno], -1, 255, -1)
+    pixels_brancos = np.sum(mascara[mascara_local == 255] == 255)
+    total_pixels = np.sum(mascara_local == 255)
+    if total_pixels == 0:
+        return None
+    return pixels_brancos / total_pixels
+
+
+def cronometrar(imagem, iteracoes):
+    tempos = []
+    resultado = None
+    for _ in range(iteracoes):
+        inicio = time.perf_counter()
+        resultado = enem_mobile.processar_bolhas_answer_area(imagem)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return resultado, {
+        'p50_ms': round(tempos[len(tempos) // 2], 2),
+        'min_ms': round(tempos[0], 2)
+    }
+
+
+if __name__ == "__main__":
+    largura = int(sys.argv[1]) if len(sys.argv) > 1 else 1800
+    iteracoes = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    imagem, gabarito = gerar_answer_area(largura)
+
+    funcao_atual = leitor_bolhas.calcular_proporcao_preenchimento
+    leitor_bolhas.calcular_proporcao_preenchimento = proporcao_preenchimento_imagem_inteira
+    resultado_antes, antes = cronometrar(imagem, iteracoes)
+    leitor_bolhas.calcular_proporcao_preenchimento = funcao_atual
+    resultado_depois, depois = cronometrar(imagem, iteracoes)
+
+    lidas = [r['Resposta'] for r in resultado_depois['respostas']]
+    print(json.dumps({
+        'resolucao': list(imagem.shape[1::-1]),
+        'iteracoes': iteracoes,
+        'respostas_identicas': resultado_antes['respostas'] == resultado_depois['respostas'],
+        'acertos_vs_gabarito_sintetico': sum(a == b for a, b in zip(lidas, gabarito)),
+        'mascara_imagem_inteira': antes,
+        'mascara_local_bbox': depois,
+        'speedup_p50': round(antes['p50_ms'] / max(depois['p50_ms'], 1e-6), 1)
+    }, ensure_ascii=False, indent=2))
@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark por etapa dos pipelines de correção sobre folhas sintéticas (gerador_folhas.py)
+
+Para cada cenário (resolução, rotação, inclinação, desfoque, ruído) mede as etapas
+de cada script com o mesmo código usado em produção:
+    enem_mobile:        decodificacao, yolo_letterbox, yolo_forward, yolo_nms, ocr, dia_rapido, bolhas, bolhas_grade
+    imagem_original:    decodificacao, retificacao, bolhas, bolhas_grade
+                        + retificacao_resolucao_total, bolhas_resolucao_total, bolhas_grade_resolucao_total
+                          (referência: warp na resolução nativa e filtragem antes de reduzir)
+    imagem_processadas: decodificacao, bolhas, bolhas_grade
+
+OCR e bolhas da folha ENEM rodam nas ROIs conhecidas do gerador, para que o tempo
+não dependa do modelo detectar a folha sintética. "ocr" mede só o Tesseract;
+"dia_rapido" mede o classificador de dia com modelos de folhas de outra semente. Etapas que não podem rodar no
+ambiente (modelo ausente, Tesseract não instalado) aparecem com "erro". As etapas de bolhas
+com sufixo informam em respostas_iguais se as respostas coincidem com as da etapa sem sufixo.
+
+A saída é JSON; passando um resultado anterior como referência, cada etapa
+recebe a variação percentual do p50.
+
+Uso: python benchmark_pipeline.py [iteracoes] [saida.json] [referencia.json]
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "huggingface-space"))
+
+from gerador_folhas import gerar_folha, contar_acertos
+from leitor_bolhas import ler_bolhas, LAYOUT_ENEM_90, LAYOUT_SIS_60
+from processar_respostas_Imagem_original import carregar_imagem, corrigir_perspectiva, retificar_documento
+import detector_yolo_enem as detector
+
+try:
+    from ocr_day_detector import detect_day_from_image, get_ocr_backend_info, classificar_dia_rapido, registrar_modelo_dia
+except ImportError as e:
+    _erro_ocr = str(e)
+
+    def classificar_dia_rapido(*args, **kwargs):
+        raise ImportError(_erro_ocr)
+
+    def registrar_modelo_dia(*args, **kwargs):
+        raise ImportError(_erro_ocr)
+
+    def get_ocr_backend_info():
+        return None
+
+    def detect_day_from_image(*args, **kwargs):
+        raise ImportError(_erro_ocr)
+
+CENARIOS = [
+    {'nome': 'enem_1080', 'tipo': 'enem', 'largura': 1080},
+    {'nome': 'enem_1080_rot4_incl', 'tipo': 'enem', 'largura': 1080, 'rotacao': 4, 'inclinacao': 0.04},
+    {'nome': 'enem_3000_ruido', 'tipo': 'enem', 'largura': 3000, 'desfoque': 1.5, 'ruido': 8},
+    {'nome': 'sis_1240', 'tipo': 'sis', 'largura': 1240},
+    {'nome': 'sis_1240_rot4_incl', 'tipo': 'sis', 'largura': 1240, 'rotacao': 4, 'inclinacao': 0.04},
+    {'nome': 'sis_3000_rot3_ruido', 'tipo': 'sis', 'largura': 3000, 'rotacao': -3, 'inclinacao': 0.03,
+     'desfoque': 1.5, 'ruido': 8},
+]
+
+
+class ErroEtapa(Exception):
+    """Etapa que não pôde ser medida; as etapas seguintes que dependem dela são puladas"""
+
+
+def cronometrar(funcao, iteracoes):
+    """
+    Executa funcao() uma vez para aquecimento e depois `iteracoes` vezes.
+
+    Returns:
+        tuple: (resultado da última execução, {p50_ms, p95_ms, media_ms, min_ms} ou {erro})
+    """
+    try:
+        resultado = funcao()
+    except Exception as e:
+        return None, {'erro': f"{type(e).__name__}: {e}"}
+
+    tempos = []
+    for _ in range(iteracoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+
+    return resultado, {
+        'p50_ms': round(float(np.percentile(tempos, 50)), 3),
+        'p95_ms': round(float(np.percentile(tempos, 95)), 3),
+        'media_ms': round(float(np.mean(tempos)), 3),
+        'min_ms': round(float(np.min(tempos)), 3)
+    }
+
+
+class Medicao:
+    """Acumula as etapas de um pipeline na ordem em que são medidas"""
+
+    def __init__(self, iteracoes):
+        self.iteracoes = iteracoes
+        self.etapas = {}
+        self.acertos = {}
+        self.respostas = {}
+
+    def etapa(self, nome, funcao):
+        resultado, estatisticas = cronometrar(funcao, self.iteracoes)
+        self.etapas[nome] = estatisticas
+        if 'erro' in estatisticas:
+            raise ErroEtapa(nome)
+        return resultado
+
+    def bolhas(self, imagem, layout, gabarito, sufixo=''):
+        for base, motor in (('bolhas', 'contornos'), ('bolhas_grade', 'grade')):
+            nome = base + sufixo
+            try:
+                resultado = self.etapa(nome, lambda: ler_bolhas(imagem, layout, motor))
+            except ErroEtapa:
+                continue
+            self.respostas[nome] = [r['Resposta'] for r in resultado['respostas']]
+            self.acertos[nome] = {'acertos': contar_acertos(resultado['respostas'], gabarito), 'total': len(gabarito)}
+            if sufixo and base in self.respostas:
+                self.acertos[nome]['respostas_iguais'] = self.respostas[nome] == self.respostas[base]
+
+    def resultado(self):
+        return {'etapas': self.etapas, 'acertos': self.acertos}
+
+
+def medir_enem_mobile(folha, caminho, iteracoes):
+    medicao = Medicao(iteracoes)
+    try:
+        imagem = medicao.etapa('decodificacao', lambda: detector.load_image_robust(caminho))
+
+        _, blob, escala, pad = medicao.etapa('yolo_letterbox', lambda: detector.preprocess_numpy_image(imagem))
+        try:
+            net = detector.load_model()
+        except Exception as e:
+            medicao.etapas['yolo_forward'] = {'erro': f"{type(e).__name__}: {e}"}
+        else:
+            def forward():
+                net.setInput(blob)
+                saida = net.forward()
+                return saida if isinstance(saida, (list, tuple)) else [saida]
+
+            try:
+                saidas = medicao.etapa('yolo_forward', forward)
+                medicao.etapa('yolo_nms', lambda: detector.montar_rois(
+                    detector.postprocess_detections(saidas, imagem.shape[:2], escala, pad)))
+            except ErroEtapa:
+                pass
+
+        x, y, w, h = folha['rois']['day_region']
+        day_region = imagem[y:y + h, x:x + w]
+
+        def ocr():
+            resultado = detect_day_from_image(day_region, classificador=False)
+            # Sem texto nenhum é falha do OCR (ex.: Tesseract ausente), não leitura errada
+            if not resultado.get('sucesso') and not resultado.get('texto_extraido'):
+                raise RuntimeError(resultado.get('erro'))
+            return resultado
+
+        try:
+            resultado_ocr = medicao.etapa('ocr', ocr)
+            medicao.acertos['ocr'] = {'dia_correto': resultado_ocr.get('dia') == folha['dia']}
+        except ErroEtapa:
+            pass
+
+        try:
+            dia_rapido, _ = medicao.etapa('dia_rapido', lambda: classificar_dia_rapido(day_region))
+            medicao.acertos['dia_rapido'] = {'dia_correto': dia_rapido == folha['dia'], 'classificado': dia_rapido is not None}
+        except ErroEtapa:
+            pass
+
+        x, y, w, h = folha['rois']['answer_area_enem']
+        medicao.bolhas(imagem[y:y + h, x:x + w], LAYOUT_ENEM_90, folha['gabarito'])
+    except ErroEtapa:
+        pass
+    return medicao.resultado()
+
+
+def medir_imagem_original(folha, caminho, iteracoes):
+    medicao = Medicao(iteracoes)
+    try:
+        imagem = medicao.etapa('decodificacao', lambda: carregar_imagem(caminho))
+        # Como em produção: warp direto para cinza na largura de trabalho do layout
+        retificada = medicao.etapa('retificacao', lambda: retificar_documento(
+            imagem, largura_saida=LAYOUT_SIS_60['largura_trabalho'], cinza=True)[0])
+        medicao.bolhas(retificada, LAYOUT_SIS_60, folha['gabarito'])
+
+        retificada = medicao.etapa('retificacao_resolucao_total', lambda: corrigir_perspectiva(imagem, salvar_debug=False))
+        medicao.bolhas(retificada, LAYOUT_SIS_60, folha['gabarito'], sufixo='_resolucao_total')
+    except ErroEtapa:
+        pass
+    return medicao.resultado()
+
+
+def medir_imagem_processadas(folha, caminho, iteracoes):
+    medicao = Medicao(iteracoes)
+    try:
+        imagem = medicao.etapa('decodificacao', lambda: carregar_imagem(caminho))
+        medicao.bolhas(imagem, LAYOUT_SIS_60, folha['gabarito'])
+    except ErroEtapa:
+        pass
+    return medicao.resultado()
+
+
+def treinar_classificador_dia():
+    """Modelos de "1º DIA" e "2º DIA" a partir de folhas limpas (semente diferente dos cenários)"""
+    for dia in (1, 2):
+        folha = gerar_folha('enem', 1240, dia=dia, seed=1000 + dia)
+        x, y, w, h = folha['rois']['day_region']
+        try:
+            registrar_modelo_dia(folha['imagem'][y:y + h, x:x + w], dia)
+        except ImportError:
+            return
+
+
+def executar(iteracoes=5, cenarios=CENARIOS):
+    resultados = {}
+    treinar_classificador_dia()
+    with tempfile.TemporaryDirectory() as pasta:
+        for cenario in cenarios:
+            parametros = {k: v for k, v in cenario.items() if k != 'nome'}
+            folha = gerar_folha(**parametros)
+            print(f"[BENCHMARK] {cenario['nome']} {folha['imagem'].shape[1]}x{folha['imagem'].shape[0]}", file=sys.stderr)
+
+            # Arquivos JPEG como chegam do upload (a decodificação faz parte da medição)
+            caminho_foto = os.path.join(pasta, f"{cenario['nome']}.jpg")
+            cv2.imwrite(caminho_foto, folha['imagem'], [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+            if folha['parametros']['tipo'] == 'enem':
+                pipelines = {'enem_mobile': medir_enem_mobile(folha, caminho_foto, iteracoes)}
+            else:
+                caminho_pagina = os.path.join(pasta, f"{cenario['nome']}_pagina.jpg")
+                cv2.imwrite(caminho_pagina, folha['pagina'], [cv2.IMWRITE_JPEG_QUALITY, 90])
+                pipelines = {
+                    'imagem_original': medir_imagem_original(folha, caminho_foto, iteracoes),
+                    'imagem_processadas': medir_imagem_processadas(folha, caminho_pagina, iteracoes)
+                }
+
+            resultados[cenario['nome']] = {'parametros': folha['parametros'], 'pipelines': pipelines}
+
+    return {
+        'versao': 1,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': {
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'opencv': cv2.__version__,
+            'numpy': np.__version__,
+            'opencv_threads': cv2.getNumThreads(),
+            'yolo_backend': detector.INFERENCE_BACKEND,
+            'yolo_modelo': Path(detector.MODEL_PATH).name,
+            'ocr_backend': get_ocr_backend_info()
+        },
+        'iteracoes': iteracoes,
+        'cenarios': resultados
+    }
+
+
+def comparar(atual, referencia):
+    """
+    Variação do p50 de cada etapa em relação a um resultado anterior.
+
+    Returns:
+        dict: {"cenario/pipeline/etapa": {p50_ms_referencia, p50_ms, variacao_pct}}
+    """
+    comparacao = {}
+    for nome_cenario, cenario in atual['cenarios'].items():
+        cenario_ref = referencia.get('cenarios', {}).get(nome_cenario)
+        if not cenario_ref:
+            continue
+        for nome_pipeline, pipeline in cenario['pipelines'].items():
+            etapas_ref = cenario_ref['pipelines'].get(nome_pipeline, {}).get('etapas', {})
+            for nome_etapa, etapa in pipeline['etapas'].items():
+                etapa_ref = etapas_ref.get(nome_etapa, {})
+                if 'p50_ms' not in etapa or 'p50_ms' not in etapa_ref:
+                    continue
+                comparacao[f"{nome_cenario}/{nome_pipeline}/{nome_etapa}"] = {
+                    'p50_ms_referencia': etapa_ref['p50_ms'],
+                    'p50_ms': etapa['p50_ms'],
+                    'variacao_pct': round((etapa['p50_ms'] - etapa_ref['p50_ms']) / max(etapa_ref['p50_ms'], 1e-6) * 100, 1)
+                }
+    return comparacao
+
+
+if __name__ == "__main__":
+    iteracoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    saida = sys.argv[2] if len(sys.argv) > 2 else None
+    referencia = sys.argv[3] if len(sys.argv) > 3 else None
+
+    resultado = executar(iteracoes)
+    if referencia:
+        with open(referencia, 'r', encoding='utf-8') as f:
+            resultado['comparacao'] = comparar(resultado, json.load(f))
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if saida:
+        with open(saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    print(texto)
@@ -5,107 +5,108 @@ import json
 import os
 from pathlib import Path
 
-def verificar_enem_com_yolo(caminho_imagem):
+# Módulos compartilhados com o HuggingFace Space: usados da mesma pasta quando
+# copiados no deploy, ou de huggingface-space/ quando rodando a partir do repositório
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "huggingface-space"))
+
+from contexto_imagem import ContextoImagem
+from registro_modulos import carregar_detector
+
+def verificar_enem_com_yolo(imagem):
     """
     Verifica se a imagem é uma folha ENEM usando detector YOLO
     
+    Args:
+        imagem: ContextoImagem (ou caminho) da imagem
+    
     Returns:
-        tuple: (is_enem, tipo_enem)
+        tuple: (is_enem, tipo_enem, resultado_yolo)
         - is_enem: bool indicando se é folha ENEM
         - tipo_enem: "enem_completo" se detectar day_region + answer_area,
                      "enem_recorte" se detectar apenas answer_area,
                      None caso contrário
+        - resultado_yolo: resultado de detect_rois (None se o detector não rodou),
+                          para o pipeline ENEM reaproveitar as detecções
     """
     try:
-        script_dir = Path(__file__).parent
-        detector_path = script_dir / "detector_yolo_enem.py"
+        try:
+            # Mesmo módulo (e modelo) para todas as chamadas do processo
+            detector = carregar_detector()
+        except ImportError:
+            return False, None, None
         
-        if not detector_path.exists():
-            return False, None
-        
-        import importlib.util
-        spec = importlib.util.spec_from_file_location("detector_yolo_enem", detector_path)
-        detector_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(detector_module)
-        
-        resultado = detector_module.detect_rois(caminho_imagem)
+        cronometro = imagem.cronometro if isinstance(imagem, ContextoImagem) else None
+        resultado = detector.detect_rois(imagem, cronometro)
         
         if not resultado['sucesso']:
-            return False, None
+            return False, None, resultado
         
         rois = resultado.get('rois', {})
         tem_day_region = 'day_region' in rois and len(rois['day_region']) > 0
         tem_answer_area = 'answer_area_enem' in rois and len(rois['answer_area_enem']) > 0
         
         if tem_day_region and tem_answer_area:
-            return True, "enem_completo"
+            return True, "enem_completo", resultado
         elif tem_answer_area:
-            return True, "enem_recorte"
+            return True, "enem_recorte", resultado
         else:
-            return False, None
+            return False, None, resultado
             
     except Exception as e:
         print(f"[DETECTAR-TIPO] Erro ao verificar ENEM com YOLO: {e}", file=sys.stderr)
-        return False, None
-
+        return False, None, None
 
-def carregar_imagem(caminho):
-    """
-    Carrega uma imagem lidando com caracteres especiais no caminho.
-    """
-    try:
-        with open(caminho, 'rb') as f:
-            dados = bytearray(f.read())
-        nparr = np.asarray(dados, dtype=np.uint8)
-        imagem = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if imagem is not None:
-            return imagem
-    except Exception as e:
-        pass
-    
-    imagem = cv2.imread(caminho)
-    return imagem
 
-def detectar_tipo_imagem(caminho_imagem):
+def detectar_tipo_imagem(caminho_imagem, contexto=None):
     """
     Detecta se a imagem já está processada (corrigida em perspectiva) ou se precisa de processamento.
     Também detecta se é uma folha ENEM (completa ou recorte).
     
+    Args:
+        caminho_imagem: Caminho da imagem
+        contexto: ContextoImagem do upload; sem ele o arquivo é lido aqui. YOLO e a
+                  análise de contornos usam a mesma decodificação.
+    
     Retorna:
         "enem_completo": folha ENEM completa detectada (day_region + answer_area_enem)
         "enem_recorte": apenas answer_area_enem detectada
         "processada": se a imagem já está retificada e pronta para detecção
         "original": se a imagem precisa de correção de perspectiva
     """
+    return classificar_imagem(caminho_imagem, contexto)['tipo']
+
+
+def classificar_imagem(caminho_imagem, contexto=None):
+    """
+    Mesma classificação de detectar_tipo_imagem, devolvendo também as detecções do YOLO.
+    
+    Returns:
+        dict: {tipo, resultado_yolo (None se o detector não rodou)}
+    """
+    if contexto is None:
+        contexto = ContextoImagem.de_arquivo(caminho_imagem)
     
     # PRIORIDADE 1: Verificar se é folha ENEM usando YOLO
-    is_enem, tipo_enem = verificar_enem_com_yolo(caminho_imagem)
+    is_enem, tipo_enem, resultado_yolo = verificar_enem_com_yolo(contexto)
     if is_enem and tipo_enem:
-        return tipo_enem
+        return {'tipo': tipo_enem, 'resultado_yolo': resultado_yolo}
     
     # PRIORIDADE 2: Continuar com detecção tradicional se não for ENEM
-    # Carregar imagem
-    imagem = carregar_imagem(caminho_imagem)
-    if imagem is None:
-        raise ValueError(f"Erro ao carregar a imagem: {caminho_imagem}")
+    with contexto.cronometro.etapa('classificacao'):
+        tipo = classificar_por_contornos(contexto)
+    return {'tipo': tipo, 'resultado_yolo': resultado_yolo}
 
+
+def classificar_por_contornos(contexto):
+    """
+    Decide entre "processada" e "original" pelos contornos retangulares da imagem
     
-    altura, largura = imagem.shape[:2]
-    
-    # Redimensionar para análise mais rápida
-    escala = 800.0 / max(largura, altura)
-    if escala < 1.0:
-        largura_proc = int(largura * escala)
-        altura_proc = int(altura * escala)
-        imagem_proc = cv2.resize(imagem, (largura_proc, altura_proc), interpolation=cv2.INTER_AREA)
-    else:
-        imagem_proc = imagem.copy()
-        largura_proc = largura
-        altura_proc = altura
-        escala = 1.0
-    
-    # Converter para escala de cinza
-    cinza = cv2.cvtColor(imagem_proc, cv2.COLOR_BGR2GRAY)
+    Args:
+        contexto: ContextoImagem do upload
+    """
+    # Versão em cinza reduzida (maior lado 800 px) para análise mais rápida
+    cinza, _ = contexto.reduzida(800, cinza=True)
+    altura_proc, largura_proc = cinza.shape[:2]
     
     # Aplicar equalização de histograma para melhorar contraste
     clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Gerador de folhas de resposta sintéticas com marcações conhecidas
+Usado pelos benchmarks (benchmark_bolhas.py, benchmark_pipeline.py) para medir
+tempo e acerto sem depender de fotos reais.
+
+Tipos de folha:
+    enem: cabeçalho com o dia da prova + answer_area 3 colunas x 30 questões x 5 alternativas
+    sis:  3 blocos x 20 questões x 5 alternativas nas posições de LAYOUT_SIS_60
+
+A página é colocada sobre um fundo escuro (como uma foto de celular) e pode
+receber rotação, inclinação de perspectiva, desfoque e ruído.
+
+Uso: python gerador_folhas.py <saida.jpg> [enem|sis] [largura] [rotacao] [inclinacao] [desfoque] [ruido] [seed]
+"""
+
+import sys
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "huggingface-space"))
+
+from leitor_bolhas import LAYOUT_SIS_60
+
+LETRAS = ['A', 'B', 'C', 'D', 'E']
+PROPORCAO_PAGINA = 1.414   # A4 (altura / largura)
+MARGEM_FUNDO = 0.08        # Fundo visível em volta da página, em fração da largura
+COR_FUNDO = (70, 60, 55)
+COR_MARCACAO = (30, 30, 30)
+COR_CONTORNO = (90, 90, 90)
+
+
+def gerar_answer_area(largura, seed=0):
+    """
+    Gera uma answer_area sintética com uma marcação por questão, nas posições
+    que processar_bolhas_answer_area espera (colunas iguais, alternativas equidistantes).
+
+    Returns:
+        tuple: (imagem BGR, lista de letras marcadas por questão 1-90)
+    """
+    rng = np.random.default_rng(seed)
+    altura = int(largura * 1.4)
+    img = np.full((altura, largura, 3), 255, dtype=np.uint8)
+    largura_coluna = largura / 3
+    passo_y = altura / 31
+    raio = max(4, int(min(largura_coluna / 5, passo_y) * 0.3))
+    gabarito = []
+
+    for coluna in range(3):
+        x_inicio = coluna * largura_coluna
+        for q in range(30):
+            cy = int(passo_y * (q + 1))
+            marcada = rng.integers(0, 5)
+            gabarito.append(LETRAS[marcada])
+            for idx in range(5):
+                cx = int(x_inicio + largura_coluna * (idx + 0.5) / 5)
+                if idx == marcada:
+                    cv2.circle(img, (cx, cy), raio, COR_MARCACAO, -1)
+                else:
+                    cv2.circle(img, (cx, cy), raio, COR_CONTORNO, 1)
+
+    ruido = rng.normal(0, 6, img.shape)
+    img = np.clip(img.astype(np.float32) + ruido, 0, 255).astype(np.uint8)
+    return img, gabarito
+
+
+def _desenhar_pagina_enem(largura, dia, rng):
+    """Página ENEM: faixa do dia no topo e answer_area (mesma geometria de gerar_answer_area) abaixo"""
+    altura = int(largura * PROPORCAO_PAGINA)
+    pagina = np.full((altura, largura, 3), 255, dtype=np.uint8)
+
+    # Cabeçalho com o dia ("1 DIA" casa com os padrões de ocr_day_detector)
+    escala_fonte = largura / 700
+    espessura = max(1, int(escala_fonte * 2))
+    texto = f"{dia} DIA"
+    (tw, th), base = cv2.getTextSize(texto, cv2.FONT_HERSHEY_SIMPLEX, escala_fonte, espessura)
+    tx, ty = int(largura * 0.1), int(altura * 0.06) + th
+    cv2.putText(pagina, texto, (tx, ty), cv2.FONT_HERSHEY_SIMPLEX, escala_fonte, (0, 0, 0), espessura, cv2.LINE_AA)
+    folga = th // 2
+    day_region = [tx - folga, ty - th - folga, tw + 2 * folga, th + base + 2 * folga]
+
+    # Answer area ocupando a parte de baixo
+    ax, ay = int(largura * 0.06), int(altura * 0.2)
+    aw = largura - 2 * ax
+    ah = min(int(aw * 1.4), altura - ay - int(altura * 0.04))
+    area = pagina[ay:ay + ah, ax:ax + aw]
+    largura_coluna = aw / 3
+    passo_y = ah / 31
+    raio = max(4, int(min(largura_coluna / 5, passo_y) * 0.3))
+    gabarito = []
+    for coluna in range(3):
+        for q in range(30):
+            marcada = int(rng.integers(0, 5))
+            gabarito.append(LETRAS[marcada])
+            cy = int(passo_y * (q + 1))
+            for idx in range(5):
+                cx = int(coluna * largura_coluna + largura_coluna * (idx + 0.5) / 5)
+                if idx == marcada:
+                    cv2.circle(area, (cx, cy), raio, COR_MARCACAO, -1)
+                else:
+                    cv2.circle(area, (cx, cy), raio, COR_CONTORNO, 1)
+
+    rois = {'day_region': day_region, 'answer_area_enem': [ax, ay, aw, ah]}
+    return pagina, gabarito, rois
+
+
+def _desenhar_pagina_sis(largura, rng):
+    """Página SIS: bolhas nos centros X de LAYOUT_SIS_60 (escalados para a largura da página)"""
+    altura = int(largura * PROPORCAO_PAGINA)
+    pagina = np.full((altura, largura, 3), 255, dtype=np.uint8)
+
+    fator = largura / LAYOUT_SIS_60['largura_referencia']
+    questoes = LAYOUT_SIS_60['questoes_por_bloco']
+    y_inicio, y_fim = altura * 0.35, altura * 0.93
+    passo_y = (y_fim - y_inicio) / (questoes - 1)
+    raio = max(4, int(10 * fator))
+    gabarito = []
+    for centros in LAYOUT_SIS_60['centros_x']:
+        for q in range(questoes):
+            marcada = int(rng.integers(0, 5))
+            gabarito.append(LETRAS[marcada])
+            cy = int(y_inicio + passo_y * q)
+            for idx, cx in enumerate(centros):
+                if idx == marcada:
+                    cv2.circle(pagina, (int(cx * fator), cy), raio, COR_MARCACAO, -1)
+                else:
+                    cv2.circle(pagina, (int(cx * fator), cy), raio, COR_CONTORNO, 1)
+
+    return pagina, gabarito, {}
+
+
+def gerar_folha(tipo='enem', largura=1240, rotacao=0.0, inclinacao=0.0, desfoque=0.0, ruido=0.0, dia=1, seed=0):
+    """
+    Gera uma "foto" sintética de folha com gabarito conhecido.
+
+    Args:
+        tipo: 'enem' ou 'sis'
+        largura: Largura da imagem final em pixels (altura segue a proporção A4 + fundo)
+        rotacao: Rotação da página em graus
+        inclinacao: Inclinação de perspectiva (fração da largura que o topo da página encolhe de cada lado)
+        desfoque: Sigma do desfoque gaussiano (0 = sem desfoque)
+        ruido: Desvio padrão do ruído gaussiano (0 = sem ruído)
+        dia: Dia impresso no cabeçalho da folha ENEM
+        seed: Semente das marcações e do ruído
+
+    Returns:
+        dict: {imagem, pagina, gabarito, rois, dia, parametros}
+              pagina é a folha sem fundo nem distorções (já "retificada");
+              rois traz as caixas [x, y, w, h] da folha ENEM na imagem final
+    """
+    rng = np.random.default_rng(seed)
+    largura_pagina = int(largura * (1 - 2 * MARGEM_FUNDO))
+
+    if tipo == 'enem':
+        pagina, gabarito, rois_pagina = _desenhar_pagina_enem(largura_pagina, dia, rng)
+    elif tipo == 'sis':
+        pagina, gabarito, rois_pagina = _desenhar_pagina_sis(largura_pagina, rng)
+    else:
+        raise ValueError(f"Tipo de folha desconhecido: {tipo}")
+
+    altura_pagina = pagina.shape[0]
+    margem = int(largura * MARGEM_FUNDO)
+    altura = altura_pagina + 2 * margem
+
+    # Cantos da página na imagem final: trapézio (inclinação) girado em torno do centro
+    encolhe = inclinacao * largura_pagina
+    destino = np.array([
+        [margem + encolhe, margem],
+        [margem + largura_pagina - encolhe, margem],
+        [margem + largura_pagina, margem + altura_pagina],
+        [margem, margem + altura_pagina],
+    ], dtype=np.float64)
+    centro = np.array([largura / 2, altura / 2])
+    angulo = np.deg2rad(rotacao)
+    giro = np.array([[np.cos(angulo), -np.sin(angulo)], [np.sin(angulo), np.cos(angulo)]])
+    destino = (destino - centro) @ giro.T + centro
+
+    origem = np.array([[0, 0], [largura_pagina, 0], [largura_pagina, altura_pagina], [0, altura_pagina]], dtype=np.float32)
+    homografia = cv2.getPerspectiveTransform(origem, destino.astype(np.float32))
+    imagem = cv2.warpPerspective(pagina, homografia, (largura, altura),
+                                 flags=cv2.INTER_LINEAR,
+                                 borderMode=cv2.BORDER_CONSTANT,
+                                 borderValue=COR_FUNDO)
+
+    if desfoque > 0:
+        imagem = cv2.GaussianBlur(imagem, (0, 0), desfoque)
+    if ruido > 0:
+        imagem = np.clip(imagem.astype(np.float32) + rng.normal(0, ruido, imagem.shape), 0, 255).astype(np.uint8)
+
+    # Caixas das ROIs na imagem final (bounding box dos cantos transformados)
+    rois = {}
+    for nome, (x, y, w, h) in rois_pagina.items():
+        cantos = np.array([[[x, y], [x + w, y], [x + w, y + h], [x, y + h]]], dtype=np.float32)
+        rx, ry, rw, rh = cv2.boundingRect(cv2.perspectiveTransform(cantos, homografia).astype(np.int32))
+        rois[nome] = [rx, ry, rw, rh]
+
+    return {
+        'imagem': imagem,
+        'pagina': pagina,
+        'gabarito': gabarito,
+        'rois': rois,
+        'dia': dia,
+        'parametros': {
+            'tipo': tipo, 'largura': largura, 'altura': altura, 'rotacao': rotacao,
+            'inclinacao': inclinacao, 'desfoque': desfoque, 'ruido': ruido, 'dia': dia, 'seed': seed
+        }
+    }
+
+
+def contar_acertos(respostas, gabarito):
+    """Quantidade de questões cuja resposta lida é igual à marcação sintética"""
+    return sum(r['Resposta'] == g for r, g in zip(respostas, gabarito))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(json.dumps({
+            'sucesso': False,
+            'erro': 'Uso: python gerador_folhas.py <saida.jpg> [enem|sis] [largura] [rotacao] [inclinacao] [desfoque] [ruido] [seed]'
+        }))
+        sys.exit(1)
+
+    args = sys.argv[2:]
+    folha = gerar_folha(
+        tipo=args[0] if len(args) > 0 else 'enem',
+        largura=int(args[1]) if len(args) > 1 else 1240,
+        rotacao=float(args[2]) if len(args) > 2 else 0.0,
+        inclinacao=float(args[3]) if len(args) > 3 else 0.0,
+        desfoque=float(args[4]) if len(args) > 4 else 0.0,
+        ruido=float(args[5]) if len(args) > 5 else 0.0,
+        seed=int(args[6]) if len(args) > 6 else 0
+    )
+    cv2.imwrite(sys.argv[1], folha['imagem'])
+    print(json.dumps({
+        'sucesso': True,
+        'arquivo': sys.argv[1],
+        'parametros': folha['parametros'],
+        'rois': folha['rois'],
+        'gabarito': folha['gabarito']
+    }, ensure_ascii=False))
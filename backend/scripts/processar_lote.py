@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Correção em lote de uma pasta (ou glob) de folhas escaneadas
+Distribui as imagens por um pool de processos; cada processo importa os módulos e
+carrega o modelo YOLO uma única vez e atende muitas imagens. Os resultados são
+gravados à medida que ficam prontos (um por imagem, em JSON Lines ou CSV), então a
+memória não cresce com o tamanho do lote.
+
+Retomada (saída JSONL): o arquivo é aberto em modo append e cada linha leva o
+caminho e o SHA-256 do conteúdo da imagem. Ao rodar de novo com a mesma saída, as
+imagens já processadas com sucesso e com o mesmo conteúdo são puladas; imagens que
+falharam (inclusive por um processo que subiu sem o modelo) ou que foram alteradas
+desde então são processadas outra vez (vale a última linha). Uma linha truncada por queda no
+meio da escrita é descartada. A saída CSV é sempre reescrita do zero.
+
+Modos:
+    auto        -> processar_respostas_auto.py (classifica e processa; padrão)
+    original    -> processar_respostas_Imagem_original.py
+    processada  -> processar_respostas_imagem_processadas.py
+    enem        -> processar_respostas_enem_mobile.py
+
+Variáveis de ambiente:
+    OMR_LOTE_MAX_TAREFAS: imagens por processo antes de reciclá-lo (padrão 500; 0 = nunca)
+    OMR_LOTE_THREADS: threads do OpenCV e do ONNX Runtime em cada processo (padrão 1, o paralelismo vem do pool)
+    OMR_LOTE_FSYNC_A_CADA: resultados entre fsyncs da saída (padrão 50)
+    OMR_LOTE_FSYNC_SEGUNDOS: intervalo máximo entre fsyncs (padrão 5)
+
+Uso: python processar_lote.py <pasta|glob> <saida.jsonl|saida.csv> [processos] [modo]
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import hashlib
+import time
+import multiprocessing
+from pathlib import Path
+
+EXTENSOES_IMAGEM = {'.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp'}
+MODOS = ('auto', 'original', 'processada', 'enem')
+MAX_TAREFAS_POR_PROCESSO = int(os.environ.get('OMR_LOTE_MAX_TAREFAS', '500'))
+THREADS_POR_PROCESSO = int(os.environ.get('OMR_LOTE_THREADS', '1'))
+FSYNC_A_CADA = int(os.environ.get('OMR_LOTE_FSYNC_A_CADA', '50'))
+FSYNC_SEGUNDOS = float(os.environ.get('OMR_LOTE_FSYNC_SEGUNDOS', '5'))
+INTERVALO_PROGRESSO = 50  # Imagens entre linhas de progresso no stderr
+CAMPOS_CSV = ['arquivo', 'sucesso', 'tipo_imagem', 'dia_detectado', 'total_respostas',
+              'questoes_validas', 'questoes_com_dupla_marcacao', 'questoes_sem_marcacao',
+              'respostas', 'erro', 'tempo_ms']
+
+
+def listar_imagens(entrada):
+    """
+    Imagens de uma pasta (recursivamente) ou de um padrão glob, em ordem alfabética.
+    """
+    if os.path.isdir(entrada):
+        caminhos = (str(p) for p in Path(entrada).rglob('*'))
+    else:
+        caminhos = glob.glob(entrada, recursive=True)
+    return sorted(c for c in caminhos if Path(c).suffix.lower() in EXTENSOES_IMAGEM and os.path.isfile(c))
+
+
+def hash_arquivo(caminho):
+    """SHA-256 do conteúdo do arquivo (junto com o caminho, identifica a imagem na retomada)"""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+# Estado de cada processo do pool (preenchido por _iniciar_processo)
+_PROCESSAR = None
+
+
+def _iniciar_processo(modo):
+    """
+    Inicializador do pool: importa os módulos e carrega o modelo uma vez por processo.
+    Os imports ficam aqui para o processo principal não carregar OpenCV/modelo à toa.
+    """
+    global _PROCESSAR
+    # Um processo por núcleo: as bibliotecas não devem abrir mais threads cada uma
+    os.environ.setdefault('ORT_INTRA_OP_THREADS', str(THREADS_POR_PROCESSO))
+    import cv2
+    cv2.setNumThreads(THREADS_POR_PROCESSO)
+
+    if modo == 'auto':
+        import processar_respostas_auto
+        _PROCESSAR = processar_respostas_auto.processar_imagem_auto
+    elif modo == 'original':
+        import processar_respostas_Imagem_original
+        _PROCESSAR = processar_respostas_Imagem_original.processar_imagem
+    elif modo == 'processada':
+        import processar_respostas_imagem_processadas
+        _PROCESSAR = processar_respostas_imagem_processadas.processar_imagem
+    else:
+        import processar_respostas_enem_mobile
+        _PROCESSAR = processar_respostas_enem_mobile.processar_imagem_enem_mobile
+
+    if modo in ('auto', 'enem'):
+        from registro_modulos import carregar_detector
+        try:
+            carregar_detector(carregar_modelo=True)
+        except Exception as e:
+            print(f"[LOTE] Modelo YOLO não carregado no processo {os.getpid()}: {e}", file=sys.stderr)
+
+
+def _processar_arquivo(caminho):
+    """Processa uma imagem no processo do pool; erros viram resultado em vez de derrubar o lote"""
+    inicio = time.perf_counter()
+    try:
+        sha256 = hash_arquivo(caminho)
+        resultado = _PROCESSAR(caminho)
+    except Exception as e:
+        sha256 = None
+        resultado = {'sucesso': False, 'erro': str(e)}
+    resultado['arquivo'] = caminho
+    resultado['sha256'] = sha256
+    resultado['tempo_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+    return resultado
+
+
+class SaidaJsonl:
+    """
+    Um resultado completo por linha, em modo append. Os dados vão ao disco (fsync) a
+    cada FSYNC_A_CADA resultados ou FSYNC_SEGUNDOS, o que vier primeiro: uma queda
+    perde no máximo esse trecho, que é refeito na retomada.
+    """
+
+    def __init__(self, caminho):
+        self.registradas = self._ler_registradas(caminho)
+        self.arquivo = open(caminho, 'a', encoding='utf-8')
+        self._pendentes = 0
+        self._ultimo_fsync = time.monotonic()
+
+    @staticmethod
+    def _ler_registradas(caminho):
+        """
+        {arquivo: sha256} das imagens cuja última linha gravada é um sucesso; corta
+        uma última linha incompleta. Falhas não entram, para serem tentadas de novo.
+        """
+        registradas = {}
+        if not os.path.exists(caminho):
+            return registradas
+        with open(caminho, 'rb+') as f:
+            conteudo = f.read()
+            fim = conteudo.rfind(b'\n') + 1
+            if fim < len(conteudo):
+                print(f"[LOTE] Descartando linha incompleta no fim de {caminho}", file=sys.stderr)
+                f.truncate(fim)
+        for linha in conteudo[:fim].splitlines():
+            try:
+                resultado = json.loads(linha)
+            except ValueError:
+                continue
+            arquivo = resultado.get('arquivo')
+            if not arquivo:
+                continue
+            if resultado.get('sucesso') and resultado.get('sha256'):
+                registradas[arquivo] = resultado['sha256']
+            else:
+                registradas.pop(arquivo, None)
+        return registradas
+
+    def ja_processada(self, caminho):
+        """Processada com sucesso e com conteúdo inalterado (o hash só é calculado para caminhos registrados)"""
+        sha256 = self.registradas.get(caminho)
+        if sha256 is None:
+            return False
+        try:
+            return hash_arquivo(caminho) == sha256
+        except OSError:
+            return False
+
+    def escrever(self, resultado):
+        self.arquivo.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+        self._pendentes += 1
+        if self._pendentes >= FSYNC_A_CADA or time.monotonic() - self._ultimo_fsync >= FSYNC_SEGUNDOS:
+            self.sincronizar()
+
+    def sincronizar(self):
+        if self._pendentes:
+            self.arquivo.flush()
+            os.fsync(self.arquivo.fileno())
+            self._pendentes = 0
+        self._ultimo_fsync = time.monotonic()
+
+    def fechar(self):
+        self.sincronizar()
+        self.arquivo.close()
+
+
+class SaidaCsv:
+    """Uma linha por imagem com os totais e as respostas compactadas ("1:A;2:B;3:")"""
+
+    def __init__(self, caminho):
+        self.arquivo = open(caminho, 'w', encoding='utf-8', newline='')
+        self.escritor = csv.DictWriter(self.arquivo, fieldnames=CAMPOS_CSV, extrasaction='ignore')
+        self.escritor.writeheader()
+
+    def ja_processada(self, caminho):
+        return False
+
+    def escrever(self, resultado):
+        linha = dict(resultado)
+        linha['respostas'] = ';'.join(f"{r['Questão']}:{r['Resposta']}" for r in resultado.get('respostas', []))
+        self.escritor.writerow(linha)
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+def processar_lote(entrada, saida, processos=None, modo='auto'):
+    """
+    Processa todas as imagens de `entrada` e grava um resultado por imagem em `saida`.
+    Com saída JSONL já existente, continua de onde a execução anterior parou.
+
+    Args:
+        entrada: Pasta ou padrão glob
+        saida: Arquivo .jsonl ou .csv
+        processos: Tamanho do pool (padrão: número de CPUs)
+        modo: Um de MODOS
+
+    Returns:
+        dict: Resumo {total, ja_processadas, sucesso, com_erro, tempo_total_s, folhas_por_segundo, processos, saida}
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo desconhecido: {modo}. Use um de: {', '.join(MODOS)}")
+    caminhos = listar_imagens(entrada)
+    if not caminhos:
+        raise ValueError(f"Nenhuma imagem encontrada em: {entrada}")
+    escritor = SaidaCsv(saida) if saida.lower().endswith('.csv') else SaidaJsonl(saida)
+    total = sucesso = 0
+    try:
+        pendentes = [c for c in caminhos if not escritor.ja_processada(c)]
+        ja_processadas = len(caminhos) - len(pendentes)
+        processos = max(1, min(processos or os.cpu_count() or 1, len(pendentes) or 1))
+        print(f"[LOTE] {len(pendentes)} imagens, {processos} processos, modo {modo}"
+              + (f" ({ja_processadas} já registradas em {saida}, puladas)" if ja_processadas else ""),
+              file=sys.stderr)
+
+        inicio = time.perf_counter()
+        if pendentes:
+            with multiprocessing.Pool(processos, initializer=_iniciar_processo, initargs=(modo,),
+                                      maxtasksperchild=MAX_TAREFAS_POR_PROCESSO or None) as pool:
+                # imap_unordered devolve cada resultado assim que fica pronto; nada é acumulado
+                for resultado in pool.imap_unordered(_processar_arquivo, pendentes):
+                    escritor.escrever(resultado)
+                    total += 1
+                    sucesso += bool(resultado.get('sucesso'))
+                    if total % INTERVALO_PROGRESSO == 0:
+                        decorrido = time.perf_counter() - inicio
+                        print(f"[LOTE] {total}/{len(pendentes)} ({total / decorrido:.2f} folhas/s)", file=sys.stderr)
+    finally:
+        escritor.fechar()
+
+    tempo_total = time.perf_counter() - inicio
+    return {
+        'sucesso': True,
+        'total': total,
+        'ja_processadas': ja_processadas,
+        'processadas_com_sucesso': sucesso,
+        'com_erro': total - sucesso,
+        'tempo_total_s': round(tempo_total, 2),
+        'folhas_por_segundo': round(total / tempo_total, 2) if tempo_total > 0 else None,
+        'processos': processos,
+        'modo': modo,
+        'saida': saida
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(json.dumps({
+            'sucesso': False,
+            'erro': 'Uso: python processar_lote.py <pasta|glob> <saida.jsonl|saida.csv> [processos] [modo]'
+        }))
+        sys.exit(1)
+
+    try:
+        resumo = processar_lote(
+            sys.argv[1],
+            sys.argv[2],
+            processos=int(sys.argv[3]) if len(sys.argv) > 3 else None,
+            modo=sys.argv[4] if len(sys.argv) > 4 else 'auto'
+        )
+        print(json.dumps(resumo, ensure_ascii=False))
+    except Exception as e:
+        print(json.dumps({'sucesso': False, 'erro': str(e)}, ensure_ascii=False))
+        sys.exit(1)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Classificação + processamento de uma folha em uma única chamada
+A imagem é decodificada uma vez; a classificação (detectar_tipo_imagem) escolhe o
+leitor e, quando a folha é ENEM, as ROIs que o YOLO já encontrou são reaproveitadas
+pelo pipeline ENEM em vez de uma segunda inferência.
+
+Tipos e leitores:
+    enem_completo / enem_recorte -> processar_respostas_enem_mobile.py
+    processada                   -> processar_respostas_imagem_processadas.py
+    original                     -> processar_respostas_Imagem_original.py
+
+A resposta é a do leitor escolhido acrescida de tipo_imagem, requer_processamento
+e script_utilizado.
+
+Uso: python processar_respostas_auto.py <caminho_imagem>
+"""
+
+import sys
+import json
+import os
+from pathlib import Path
+
+# Módulos compartilhados com o HuggingFace Space: usados da mesma pasta quando
+# copiados no deploy, ou de huggingface-space/ quando rodando a partir do repositório
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "huggingface-space"))
+
+from cronometro import Cronometro
+from contexto_imagem import ContextoImagem
+import detectar_tipo_imagem
+import processar_respostas_Imagem_original
+import processar_respostas_imagem_processadas
+
+# O pipeline ENEM depende do detector YOLO/OCR, que pode não estar presente
+processar_respostas_enem_mobile = None
+erro_enem = None
+try:
+    import processar_respostas_enem_mobile
+except Exception as e:
+    erro_enem = str(e)
+    print(f"[AUTO] Pipeline ENEM indisponível: {e}", file=sys.stderr)
+
+SCRIPTS = {
+    'enem_completo': 'processar_respostas_enem_mobile.py',
+    'enem_recorte': 'processar_respostas_enem_mobile.py',
+    'processada': 'processar_respostas_imagem_processadas.py',
+    'original': 'processar_respostas_Imagem_original.py'
+}
+
+
+def processar_imagem_auto(caminho_imagem, motor=None):
+    """
+    Classifica a imagem e processa com o leitor correspondente, com uma decodificação
+    e no máximo uma inferência YOLO.
+
+    Args:
+        caminho_imagem: Caminho da imagem
+        motor: Motor de bolhas para as folhas SIS ('contornos' ou 'grade')
+
+    Returns:
+        dict: Resultado do leitor + {tipo_imagem, requer_processamento, script_utilizado}
+    """
+    contexto = ContextoImagem.de_arquivo(caminho_imagem, Cronometro())
+
+    try:
+        classificacao = detectar_tipo_imagem.classificar_imagem(caminho_imagem, contexto)
+        tipo, resultado_yolo = classificacao['tipo'], classificacao['resultado_yolo']
+    except Exception as e:
+        # Mesmo fallback do backend quando a detecção falha: o script completo é o mais seguro
+        print(f"[AUTO] Classificação falhou ({e}), usando script original", file=sys.stderr)
+        tipo, resultado_yolo = 'original', None
+    print(f"[AUTO] Imagem classificada como: {tipo}", file=sys.stderr)
+
+    if tipo in ('enem_completo', 'enem_recorte'):
+        if processar_respostas_enem_mobile is None:
+            resultado = {
+                'sucesso': False,
+                'erro': f'Pipeline ENEM indisponível: {erro_enem}'
+            }
+        else:
+            resultado = processar_respostas_enem_mobile.processar_imagem_enem_mobile(
+                caminho_imagem, contexto, resultado_yolo)
+    elif tipo == 'processada':
+        resultado = processar_respostas_imagem_processadas.processar_imagem(caminho_imagem, motor, contexto)
+    else:
+        resultado = processar_respostas_Imagem_original.processar_imagem(caminho_imagem, motor, contexto)
+
+    resultado['tipo_imagem'] = tipo
+    resultado['requer_processamento'] = tipo == 'original'
+    resultado['script_utilizado'] = SCRIPTS[tipo]
+    return resultado
+
+
+if __name__ == "__main__":
+    try:
+        if len(sys.argv) < 2:
+            print(json.dumps({
+                "sucesso": False,
+                "erro": "Caminho da imagem não fornecido. Uso: python processar_respostas_auto.py <caminho_imagem>"
+            }))
+            sys.exit(1)
+
+        caminho_imagem = sys.argv[1]
+
+        if not os.path.exists(caminho_imagem):
+            print(json.dumps({
+                "sucesso": False,
+                "erro": f"Arquivo não encontrado: {caminho_imagem}"
+            }))
+            sys.exit(1)
+
+        resultado = processar_imagem_auto(caminho_imagem)
+
+        # Retornar JSON via stdout (apenas o JSON, sem outros prints)
+        print(json.dumps(resultado, ensure_ascii=False))
+
+    except Exception as e:
+        print(json.dumps({
+            "sucesso": False,
+            "erro": str(e)
+        }))
+        sys.exit(1)
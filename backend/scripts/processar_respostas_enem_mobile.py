@@ -6,242 +6,72 @@ Pipeline completo: YOLO detection → OCR day → recorte ROIs → detecção de
 Integra detector_yolo_enem.py e ocr_day_detector.py
 """
 
-import cv2
-import numpy as np
 import sys
 import json
 import os
 from pathlib import Path
 
-# Importar módulos locais
-try:
-    from detector_yolo_enem import detect_rois
-    from ocr_day_detector import detect_day_from_image
-except ImportError:
-    # Fallback para importação absoluta
-    import importlib.util
-    script_dir = Path(__file__).parent
-    
-    # Carregar detector_yolo_enem
-    spec = importlib.util.spec_from_file_location("detector_yolo_enem", script_dir / "detector_yolo_enem.py")
-    detector_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(detector_module)
-    detect_rois = detector_module.detect_rois
-    
-    # Carregar ocr_day_detector
-    spec = importlib.util.spec_from_file_location("ocr_day_detector", script_dir / "ocr_day_detector.py")
-    ocr_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(ocr_module)
-    detect_day_from_image = ocr_module.detect_day_from_image
+# Módulos compartilhados com o HuggingFace Space: usados da mesma pasta quando
+# copiados no deploy, ou de huggingface-space/ quando rodando a partir do repositório
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent / "huggingface-space"))
+
+from leitor_bolhas import ler_bolhas, LAYOUT_ENEM_90
+from cronometro import Cronometro
+from contexto_imagem import ContextoImagem
+from registro_modulos import carregar_detector, carregar_modulo
 
+# Módulos locais, compartilhados com detectar_tipo_imagem (mesma instância e mesmo modelo)
+detect_rois = carregar_detector().detect_rois
+_ocr = carregar_modulo('ocr_day_detector')
+detect_day_from_image = _ocr.detect_day_from_image
+get_estatisticas_classificador = _ocr.get_estatisticas_classificador
 
-def processar_bolhas_answer_area(answer_area_image):
+
+def processar_bolhas_answer_area(answer_area_image, motor=None):
     """
-    Detecta bolhas marcadas na answer_area_enem
-    Adaptado de processar_respostas_Imagem_original.py
+    Detecta bolhas marcadas na answer_area_enem (leitor compartilhado leitor_bolhas.py)
     
     Args:
         answer_area_image: Imagem recortada da answer_area
+        motor: 'contornos' ou 'grade' (padrão: OMR_MOTOR_BOLHAS ou 'contornos')
         
     Returns:
-        list: Lista de respostas [{Questão, Resposta, Valida}]
+        dict: {respostas, total_bolhas_detectadas, questoes_com_dupla_marcacao, ...}
     """
-    # Pré-processamento
-    cinza = cv2.cvtColor(answer_area_image, cv2.COLOR_BGR2GRAY)
-    suavizada = cv2.GaussianBlur(cinza, (5, 5), 0)
-    _, binaria = cv2.threshold(suavizada, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-    
-    # Remoção de ruído
-    kernel = np.ones((5, 5), np.uint8)
-    mascara = cv2.morphologyEx(binaria, cv2.MORPH_OPEN, kernel)
-    mascara = cv2.morphologyEx(mascara, cv2.MORPH_CLOSE, kernel)
-    
-    # Detectar bolhas
-    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    # Filtrar bolhas válidas
-    area_minima = 100  # Ajustar conforme necessário
-    limiar_branco = 0.70
-    bolhas_validas = []
-    
-    for contorno in contornos:
-        area = cv2.contourArea(contorno)
-        if area > area_minima:
-            perimetro = cv2.arcLength(contorno, True)
-            if perimetro == 0:
-                continue
-            
-            circularidade = 4 * np.pi * area / (perimetro ** 2)
-            if circularidade > 0.4:
-                mascara_local = np.zeros_like(mascara)
-                cv2.drawContours(mascara_local, [contorno], -1, 255, -1)
-                pixels_brancos = np.sum(mascara[mascara_local == 255] == 255)
-                total_pixels = np.sum(mascara_local == 255)
-                
-                if total_pixels > 0:
-                    proporcao_branco = pixels_brancos / total_pixels
-                    if proporcao_branco >= limiar_branco:
-                        bolhas_validas.append(contorno)
-    
-    # Ordenar bolhas por posição vertical
-    bolhas_validas = sorted(bolhas_validas, key=lambda c: cv2.boundingRect(c)[1])
-    
-    # Extrair centróides
-    centroides = []
-    for i, contorno in enumerate(bolhas_validas):
-        M = cv2.moments(contorno)
-        if M["m00"] != 0:
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-            centroides.append((cx, cy, contorno, i+1))
-    
-    # Classificar bolhas em questões e alternativas
-    # ENEM: 90 questões por dia, 5 alternativas cada (A-E)
-    # Layout típico: 3 colunas de 30 questões cada
-    
-    letras_colunas = ['A', 'B', 'C', 'D', 'E']
-    num_questoes_por_coluna = 30
-    num_colunas = 3
-    
-    # Detectar limites das colunas automaticamente
-    altura_area, largura_area = answer_area_image.shape[:2]
-    largura_coluna = largura_area / num_colunas
-    
-    # Definir posições aproximadas das colunas
-    limites_x_colunas = {}
-    posicoes_colunas_por_bloco = {}
-    
-    for col in range(num_colunas):
-        x_inicio = int(col * largura_coluna)
-        x_fim = int((col + 1) * largura_coluna)
-        limites_x_colunas[col] = (x_inicio, x_fim)
-        
-        # Posições das alternativas dentro de cada coluna
-        # Assumindo espaçamento igual entre as 5 alternativas
-        posicoes_alt = {}
-        for idx, letra in enumerate(letras_colunas):
-            # Posição X aproximada da alternativa dentro da coluna
-            pos_x = x_inicio + (x_fim - x_inicio) * (idx + 0.5) / len(letras_colunas)
-            posicoes_alt[letra] = pos_x
-        
-        posicoes_colunas_por_bloco[col] = posicoes_alt
-    
-    margem_coluna = 20  # Margem para classificação de alternativa
-    
-    # Estrutura para armazenar respostas
-    gabarito_completo = {}
-    for coluna in range(num_colunas):
-        gabarito_bloco = {
-            q: {'respostas': {letra: None for letra in letras_colunas}, 'valida': True}
-            for q in range(1, num_questoes_por_coluna + 1)
-        }
-        gabarito_completo[coluna] = gabarito_bloco
-    
-    # Ordenar centróides por Y
-    centroides.sort(key=lambda x: x[1])
-    
-    # Processar cada coluna separadamente
-    for coluna in range(num_colunas):
-        # Filtrar centróides desta coluna
-        centroides_coluna = [
-            (x, y, cnt, num) for (x, y, cnt, num) in centroides
-            if limites_x_colunas[coluna][0] <= x < limites_x_colunas[coluna][1]
-        ]
-        
-        if not centroides_coluna:
-            continue
-        
-        # Distribuir uniformemente pelas questões
-        passo_y = (centroides_coluna[-1][1] - centroides_coluna[0][1]) / (num_questoes_por_coluna - 1) if len(centroides_coluna) > 1 else 1
-        
-        for x, y, cnt, num_marcacao in centroides_coluna:
-            # Determinar qual questão
-            if passo_y > 0:
-                questao = min(int(round((y - centroides_coluna[0][1]) / passo_y)) + 1, num_questoes_por_coluna)
-            else:
-                questao = 1
-            
-            # Determinar qual alternativa (A-E)
-            distancias = {
-                letra: abs(x - pos)
-                for letra, pos in posicoes_colunas_por_bloco[coluna].items()
-            }
-            alternativa = min(distancias, key=distancias.get)
-            
-            if distancias[alternativa] <= margem_coluna:
-                gabarito_completo[coluna][questao]['respostas'][alternativa] = (num_marcacao, x, y, cnt)
-    
-    # Verificar dupla marcação
-    questoes_invalidas = []
-    for coluna in range(num_colunas):
-        for questao in range(1, num_questoes_por_coluna + 1):
-            respostas = [
-                letra for letra in letras_colunas
-                if gabarito_completo[coluna][questao]['respostas'][letra] is not None
-            ]
-            
-            if len(respostas) > 1:
-                gabarito_completo[coluna][questao]['valida'] = False
-                questao_real = questao + (coluna * num_questoes_por_coluna)
-                questoes_invalidas.append({
-                    'questao': questao_real,
-                    'respostas': respostas,
-                    'tipo': 'dupla_marcacao'
-                })
-    
-    # Gerar lista de respostas
-    respostas = []
-    respostas_invalidas_count = 0
-    questoes_sem_marcacao_count = 0
-    
-    for coluna in range(num_colunas):
-        for questao in range(1, num_questoes_por_coluna + 1):
-            questao_real = questao + (coluna * num_questoes_por_coluna)
-            
-            respostas_marcadas = [
-                letra for letra in letras_colunas
-                if gabarito_completo[coluna][questao]['respostas'][letra] is not None
-            ]
-            
-            if len(respostas_marcadas) == 0:
-                questoes_sem_marcacao_count += 1
-                resposta_str = ""
-            elif len(respostas_marcadas) > 1:
-                respostas_invalidas_count += 1
-                resposta_str = ",".join(sorted(respostas_marcadas))
-            else:
-                resposta_str = respostas_marcadas[0]
-            
-            respostas.append({
-                "Questão": str(questao_real),
-                "Resposta": resposta_str,
-                "Valida": len(respostas_marcadas) == 1
-            })
-    
-    return {
-        'respostas': respostas,
-        'total_bolhas_detectadas': len(centroides),
-        'questoes_com_dupla_marcacao': respostas_invalidas_count,
-        'questoes_sem_marcacao': questoes_sem_marcacao_count,
-        'questoes_validas': len(respostas) - respostas_invalidas_count - questoes_sem_marcacao_count,
-        'questoes_invalidas_detalhes': questoes_invalidas
-    }
+    return ler_bolhas(answer_area_image, LAYOUT_ENEM_90, motor)
 
 
-def processar_imagem_enem_mobile(caminho_imagem):
+def processar_imagem_enem_mobile(caminho_imagem, contexto=None, resultado_yolo=None):
     """
     Pipeline completo para processar folha ENEM capturada no mobile
     
     Args:
         caminho_imagem: Caminho da imagem capturada
+        contexto: ContextoImagem já criado para este upload (ex.: pela detecção do tipo);
+                  sem ele o arquivo é lido aqui. A imagem é decodificada uma única vez
+                  e compartilhada entre YOLO, OCR e bolhas.
+        resultado_yolo: Resultado de detect_rois já obtido para este contexto
+                        (ex.: na classificação do tipo); sem ele o YOLO roda aqui
         
     Returns:
-        dict: Resultado completo {sucesso, dia_detectado, questao_inicial, questao_final, respostas, ...}
+        dict: Resultado completo {sucesso, dia_detectado, questao_inicial, questao_final, respostas, timings_ms, ...}
     """
+    cronometro = contexto.cronometro if contexto is not None else Cronometro()
+    resultado = _processar_imagem_enem_mobile(caminho_imagem, contexto, resultado_yolo, cronometro)
+    resultado['timings_ms'] = cronometro.como_dict()
+    cronometro.registrar_log('enem-mobile')
+    return resultado
+
+
+def _processar_imagem_enem_mobile(caminho_imagem, contexto, resultado_yolo, cronometro):
     try:
-        # 1. Detectar ROIs usando YOLO
-        print("[ENEM-MOBILE] Detectando ROIs com YOLO...", file=sys.stderr)
-        resultado_yolo = detect_rois(caminho_imagem)
+        if contexto is None:
+            contexto = ContextoImagem.de_arquivo(caminho_imagem, cronometro)
+        
+        # 1. Detectar ROIs usando YOLO (a não ser que a classificação já tenha detectado)
+        if resultado_yolo is None:
+            print("[ENEM-MOBILE] Detectando ROIs com YOLO...", file=sys.stderr)
+            resultado_yolo = detect_rois(contexto, cronometro)
         
         if not resultado_yolo['sucesso']:
             return {
@@ -264,13 +94,8 @@ def processar_imagem_enem_mobile(caminho_imagem):
                 'erro': f"ROIs incompletas. Detectado: {list(rois.keys())}. Necessário: day_region e answer_area_enem."
             }
         
-        # 2. Carregar imagem original
-        img = cv2.imread(caminho_imagem)
-        if img is None:
-            with open(caminho_imagem, 'rb') as f:
-                dados = bytearray(f.read())
-            nparr = np.asarray(dados, dtype=np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # 2. Mesma imagem (EXIF aplicado) em que o YOLO encontrou as ROIs
+        img = contexto.bgr
         
         # 3. Recortar e processar day_region com OCR
         print("[ENEM-MOBILE] Executando OCR na day_region...", file=sys.stderr)
@@ -278,7 +103,8 @@ def processar_imagem_enem_mobile(caminho_imagem):
         x, y, w, h = day_region_bbox
         day_region_img = img[y:y+h, x:x+w]
         
-        resultado_ocr = detect_day_from_image(day_region_img)
+        with cronometro.etapa('ocr'):
+            resultado_ocr = detect_day_from_image(day_region_img)
         
         if not resultado_ocr['sucesso']:
             return {
@@ -297,7 +123,8 @@ def processar_imagem_enem_mobile(caminho_imagem):
         answer_area_img = img[y:y+h, x:x+w]
         
         # 5. Processar bolhas
-        resultado_bolhas = processar_bolhas_answer_area(answer_area_img)
+        with cronometro.etapa('bolhas'):
+            resultado_bolhas = processar_bolhas_answer_area(answer_area_img)
         
         # 6. Ajustar números das questões baseado no dia detectado
         respostas = resultado_bolhas['respostas']
@@ -326,6 +153,8 @@ def processar_imagem_enem_mobile(caminho_imagem):
             'questao_final': questao_final,
             'confianca_ocr': resultado_ocr['confianca'],
             'texto_dia_extraido': resultado_ocr['texto_extraido'],
+            'metodo_dia': resultado_ocr.get('metodo'),
+            'classificador_dia': get_estatisticas_classificador(),
             'total_respostas': len(respostas),
             'total_bolhas_detectadas': resultado_bolhas['total_bolhas_detectadas'],
             'questoes_com_dupla_marcacao': resultado_bolhas['questoes_com_dupla_marcacao'],
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Registro dos módulos pesados por processo (detector YOLO, OCR)
+Cada módulo é importado uma única vez e fica em sys.modules, de modo que
+detectar_tipo_imagem, o pipeline ENEM e o worker compartilham a mesma instância
+e, portanto, o mesmo modelo ONNX carregado. Quando o import normal falha, o
+arquivo ao lado do script é carregado (cópia do deploy) e registrado com o mesmo nome.
+
+Os tempos de importação e de carregamento do modelo ficam registrados aqui,
+separados do custo por imagem (timings_ms de cada resultado).
+"""
+
+import sys
+import time
+import importlib
+import importlib.util
+import threading
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+_LOCK = threading.RLock()
+_TEMPOS_IMPORTACAO_MS = {}
+
+
+def carregar_modulo(nome):
+    """
+    Importa o módulo uma vez por processo.
+
+    Raises:
+        ImportError: se o módulo não existir nem no path nem ao lado do script
+    """
+    with _LOCK:
+        if nome in sys.modules:
+            return sys.modules[nome]
+
+        inicio = time.perf_counter()
+        try:
+            modulo = importlib.import_module(nome)
+        except ImportError:
+            caminho = SCRIPT_DIR / f"{nome}.py"
+            if not caminho.exists():
+                raise
+            spec = importlib.util.spec_from_file_location(nome, caminho)
+            modulo = importlib.util.module_from_spec(spec)
+            # Registrar antes de executar: imports posteriores recebem esta mesma instância
+            sys.modules[nome] = modulo
+            try:
+                spec.loader.exec_module(modulo)
+            except Exception:
+                del sys.modules[nome]
+                raise
+        _TEMPOS_IMPORTACAO_MS[nome] = round((time.perf_counter() - inicio) * 1000, 2)
+        return modulo
+
+
+def carregar_detector(carregar_modelo=False):
+    """
+    Módulo detector_yolo_enem compartilhado; com carregar_modelo=True também carrega o ONNX
+    (load_model guarda o modelo no módulo, então todos os chamadores usam o mesmo).
+    """
+    detector = carregar_modulo('detector_yolo_enem')
+    if carregar_modelo:
+        detector.load_model()
+    return detector
+
+
+def tempos_carregamento():
+    """
+    Returns:
+        dict: {importacao_ms: {modulo: ms}, modelo_ms: ms ou None se o modelo ainda não foi carregado}
+    """
+    detector = sys.modules.get('detector_yolo_enem')
+    info = detector.get_backend_info() if detector is not None else None
+    return {
+        'importacao_ms': dict(_TEMPOS_IMPORTACAO_MS),
+        'modelo_ms': info.get('tempo_carregamento_ms') if info else None
+    }
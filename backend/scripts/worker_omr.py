@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Worker OMR persistente
+Mantém cv2/numpy e os scripts de processamento carregados (e o modelo YOLO,
+quando disponível) e atende jobs em JSON Lines pelo stdin.
+
+Protocolo:
+    Entrada (uma linha por job): {"id": "...", "caminho": "...", "modo": "..."}
+    Saída (uma linha por job):   {"id": "...", "sucesso": ..., ...}
+
+Modos suportados:
+    "detectar"                      -> mesmo JSON de detectar_tipo_imagem.py
+    "original"                      -> processar_respostas_Imagem_original.py
+    "processada"                    -> processar_respostas_imagem_processadas.py
+    "enem_completo"/"enem_recorte"  -> processar_respostas_enem_mobile.py
+    "auto"                          -> processar_respostas_auto.py (classifica e processa
+                                       com uma decodificação e uma inferência YOLO)
+
+Ao iniciar, emite {"evento": "pronto"} quando os módulos estiverem carregados,
+com o tempo de inicialização e, separados, os tempos de importação dos módulos
+e de carregamento do modelo (o custo por imagem vem em timings_ms de cada job).
+"""
+
+import sys
+import json
+import os
+import time
+from pathlib import Path
+
+_INICIO = time.perf_counter()
+
+SCRIPT_DIR = Path(__file__).parent
+if str(SCRIPT_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPT_DIR))
+
+# stdout fica reservado para o protocolo; qualquer print dos módulos vai para stderr
+_SAIDA_PROTOCOLO = sys.stdout
+sys.stdout = sys.stderr
+
+import detectar_tipo_imagem
+import processar_respostas_Imagem_original
+import processar_respostas_imagem_processadas
+import processar_respostas_auto
+from registro_modulos import carregar_detector, tempos_carregamento
+
+# O pipeline ENEM depende do detector YOLO/OCR, que pode não estar presente
+processar_respostas_enem_mobile = None
+erro_enem = None
+try:
+    import processar_respostas_enem_mobile
+except Exception as e:
+    erro_enem = str(e)
+    print(f"[WORKER-OMR] Pipeline ENEM indisponível: {e}", file=sys.stderr)
+
+
+def aquecer_modelo():
+    """
+    Carrega o modelo YOLO antecipadamente para que o primeiro job não pague o custo.
+    """
+    try:
+        carregar_detector(carregar_modelo=True)
+        print("[WORKER-OMR] Modelo YOLO carregado", file=sys.stderr)
+    except Exception as e:
+        print(f"[WORKER-OMR] Modelo YOLO não carregado: {e}", file=sys.stderr)
+
+
+def executar_job(modo, caminho_imagem):
+    """
+    Executa um job no processo atual, reaproveitando os módulos já importados.
+
+    Args:
+        modo: Tipo de processamento (ver docstring do módulo)
+        caminho_imagem: Caminho da imagem a processar
+
+    Returns:
+        dict: Resultado no mesmo formato do script correspondente
+    """
+    if not caminho_imagem or not os.path.exists(caminho_imagem):
+        return {
+            'sucesso': False,
+            'erro': f'Arquivo não encontrado: {caminho_imagem}'
+        }
+
+    if modo == 'detectar':
+        tipo = detectar_tipo_imagem.detectar_tipo_imagem(caminho_imagem)
+        return {
+            'sucesso': True,
+            'tipo': tipo,
+            'requer_processamento': tipo == 'original'
+        }
+
+    if modo == 'original':
+        return processar_respostas_Imagem_original.processar_imagem(caminho_imagem)
+
+    if modo == 'processada':
+        return processar_respostas_imagem_processadas.processar_imagem(caminho_imagem)
+
+    if modo == 'auto':
+        return processar_respostas_auto.processar_imagem_auto(caminho_imagem)
+
+    if modo in ('enem_completo', 'enem_recorte'):
+        if processar_respostas_enem_mobile is None:
+            return {
+                'sucesso': False,
+                'erro': f'Pipeline ENEM indisponível neste worker: {erro_enem}'
+            }
+        return processar_respostas_enem_mobile.processar_imagem_enem_mobile(caminho_imagem)
+
+    return {
+        'sucesso': False,
+        'erro': f'Modo desconhecido: {modo}'
+    }
+
+
+def responder(resultado):
+    _SAIDA_PROTOCOLO.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    _SAIDA_PROTOCOLO.flush()
+
+
+def main():
+    aquecer_modelo()
+    inicializacao_ms = round((time.perf_counter() - _INICIO) * 1000, 1)
+    carregamento = tempos_carregamento()
+    print(f"[WORKER-OMR] Pronto em {inicializacao_ms} ms (modelo: {carregamento['modelo_ms']} ms)", file=sys.stderr)
+    responder({
+        'evento': 'pronto',
+        'pid': os.getpid(),
+        'inicializacao_ms': inicializacao_ms,
+        'carregamento': carregamento
+    })
+
+    for linha in sys.stdin:
+        linha = linha.strip()
+        if not linha:
+            continue
+
+        job_id = None
+        try:
+            job = json.loads(linha)
+            job_id = job.get('id')
+            inicio = time.perf_counter()
+            resultado = executar_job(job.get('modo'), job.get('caminho'))
+            resultado['tempo_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+        except Exception as e:
+            resultado = {
+                'sucesso': False,
+                'erro': str(e)
+            }
+
+        resultado['id'] = job_id
+        responder(resultado)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+/**
+ * Pool de workers Python persistentes para processamento de imagens (OMR)
+ *
+ * Cada worker executa backend/scripts/worker_omr.py, que mantém cv2/numpy e o
+ * modelo YOLO carregados e recebe jobs em JSON Lines pelo stdin. Assim cada
+ * upload paga apenas o tempo de visão computacional, e não o de inicializar o
+ * Python a cada chamada.
+ *
+ * Variáveis de ambiente:
+ * - OMR_WORKERS: quantidade de workers (padrão: 1, 0 desativa o pool)
+ * - OMR_WORKER_TIMEOUT_MS: tempo máximo por job, contando a espera na fila (padrão: 120000).
+ *   Um job expirado é rejeitado como erro comum (sem erroWorker): a imagem não é
+ *   reprocessada pelo script avulso
+ */
+
+const path = require('path');
+const readline = require('readline');
+const { spawn } = require('child_process');
+
+const WORKER_SCRIPT = path.join(__dirname, '../scripts/worker_omr.py');
+const TAMANHO_POOL = parseInt(process.env.OMR_WORKERS ?? '1', 10);
+const TIMEOUT_JOB_MS = parseInt(process.env.OMR_WORKER_TIMEOUT_MS || '120000', 10);
+
+const workers = [];
+const filaJobs = [];
+let proximoJobId = 1;
+let poolEncerrado = false;
+
+/**
+ * Indica se o pool está habilitado pela configuração
+ * @returns {boolean}
+ */
+function poolHabilitado() {
+  return Number.isInteger(TAMANHO_POOL) && TAMANHO_POOL > 0;
+}
+
+/**
+ * Inicia um novo processo worker e registra os handlers de saída
+ * @returns {Object} - Estado do worker
+ */
+function iniciarWorker() {
+  const pythonCommand = process.platform === 'win32' ? 'python' : 'python3';
+  const proc = spawn(pythonCommand, [WORKER_SCRIPT], {
+    stdio: ['pipe', 'pipe', 'pipe']
+  });
+
+  const worker = { proc, pronto: false, encerrando: false, jobAtual: null };
+  workers.push(worker);
+
+  readline.createInterface({ input: proc.stdout }).on('line', (linha) => {
+    let mensagem;
+    try {
+      mensagem = JSON.parse(linha);
+    } catch (err) {
+      console.log('[OMR-WORKER] Saída não-JSON ignorada:', linha);
+      return;
+    }
+
+    if (mensagem.evento === 'pronto') {
+      worker.pronto = true;
+      const modeloMs = mensagem.carregamento ? mensagem.carregamento.modelo_ms : null;
+      console.log(`[OMR-WORKER] Worker pronto (pid ${mensagem.pid}, inicialização ${mensagem.inicializacao_ms}ms, modelo ${modeloMs}ms)`);
+      despachar();
+      return;
+    }
+
+    const job = worker.jobAtual;
+    if (!job || mensagem.id !== job.id) {
+      console.log('[OMR-WORKER] Resposta sem job correspondente ignorada');
+      return;
+    }
+
+    clearTimeout(job.timer);
+    worker.jobAtual = null;
+    delete mensagem.id;
+    job.resolve(mensagem);
+    despachar();
+  });
+
+  proc.stderr.on('data', (dados) => {
+    const texto = dados.toString().trim();
+    if (texto) {
+      console.log('[OMR-WORKER] Stderr do Python:', texto);
+    }
+  });
+
+  const encerrar = (motivo) => {
+    const indice = workers.indexOf(worker);
+    if (indice === -1) return;
+    workers.splice(indice, 1);
+
+    if (worker.jobAtual) {
+      clearTimeout(worker.jobAtual.timer);
+      const erro = new Error(`Worker Python encerrado: ${motivo}`);
+      erro.erroWorker = true;
+      worker.jobAtual.reject(erro);
+      worker.jobAtual = null;
+    }
+
+    // Se o worker morreu antes de ficar pronto (Python ausente, import falhou),
+    // falhar os jobs pendentes em vez de tentar reiniciar em loop
+    if (!worker.pronto) {
+      while (filaJobs.length > 0) {
+        const job = filaJobs.shift();
+        clearTimeout(job.timer);
+        const erro = new Error(`Worker Python não iniciou: ${motivo}`);
+        erro.erroWorker = true;
+        job.reject(erro);
+      }
+      return;
+    }
+
+    // Workers novos são criados sob demanda no próximo despacho
+    despachar();
+  };
+
+  proc.on('error', (err) => encerrar(err.message));
+  proc.on('exit', (code, signal) => encerrar(`código ${code}${signal ? `, sinal ${signal}` : ''}`));
+
+  return worker;
+}
+
+/**
+ * Distribui jobs pendentes para workers livres, iniciando workers se necessário
+ */
+function despachar() {
+  if (poolEncerrado) return;
+  while (filaJobs.length > 0) {
+    const livre = workers.find((w) => w.pronto && !w.encerrando && !w.jobAtual);
+
+    if (!livre) {
+      if (workers.length < TAMANHO_POOL) {
+        iniciarWorker();
+      }
+      return;
+    }
+
+    const job = filaJobs.shift();
+    livre.jobAtual = job;
+
+    livre.proc.stdin.write(JSON.stringify({
+      id: job.id,
+      modo: job.modo,
+      caminho: job.caminho
+    }) + '\n');
+  }
+}
+
+/**
+ * Rejeita um job que excedeu TIMEOUT_JOB_MS, esteja ele na fila ou em execução.
+ * O worker que o executava é reiniciado (não há como interromper só o job).
+ * @param {Object} job - Job expirado
+ */
+function expirarJob(job) {
+  const erro = new Error(`Processamento da imagem excedeu ${TIMEOUT_JOB_MS}ms`);
+  erro.timeout = true;
+
+  const indiceFila = filaJobs.indexOf(job);
+  if (indiceFila !== -1) {
+    filaJobs.splice(indiceFila, 1);
+    console.error(`[OMR-WORKER] Job ${job.id} excedeu ${TIMEOUT_JOB_MS}ms aguardando na fila`);
+    job.reject(erro);
+    return;
+  }
+
+  const worker = workers.find((w) => w.jobAtual === job);
+  if (!worker) return;
+  console.error(`[OMR-WORKER] Job ${job.id} excedeu ${TIMEOUT_JOB_MS}ms, reiniciando worker`);
+  // Rejeitado aqui, e não no 'exit', para não ser tratado como falha do worker
+  worker.jobAtual = null;
+  worker.encerrando = true;
+  job.reject(erro);
+  worker.proc.kill();
+}
+
+/**
+ * Executa um job em um worker do pool
+ * @param {string} modo - 'auto', 'detectar', 'original', 'processada', 'enem_completo' ou 'enem_recorte'
+ * @param {string} imagemPath - Caminho da imagem
+ * @returns {Promise<Object>} - JSON retornado pelo worker
+ */
+function executarNoWorker(modo, imagemPath) {
+  if (!poolHabilitado()) {
+    const erro = new Error('Pool de workers Python desativado (OMR_WORKERS=0)');
+    erro.erroWorker = true;
+    return Promise.reject(erro);
+  }
+  if (poolEncerrado) {
+    return Promise.reject(new Error('Servidor encerrando: pool de workers Python finalizado'));
+  }
+
+  return new Promise((resolve, reject) => {
+    const job = {
+      id: String(proximoJobId++),
+      modo,
+      caminho: path.resolve(imagemPath),
+      resolve,
+      reject,
+      timer: null
+    };
+    // O prazo vale desde a entrada na fila, não só a partir do despacho
+    job.timer = setTimeout(() => expirarJob(job), TIMEOUT_JOB_MS);
+    filaJobs.push(job);
+    despachar();
+  });
+}
+
+/**
+ * Encerra todos os workers (usado no shutdown do servidor). Jobs na fila e em
+ * execução são rejeitados como erro comum (sem erroWorker), para não caírem no
+ * script avulso enquanto o servidor sai, e nenhum worker novo é iniciado.
+ */
+function encerrarWorkers() {
+  if (poolEncerrado) return;
+  poolEncerrado = true;
+  const erro = new Error('Servidor encerrando: job de OMR cancelado');
+
+  while (filaJobs.length > 0) {
+    const job = filaJobs.shift();
+    clearTimeout(job.timer);
+    job.reject(erro);
+  }
+
+  for (const worker of [...workers]) {
+    if (worker.jobAtual) {
+      clearTimeout(worker.jobAtual.timer);
+      worker.jobAtual.reject(erro);
+      worker.jobAtual = null;
+    }
+    worker.encerrando = true;
+    worker.proc.kill();
+  }
+  if (workers.length > 0) {
+    console.log(`[OMR-WORKER] Encerrando ${workers.length} worker(s)`);
+  }
+}
+
+module.exports = {
+  executarNoWorker,
+  encerrarWorkers,
+  poolHabilitado
+};
@@ -13,11 +13,13 @@ if command -v python3 &> /dev/null; then
     echo "✓ Python3 encontrado"
     python3 -m pip install --upgrade pip
     python3 -m pip install -r ../backend/scripts/requirements.txt
+    python3 -m pip install -r ../backend/scripts/requirements-ocr.txt || echo "⚠️  tesserocr não instalado (opcional); o OCR do dia usará pytesseract"
     echo "✅ Dependências Python instaladas com sucesso"
 elif command -v python &> /dev/null; then
     echo "✓ Python encontrado"
     python -m pip install --upgrade pip
     python -m pip install -r ../backend/scripts/requirements.txt
+    python -m pip install -r ../backend/scripts/requirements-ocr.txt || echo "⚠️  tesserocr não instalado (opcional); o OCR do dia usará pytesseract"
     echo "✅ Dependências Python instaladas com sucesso"
 else
     echo "⚠️  Python não encontrado. Verificando se está instalado no sistema..."
@@ -1,24 +1,33 @@
 import gradio as gr
+from starlette.middleware import Middleware
 import cv2
 import numpy as np
 from PIL import Image
 import json
 import sys
 import os
+import functools
 
 # Adicionar diretório de scripts ao path para importar módulos Python
 sys.path.append(os.path.dirname(__file__))
 
+from leitor_bolhas import ler_bolhas, LAYOUT_ENEM_90
+from cronometro import Cronometro
+from contexto_imagem import ContextoImagem
+from fila_requisicoes import Fila, LoteDeteccao, CarimboChegada
+from modo_ao_vivo import AO_VIVO
+
 # Importar funções do detector YOLO e OCR
 modules_error = None
 try:
-    from detector_yolo_enem import detect_enem_sheet
-    from ocr_day_detector import detect_day_from_image
+    from detector_yolo_enem import detect_enem_sheet, detect_enem_sheet_batch, render_debug_overlay, DEBUG_MODE
+    from ocr_day_detector import detect_day_from_image, get_ocr_backend_info, get_estatisticas_classificador
 except ImportError as e:
     modules_error = str(e)
     print(f"ERRO CRÍTICO DE IMPORTAÇÃO: {e}")
     import traceback
     traceback.print_exc()
+    DEBUG_MODE = False
     
     # Definir funções dummy para retornar o erro na API
     def detect_enem_sheet(*args, **kwargs):
@@ -27,31 +36,103 @@ except ImportError as e:
     def detect_day_from_image(*args, **kwargs):
         raise ImportError(f"Falha ao carregar módulos no servidor: {modules_error}")
 
-def process_frame(image):
+    def detect_enem_sheet_batch(*args, **kwargs):
+        raise ImportError(f"Falha ao carregar módulos no servidor: {modules_error}")
+
+    def render_debug_overlay(*args, **kwargs):
+        raise ImportError(f"Falha ao carregar módulos no servidor: {modules_error}")
+
+    def get_ocr_backend_info():
+        return None
+
+    def get_estatisticas_classificador():
+        return None
+
+# Fila e concorrência (ver fila_requisicoes.py)
+FILA_TAMANHO_MAXIMO = int(os.environ.get("FILA_TAMANHO_MAXIMO", "64"))  # Requisições pendentes na fila do Gradio
+FILA_DETECT_LOTE = int(os.environ.get("FILA_DETECT_LOTE", "8"))  # Frames por chamada ao detector no /detect
+FILA_DETECT_JANELA_MS = float(os.environ.get("FILA_DETECT_JANELA_MS", "10"))  # Espera máxima para completar um lote
+FILA_PROCESS_CONCORRENCIA = int(os.environ.get("FILA_PROCESS_CONCORRENCIA", "2"))  # /process e /process_batch simultâneos
+
+# Os frames do /detect chegam em RGB (gr.Image numpy) e vão ao blob sem conversão de cor
+LOTE_DETECT = LoteDeteccao(functools.partial(detect_enem_sheet_batch, ordem_canais='rgb'),
+                           FILA_DETECT_LOTE, FILA_DETECT_JANELA_MS)
+# O limite de /process e /process_batch é o concurrency_limit do Gradio (concurrency_id
+# compartilhado): quem aguarda fica na fila do Gradio sem ocupar uma thread. FILA_PROCESS só conta
+# e mede a espera nessa fila (chegada carimbada por CarimboChegada)
+FILA_PROCESS = Fila("process", FILA_PROCESS_CONCORRENCIA, limitar=False,
+                    contar_aguardando=lambda: eventos_pendentes_gradio("process"))
+
+def eventos_pendentes_gradio(concurrency_id):
+    """
+    Eventos aguardando vaga na fila do Gradio para o concurrency_id (ainda não iniciados)
+    
+    Returns:
+        int ou None: None sem fila ativa ou se a estrutura interna do Gradio mudou
+    """
+    fila = getattr(globals().get("demo"), "_queue", None)
+    filas = getattr(fila, "event_queue_per_concurrency_id", None)
+    if filas is None:
+        return None
+    fila_id = filas.get(concurrency_id)
+    return len(fila_id.queue) if fila_id is not None else 0
+
+def chegada_requisicao(request):
+    """time.perf_counter() da chegada da requisição ao servidor (None fora do launch deste app)"""
+    return getattr(getattr(request, "state", None), "chegada", None)
+
+def imagem_rgb_entrada(image):
+    """
+    Array RGB uint8 de uma entrada do Gradio, sem cópia quando já é um array RGB
+    (gr.Image type="numpy"). Nenhuma conversão para BGR: o detector monta o blob
+    direto do RGB e só os recortes usados por OCR/bolhas são convertidos.
+    
+    Args:
+        image: numpy RGB/cinza/RGBA ou PIL Image
+        
+    Returns:
+        np.ndarray: Imagem RGB (HxWx3)
+    """
+    if isinstance(image, Image.Image):
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return np.asarray(image)
+    if image is None:
+        raise ValueError("Nenhuma imagem recebida")
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
+    return image
+
+def process_frame(image, debug=False, cliente_id=""):
     """
     Processa um frame da câmera mobile para detecção YOLO rápida
+    Frames que chegam ao mesmo tempo são detectados juntos (LOTE_DETECT); com
+    cliente_id, frames sem movimento reaproveitam a última detecção (AO_VIVO)
     
     Args:
-        image: PIL Image ou numpy array
+        image: numpy RGB (gr.Image type="numpy") ou PIL Image
+        debug: Se True, inclui o overlay (debug_base64) nesta resposta
+        cliente_id: Identificador da sessão de câmera (vazio: YOLO em todo frame)
     
     Returns:
-        dict: Resultado com detecções e feedback
+        dict: Resultado com detecções, feedback e a espera na fila
     """
+    cronometro = Cronometro()
     try:
-        # Converter PIL Image para numpy array se necessário
-        if isinstance(image, Image.Image):
-            image_np = np.array(image)
-        else:
-            image_np = image
-            
-        # Converter RGB para BGR (OpenCV usa BGR)
-        if len(image_np.shape) == 3 and image_np.shape[2] == 3:
-            image_bgr = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR)
-        else:
-            image_bgr = image_np
+        with cronometro.etapa('conversao_entrada'):
+            image_rgb = imagem_rgb_entrada(image)
         
-        # Executar detecção YOLO
-        resultado = detect_enem_sheet(image_bgr)
+        # Executar detecção YOLO (em lote com os frames concorrentes) só se a cena mudou
+        fila = None
+        def detectar(img, cron):
+            nonlocal fila
+            resultado_yolo, fila = LOTE_DETECT.submeter(img, cron)
+            return resultado_yolo
+        resultado = AO_VIVO.detectar((cliente_id or '').strip(), image_rgb, cronometro, detectar, 'rgb')
+        if (debug or DEBUG_MODE) and resultado.get('deteccao_id'):
+            resultado['debug_base64'] = render_debug_overlay(resultado['deteccao_id']).get('debug_base64')
         
         # Gerar feedback para UI
         feedback = "Procurando folha ENEM..."
@@ -60,13 +141,24 @@ def process_frame(image):
         elif resultado.get('rois') and len(resultado['rois']) > 0:
             feedback = "Centralize melhor a folha"
         
-        return {
+        resposta = {
             "sucesso": True,
             "detectado": resultado.get('detectado', False),
             "rois": resultado.get('rois', {}),
             "feedback": feedback,
-            "total_deteccoes": resultado.get('total_deteccoes', 0)
+            "total_deteccoes": resultado.get('total_deteccoes', 0),
+            "backend_inferencia": resultado.get('backend_inferencia'),
+            "tempo_inferencia_ms": resultado.get('tempo_inferencia_ms'),
+            "timings_ms": resultado.get('timings_ms'),
+            "deteccao_id": resultado.get('deteccao_id'),
+            "fila": fila,
+            "ao_vivo": resultado.get('ao_vivo'),
+            "alocacoes_kb": cronometro.alocacoes_kb()
         }
+        if 'debug_base64' in resultado:
+            resposta["debug_base64"] = resultado['debug_base64']
+        
+        return resposta
         
     except Exception as e:
         return {
@@ -76,33 +168,150 @@ def process_frame(image):
             "feedback": "Erro ao processar imagem"
         }
 
-def process_full_capture(image):
+def status_fila():
+    """
+    Estado das filas: requisições aguardando/em execução, espera média e máxima
+    (no /process, aguardando e espera são os da fila do Gradio) e frames por lote do /detect
+    
+    Returns:
+        dict: {detect, process, ao_vivo, tamanho_maximo}
+    """
+    return {
+        "sucesso": True,
+        "detect": LOTE_DETECT.estatisticas(),
+        "process": FILA_PROCESS.estatisticas(),
+        "ao_vivo": AO_VIVO.estatisticas(),
+        "tamanho_maximo": FILA_TAMANHO_MAXIMO
+    }
+
+def debug_overlay(deteccao_id):
+    """
+    Renderiza sob demanda o overlay de uma detecção recente (/detect ou /process)
+    
+    Args:
+        deteccao_id: Valor de 'deteccao_id' retornado pela detecção
+        
+    Returns:
+        dict: {sucesso, debug_base64} ou {sucesso: False, erro}
+    """
+    try:
+        return render_debug_overlay((deteccao_id or '').strip())
+    except Exception as e:
+        return {"sucesso": False, "erro": str(e)}
+
+def process_full_capture(image, request: gr.Request = None):
     """
     Processa captura completa com YOLO + OCR + detecção de bolhas
     Pipeline completo: detector_yolo_enem → ocr_day_detector → processar bolhas
     
     Args:
-        image: PIL Image
+        image: numpy RGB (gr.Image type="numpy") ou PIL Image
+        request: Requisição (injetada pelo Gradio), para medir a espera na fila
         
     Returns:
         dict: Resultado completo com dia detectado, respostas, etc.
     """
+    cronometro = Cronometro()
     try:
-        # Converter para numpy array BGR
-        if isinstance(image, Image.Image):
-            image_np = np.array(image)
-        else:
-            image_np = image
+        # O Gradio já entrega a imagem decodificada em RGB; nenhuma cópia/conversão da imagem inteira
+        with cronometro.etapa('conversao_entrada'):
+            image_rgb = imagem_rgb_entrada(image)
+        
+        with FILA_PROCESS.entrar(chegada_requisicao(request)) as fila:
+            # 1. Detecção YOLO (lote de uma imagem; mesmo caminho de /process_batch)
+            resultado_yolo = detect_enem_sheet_batch([image_rgb], [cronometro], ordem_canais='rgb')[0]
             
-        image_bgr = cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR) if len(image_np.shape) == 3 else image_np
+            resultado = processar_capture_detectada(image_rgb, resultado_yolo, cronometro, ordem_canais='rgb')
+        resultado["fila"] = fila
+        resultado["alocacoes_kb"] = cronometro.alocacoes_kb()
+        return resultado
+        
+    except Exception as e:
+        import traceback
+        return {
+            "sucesso": False,
+            "erro": str(e),
+            "traceback": traceback.format_exc()
+        }
+
+
+def process_full_capture_batch(arquivos, request: gr.Request = None):
+    """
+    Processa várias capturas completas com um único forward YOLO por lote
+    
+    Args:
+        arquivos: Lista de caminhos de imagem (upload múltiplo do Gradio)
+        request: Requisição (injetada pelo Gradio), para medir a espera na fila
         
-        # 1. Detecção YOLO
-        resultado_yolo = detect_enem_sheet(image_bgr)
+    Returns:
+        list: Um resultado por imagem, no mesmo formato de process_full_capture
+    """
+    if not arquivos:
+        return []
+    
+    # O lote inteiro ocupa uma vaga do concurrency_id "process"
+    with FILA_PROCESS.entrar(chegada_requisicao(request)) as fila:
+        resultados = _processar_lote_capturas(arquivos)
+    for resultado in resultados:
+        resultado["fila"] = fila
+    return resultados
+
+
+def _processar_lote_capturas(arquivos):
+    caminhos = [a if isinstance(a, str) else getattr(a, 'name', a) for a in arquivos]
+    imagens = []
+    resultados = [None] * len(caminhos)
+    # Um cronômetro por imagem; "total" de cada uma é o tempo desde o início do lote
+    cronometros = [Cronometro() for _ in caminhos]
+    
+    for i, caminho in enumerate(caminhos):
+        try:
+            # Só a leitura do arquivo: o YOLO decodifica o JPEG já reduzido e a
+            # resolução total só é decodificada para os recortes de OCR/bolhas
+            imagens.append((i, ContextoImagem.de_arquivo(caminho, cronometros[i])))
+        except Exception as e:
+            resultados[i] = {"sucesso": False, "erro": f"Erro ao carregar imagem: {e}",
+                             "timings_ms": cronometros[i].como_dict()}
+    
+    try:
+        deteccoes = detect_enem_sheet_batch([img for _, img in imagens], [cronometros[i] for i, _ in imagens])
+    except Exception as e:
+        deteccoes = [{"sucesso": False, "erro": str(e)} for _ in imagens]
+    
+    for (i, contexto), resultado_yolo in zip(imagens, deteccoes):
+        try:
+            resultados[i] = processar_capture_detectada(contexto, resultado_yolo, cronometros[i])
+        except Exception as e:
+            resultados[i] = {"sucesso": False, "erro": str(e)}
+    
+    for caminho, resultado in zip(caminhos, resultados):
+        resultado["arquivo"] = os.path.basename(str(caminho))
+    
+    return resultados
+
+
+def processar_capture_detectada(imagem, resultado_yolo, cronometro=None, ordem_canais='bgr'):
+    """
+    Etapas OCR + bolhas de uma captura completa, a partir das ROIs já detectadas
+    
+    Args:
+        imagem: Imagem completa (numpy BGR, RGB com ordem_canais='rgb', ou ContextoImagem,
+                decodificado em resolução total só se houver recortes a fazer)
+        resultado_yolo: Resultado de detect_enem_sheet/detect_enem_sheet_batch para essa imagem
+        cronometro: Cronometro da requisição (o mesmo passado para a detecção)
+        ordem_canais: 'rgb' converte só os recortes (dia e respostas) para BGR
         
+    Returns:
+        dict: Resultado completo com dia detectado, respostas, timings_ms, etc.
+    """
+    if cronometro is None:
+        cronometro = Cronometro()
+    try:
         if not resultado_yolo.get('detectado'):
             return {
                 "sucesso": False,
-                "erro": "Folha ENEM não foi detectada completamente"
+                "erro": "Folha ENEM não foi detectada completamente",
+                "timings_ms": cronometro.como_dict()
             }
         
         rois = resultado_yolo.get('rois', {})
@@ -111,31 +320,33 @@ def process_full_capture(image):
         if 'day_region' not in rois or 'answer_area_enem' not in rois:
             return {
                 "sucesso": False,
-                "erro": f"ROIs incompletas. Detectado: {list(rois.keys())}"
+                "erro": f"ROIs incompletas. Detectado: {list(rois.keys())}",
+                "timings_ms": cronometro.como_dict()
             }
         
         # 2. OCR para detectar dia
         day_bbox = rois['day_region'][0]['bbox']
-        x, y, w, h = day_bbox
-        day_region_img = image_bgr[y:y+h, x:x+w]
+        day_region_img = _recorte_bgr(imagem, day_bbox, ordem_canais)
         
-        resultado_ocr = detect_day_from_image(day_region_img)
+        with cronometro.etapa('ocr'):
+            resultado_ocr = detect_day_from_image(day_region_img)
         
         if not resultado_ocr.get('sucesso'):
             return {
                 "sucesso": False,
-                "erro": "Não foi possível detectar o dia da prova"
+                "erro": "Não foi possível detectar o dia da prova",
+                "timings_ms": cronometro.como_dict()
             }
         
         dia_detectado = resultado_ocr.get('dia')
         
         # 3. Processar área de respostas (bolhas)
         answer_bbox = rois['answer_area_enem'][0]['bbox']
-        x, y, w, h = answer_bbox
-        answer_area_img = image_bgr[y:y+h, x:x+w]
+        answer_area_img = _recorte_bgr(imagem, answer_bbox, ordem_canais)
         
         # Processar bolhas
-        resultado_bolhas = processar_bolhas_answer_area(answer_area_img)
+        with cronometro.etapa('bolhas'):
+            resultado_bolhas = processar_bolhas_answer_area(answer_area_img)
         
         # Ajustar números das questões baseado no dia
         respostas = resultado_bolhas['respostas']
@@ -162,7 +373,13 @@ def process_full_capture(image):
             "questoes_sem_marcacao": resultado_bolhas['questoes_sem_marcacao'],
             "questoes_validas": resultado_bolhas['questoes_validas'],
             "respostas": respostas,
-            "avisos": avisos
+            "avisos": avisos,
+            "backend_inferencia": resultado_yolo.get('backend_inferencia'),
+            "tempo_inferencia_ms": resultado_yolo.get('tempo_inferencia_ms'),
+            "metodo_dia": resultado_ocr.get('metodo'),
+            "backend_ocr": get_ocr_backend_info(),
+            "classificador_dia": get_estatisticas_classificador(),
+            "timings_ms": cronometro.como_dict()
         }
         
     except Exception as e:
@@ -170,190 +387,36 @@ def process_full_capture(image):
         return {
             "sucesso": False,
             "erro": str(e),
-            "traceback": traceback.format_exc()
+            "traceback": traceback.format_exc(),
+            "timings_ms": cronometro.como_dict()
         }
+    finally:
+        cronometro.registrar_log('process')
+
 
+def _recorte_bgr(imagem, bbox, ordem_canais):
+    """Recorte [x, y, w, h] em BGR; com imagem RGB só o recorte é convertido"""
+    if isinstance(imagem, ContextoImagem):
+        imagem = imagem.bgr
+    x, y, w, h = bbox
+    recorte = imagem[y:y+h, x:x+w]
+    if ordem_canais == 'rgb':
+        return cv2.cvtColor(recorte, cv2.COLOR_RGB2BGR)
+    return recorte
 
-def processar_bolhas_answer_area(answer_area_image):
+
+def processar_bolhas_answer_area(answer_area_image, motor=None):
     """
-    Detecta bolhas marcadas na answer_area_enem
-    Adaptado do processar_respostas_enem_mobile.py
+    Detecta bolhas marcadas na answer_area_enem (leitor compartilhado leitor_bolhas.py)
     
     Args:
         answer_area_image: Imagem recortada da answer_area (numpy BGR)
+        motor: 'contornos' ou 'grade' (padrão: OMR_MOTOR_BOLHAS ou 'contornos')
         
     Returns:
         dict: {respostas, total_bolhas_detectadas, questoes_com_dupla_marcacao, ...}
     """
-    # Pré-processamento
-    cinza = cv2.cvtColor(answer_area_image, cv2.COLOR_BGR2GRAY)
-    suavizada = cv2.GaussianBlur(cinza, (5, 5), 0)
-    _, binaria = cv2.threshold(suavizada, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-    
-    # Remoção de ruído
-    kernel = np.ones((5, 5), np.uint8)
-    mascara = cv2.morphologyEx(binaria, cv2.MORPH_OPEN, kernel)
-    mascara = cv2.morphologyEx(mascara, cv2.MORPH_CLOSE, kernel)
-    
-    # Detectar bolhas
-    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    # Filtrar bolhas válidas
-    area_minima = 100
-    limiar_branco = 0.70
-    bolhas_validas = []
-    
-    for contorno in contornos:
-        area = cv2.contourArea(contorno)
-        if area > area_minima:
-            perimetro = cv2.arcLength(contorno, True)
-            if perimetro == 0:
-                continue
-            
-            circularidade = 4 * np.pi * area / (perimetro ** 2)
-            if circularidade > 0.4:
-                mascara_local = np.zeros_like(mascara)
-                cv2.drawContours(mascara_local, [contorno], -1, 255, -1)
-                pixels_brancos = np.sum(mascara[mascara_local == 255] == 255)
-                total_pixels = np.sum(mascara_local == 255)
-                
-                if total_pixels > 0:
-                    proporcao_branco = pixels_brancos / total_pixels
-                    if proporcao_branco >= limiar_branco:
-                        bolhas_validas.append(contorno)
-    
-    # Ordenar bolhas por posição vertical
-    bolhas_validas = sorted(bolhas_validas, key=lambda c: cv2.boundingRect(c)[1])
-    
-    # Extrair centróides
-    centroides = []
-    for i, contorno in enumerate(bolhas_validas):
-        M = cv2.moments(contorno)
-        if M["m00"] != 0:
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-            centroides.append((cx, cy, contorno, i+1))
-    
-    # Layout ENEM: 90 questões, 5 alternativas (A-E), 3 colunas de 30
-    letras_colunas = ['A', 'B', 'C', 'D', 'E']
-    num_questoes_por_coluna = 30
-    num_colunas = 3
-    
-    altura_area, largura_area = answer_area_image.shape[:2]
-    largura_coluna = largura_area / num_colunas
-    
-    # Definir limites das colunas
-    limites_x_colunas = {}
-    posicoes_colunas_por_bloco = {}
-    
-    for col in range(num_colunas):
-        x_inicio = int(col * largura_coluna)
-        x_fim = int((col + 1) * largura_coluna)
-        limites_x_colunas[col] = (x_inicio, x_fim)
-        
-        posicoes_alt = {}
-        for idx, letra in enumerate(letras_colunas):
-            pos_x = x_inicio + (x_fim - x_inicio) * (idx + 0.5) / len(letras_colunas)
-            posicoes_alt[letra] = pos_x
-        
-        posicoes_colunas_por_bloco[col] = posicoes_alt
-    
-    margem_coluna = 20
-    
-    # Estrutura para armazenar respostas
-    gabarito_completo = {}
-    for coluna in range(num_colunas):
-        gabarito_bloco = {
-            q: {'respostas': {letra: None for letra in letras_colunas}, 'valida': True}
-            for q in range(1, num_questoes_por_coluna + 1)
-        }
-        gabarito_completo[coluna] = gabarito_bloco
-    
-    # Ordenar centróides por Y
-    centroides.sort(key=lambda x: x[1])
-    
-    # Processar cada coluna
-    for coluna in range(num_colunas):
-        centroides_coluna = [
-            (x, y, cnt, num) for (x, y, cnt, num) in centroides
-            if limites_x_colunas[coluna][0] <= x < limites_x_colunas[coluna][1]
-        ]
-        
-        if not centroides_coluna:
-            continue
-        
-        passo_y = (centroides_coluna[-1][1] - centroides_coluna[0][1]) / (num_questoes_por_coluna - 1) if len(centroides_coluna) > 1 else 1
-        
-        for x, y, cnt, num_marcacao in centroides_coluna:
-            if passo_y > 0:
-                questao = min(int(round((y - centroides_coluna[0][1]) / passo_y)) + 1, num_questoes_por_coluna)
-            else:
-                questao = 1
-            
-            distancias = {
-                letra: abs(x - pos)
-                for letra, pos in posicoes_colunas_por_bloco[coluna].items()
-            }
-            alternativa = min(distancias, key=distancias.get)
-            
-            if distancias[alternativa] <= margem_coluna:
-                gabarito_completo[coluna][questao]['respostas'][alternativa] = (num_marcacao, x, y, cnt)
-    
-    # Verificar dupla marcação
-    questoes_invalidas = []
-    for coluna in range(num_colunas):
-        for questao in range(1, num_questoes_por_coluna + 1):
-            respostas = [
-                letra for letra in letras_colunas
-                if gabarito_completo[coluna][questao]['respostas'][letra] is not None
-            ]
-            
-            if len(respostas) > 1:
-                gabarito_completo[coluna][questao]['valida'] = False
-                questao_real = questao + (coluna * num_questoes_por_coluna)
-                questoes_invalidas.append({
-                    'questao': questao_real,
-                    'respostas': respostas,
-                    'tipo': 'dupla_marcacao'
-                })
-    
-    # Gerar lista de respostas
-    respostas = []
-    respostas_invalidas_count = 0
-    questoes_sem_marcacao_count = 0
-    
-    for coluna in range(num_colunas):
-        for questao in range(1, num_questoes_por_coluna + 1):
-            questao_real = questao + (coluna * num_questoes_por_coluna)
-            
-            respostas_marcadas = [
-                letra for letra in letras_colunas
-                if gabarito_completo[coluna][questao]['respostas'][letra] is not None
-            ]
-            
-            if len(respostas_marcadas) == 0:
-                questoes_sem_marcacao_count += 1
-                resposta_str = ""
-            elif len(respostas_marcadas) > 1:
-                respostas_invalidas_count += 1
-                resposta_str = ",".join(sorted(respostas_marcadas))
-            else:
-                resposta_str = respostas_marcadas[0]
-            
-            respostas.append({
-                "Questão": str(questao_real),
-                "Resposta": resposta_str,
-                "Valida": len(respostas_marcadas) == 1
-            })
-    
-    return {
-        'respostas': respostas,
-        'total_bolhas_detectadas': len(centroides),
-        'questoes_com_dupla_marcacao': respostas_invalidas_count,
-        'questoes_sem_marcacao': questoes_sem_marcacao_count,
-        'questoes_validas': len(respostas) - respostas_invalidas_count - questoes_sem_marcacao_count,
-        'questoes_invalidas_detalhes': questoes_invalidas
-    }
+    return ler_bolhas(answer_area_image, LAYOUT_ENEM_90, motor)
 
 # Criar interface Gradio com duas abas
 with gr.Blocks(title="EduScore YOLO API") as demo:
@@ -363,21 +426,25 @@ with gr.Blocks(title="EduScore YOLO API") as demo:
     with gr.Tab("Live Detection (Rápido)"):
         gr.Markdown("### Detecção rápida para feedback em tempo real")
         with gr.Row():
-            input_frame = gr.Image(type="pil", label="Frame da Câmera")
+            input_frame = gr.Image(type="numpy", label="Frame da Câmera")
             output_frame = gr.JSON(label="Resultado")
+        input_debug = gr.Checkbox(value=False, label="Incluir overlay de debug")
+        input_cliente = gr.Textbox(value="", label="cliente_id (modo ao vivo: reaproveita a detecção com a câmera parada)")
         
         btn_detect = gr.Button("Detectar", variant="primary")
         btn_detect.click(
             fn=process_frame, 
-            inputs=input_frame, 
+            inputs=[input_frame, input_debug, input_cliente], 
             outputs=output_frame,
-            api_name="detect"  # Endpoint: /api/predict ou client.predict("/detect")
+            api_name="detect",  # Endpoint: /api/predict ou client.predict("/detect")
+            # Frames concorrentes precisam entrar juntos para o LOTE_DETECT agrupá-los
+            concurrency_limit=FILA_DETECT_LOTE * 2
         )
         
     with gr.Tab("Full Capture (Completo)"):
         gr.Markdown("### Processamento completo com OCR e extração de respostas")
         with gr.Row():
-            input_full = gr.Image(type="pil", label="Imagem Completa")
+            input_full = gr.Image(type="numpy", label="Imagem Completa")
             output_full = gr.JSON(label="Resultado Completo")
         
         btn_process = gr.Button("Processar", variant="primary")
@@ -385,7 +452,52 @@ with gr.Blocks(title="EduScore YOLO API") as demo:
             fn=process_full_capture, 
             inputs=input_full, 
             outputs=output_full,
-            api_name="process"  # Endpoint: client.predict("/process")
+            api_name="process",  # Endpoint: client.predict("/process")
+            # Vagas compartilhadas entre /process e /process_batch
+            concurrency_limit=FILA_PROCESS_CONCORRENCIA,
+            concurrency_id="process"
+        )
+
+    with gr.Tab("Lote (Várias Folhas)"):
+        gr.Markdown("### Processamento completo de várias folhas com inferência YOLO em lote")
+        with gr.Row():
+            input_batch = gr.File(file_count="multiple", type="filepath", label="Imagens")
+            output_batch = gr.JSON(label="Resultados")
+        
+        btn_batch = gr.Button("Processar Lote", variant="primary")
+        btn_batch.click(
+            fn=process_full_capture_batch, 
+            inputs=input_batch, 
+            outputs=output_batch,
+            api_name="process_batch",  # Endpoint: client.predict("/process_batch")
+            # Vagas compartilhadas entre /process e /process_batch
+            concurrency_limit=FILA_PROCESS_CONCORRENCIA,
+            concurrency_id="process"
+        )
+    
+    with gr.Tab("Debug Overlay"):
+        gr.Markdown("### Overlay das caixas de uma detecção recente (renderizado só quando solicitado)")
+        with gr.Row():
+            input_deteccao_id = gr.Textbox(label="deteccao_id")
+            output_overlay = gr.JSON(label="Overlay")
+        
+        btn_overlay = gr.Button("Renderizar", variant="secondary")
+        btn_overlay.click(
+            fn=debug_overlay, 
+            inputs=input_deteccao_id, 
+            outputs=output_overlay,
+            api_name="debug_overlay"  # Endpoint: client.predict("/debug_overlay")
+        )
+    
+    with gr.Tab("Status da Fila"):
+        gr.Markdown("### Profundidade da fila, espera e tamanho dos lotes do /detect")
+        output_status = gr.JSON(label="Status")
+        btn_status = gr.Button("Atualizar", variant="secondary")
+        btn_status.click(
+            fn=status_fila,
+            inputs=None,
+            outputs=output_status,
+            api_name="status_fila"  # Endpoint: client.predict("/status_fila")
         )
     
     gr.Markdown("---")
@@ -402,4 +514,6 @@ print(response.json())
 
 # Lançar com API pública habilitada
 if __name__ == "__main__":
-    demo.launch(share=False, server_name="0.0.0.0", server_port=7860)
+    demo.queue(max_size=FILA_TAMANHO_MAXIMO)
+    demo.launch(share=False, server_name="0.0.0.0", server_port=7860,
+                app_kwargs={"middleware": [Middleware(CarimboChegada)]})
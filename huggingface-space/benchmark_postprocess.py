@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark do post-processamento YOLO
+Compara a implementação antiga (loop Python por âncora) com a vetorizada de
+detector_yolo_enem.postprocess_detections usando uma saída sintética no
+formato do modelo (1, 6, 8400).
+
+Uso: python benchmark_postprocess.py [iteracoes] [candidatos_acima_do_limiar]
+"""
+
+import sys
+import json
+import time
+import numpy as np
+
+from detector_yolo_enem import (
+    postprocess_detections, apply_nms, preprocess_numpy_image,
+    CLASS_NAMES, CONFIDENCE_THRESHOLD, NMS_THRESHOLD
+)
+
+
+def postprocess_detections_loop(outputs, original_shape, scale, pad):
+    """Implementação original (loop por âncora), mantida apenas como referência"""
+    output = outputs[0]
+    if output.shape[1] < output.shape[2]:
+        output = np.transpose(output, (0, 2, 1))
+    output = output[0]
+
+    detections = []
+    pad_left, pad_top = pad
+
+    for row in output:
+        scores = row[4:]
+        class_id = np.argmax(scores)
+        conf = scores[class_id]
+
+        if conf > CONFIDENCE_THRESHOLD:
+            cx, cy, w, h = row[0:4]
+            x_unpad = cx - pad_left
+            y_unpad = cy - pad_top
+            x0 = (x_unpad - w/2) / scale
+            y0 = (y_unpad - h/2) / scale
+            w0 = w / scale
+            h0 = h / scale
+            height_orig, width_orig = original_shape
+            detections.append({
+                'class_id': int(class_id),
+                'class_name': CLASS_NAMES.get(int(class_id), f'class_{class_id}'),
+                'confidence': float(conf),
+                'bbox': [int(x0), int(y0), int(w0), int(h0)],
+                'bbox_norm': [x0 / width_orig, y0 / height_orig, w0 / width_orig, h0 / height_orig]
+            })
+
+    return apply_nms(detections, NMS_THRESHOLD)
+
+
+def gerar_saida_sintetica(candidatos, seed=0):
+    """
+    Gera uma saída (1, 6, 8400) com ruído de baixa confiança e alguns
+    candidatos agrupados em torno de duas caixas (answer_area e day_region).
+    """
+    rng = np.random.default_rng(seed)
+    num_anchors = 8400
+    saida = np.zeros((1, 6, num_anchors), dtype=np.float32)
+    saida[0, 0] = rng.uniform(0, 640, num_anchors)
+    saida[0, 1] = rng.uniform(0, 640, num_anchors)
+    saida[0, 2] = rng.uniform(5, 100, num_anchors)
+    saida[0, 3] = rng.uniform(5, 100, num_anchors)
+    saida[0, 4:] = rng.uniform(0, CONFIDENCE_THRESHOLD * 0.9, (2, num_anchors))
+
+    idx = rng.choice(num_anchors, candidatos, replace=False)
+    for n, i in enumerate(idx):
+        classe = n % 2
+        base = (320, 400, 500, 300) if classe == 0 else (320, 120, 200, 40)
+        saida[0, 0:4, i] = np.array(base) + rng.normal(0, 3, 4)
+        saida[0, 4 + classe, i] = rng.uniform(0.3, 0.95)
+    return saida
+
+
+def cronometrar(funcao, args, iteracoes):
+    tempos = []
+    for _ in range(iteracoes):
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        'media_ms': round(sum(tempos) / len(tempos), 3),
+        'p50_ms': round(tempos[len(tempos) // 2], 3),
+        'p95_ms': round(tempos[int(len(tempos) * 0.95) - 1], 3)
+    }
+
+
+if __name__ == "__main__":
+    iteracoes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    candidatos = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    # Frame típico de celular (1080x1920) para obter escala/padding reais
+    frame = np.zeros((1920, 1080, 3), dtype=np.uint8)
+    _, _, scale, pad = preprocess_numpy_image(frame)
+    original_shape = frame.shape[:2]
+    outputs = [gerar_saida_sintetica(candidatos)]
+
+    ref = postprocess_detections_loop(outputs, original_shape, scale, pad)
+    novo = postprocess_detections(outputs, original_shape, scale, pad)
+    equivalentes = (
+        [d['bbox'] for d in ref] == [d['bbox'] for d in novo]
+        and [d['class_id'] for d in ref] == [d['class_id'] for d in novo]
+    )
+
+    antes = cronometrar(postprocess_detections_loop, (outputs, original_shape, scale, pad), iteracoes)
+    depois = cronometrar(postprocess_detections, (outputs, original_shape, scale, pad), iteracoes)
+
+    print(json.dumps({
+        'iteracoes': iteracoes,
+        'candidatos_acima_do_limiar': candidatos,
+        'deteccoes_finais': len(novo),
+        'resultados_equivalentes': equivalentes,
+        'loop_python': antes,
+        'vetorizado': depois,
+        'speedup_p50': round(antes['p50_ms'] / max(depois['p50_ms'], 1e-6), 1)
+    }, ensure_ascii=False, indent=2))
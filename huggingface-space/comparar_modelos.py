@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Comparação de acurácia e latência entre duas variantes do detector (ex.: FP32 x INT8)
+O modelo de referência (FP32) é tratado como ground truth: o candidato é avaliado
+por mAP@0.5 contra as detecções da referência e pelo IoU das ROIs finais
+(answer_area_enem e day_region), além de p50/p95 de latência de cada um.
+
+Uso: python comparar_modelos.py <pasta_imagens> [modelo_referencia] [modelo_candidato] [backend]
+     (padrão: fp32 x int8 com YOLO_BACKEND)
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from detector_yolo_enem import (
+    MODEL_VARIANTS, INFERENCE_BACKEND, INPUT_SIZE, create_net, load_image_robust,
+    preprocess_numpy_image, postprocess_detections, montar_rois
+)
+from quantizar_modelo import listar_imagens
+
+IOU_MATCH = 0.5
+
+
+def iou(a, b):
+    """IoU entre duas caixas [x, y, w, h]"""
+    ax1, ay1, ax2, ay2 = a[0], a[1], a[0] + a[2], a[1] + a[3]
+    bx1, by1, bx2, by2 = b[0], b[1], b[0] + b[2], b[1] + b[3]
+    iw = max(0, min(ax2, bx2) - max(ax1, bx1))
+    ih = max(0, min(ay2, by2) - max(ay1, by1))
+    inter = iw * ih
+    uniao = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / uniao if uniao > 0 else 0.0
+
+
+def average_precision(predicoes, referencias_por_imagem, total_referencias):
+    """
+    AP (interpolação em todos os pontos) de uma classe.
+
+    Args:
+        predicoes: Lista de (indice_imagem, confianca, bbox)
+        referencias_por_imagem: {indice_imagem: [bbox, ...]}
+        total_referencias: Número total de caixas de referência da classe
+    """
+    if total_referencias == 0:
+        return None
+
+    predicoes = sorted(predicoes, key=lambda p: p[1], reverse=True)
+    usadas = {i: [False] * len(caixas) for i, caixas in referencias_por_imagem.items()}
+    tp = np.zeros(len(predicoes))
+    fp = np.zeros(len(predicoes))
+
+    for k, (img, _, caixa) in enumerate(predicoes):
+        candidatas = referencias_por_imagem.get(img, [])
+        melhor, melhor_j = 0.0, -1
+        for j, ref in enumerate(candidatas):
+            valor = iou(caixa, ref)
+            if valor > melhor:
+                melhor, melhor_j = valor, j
+        if melhor >= IOU_MATCH and not usadas[img][melhor_j]:
+            tp[k] = 1
+            usadas[img][melhor_j] = True
+        else:
+            fp[k] = 1
+
+    tp_acum = np.cumsum(tp)
+    fp_acum = np.cumsum(fp)
+    recall = np.concatenate([[0.0], tp_acum / total_referencias, [1.0]])
+    precisao = np.concatenate([[1.0], tp_acum / np.maximum(tp_acum + fp_acum, 1e-9), [0.0]])
+    for i in range(len(precisao) - 2, -1, -1):
+        precisao[i] = max(precisao[i], precisao[i + 1])
+    pontos = np.where(recall[1:] != recall[:-1])[0]
+    return float(np.sum((recall[pontos + 1] - recall[pontos]) * precisao[pontos + 1]))
+
+
+def percentis(tempos):
+    if not tempos:
+        return {}
+    return {
+        'p50_ms': round(float(np.percentile(tempos, 50)), 2),
+        'p95_ms': round(float(np.percentile(tempos, 95)), 2),
+        'media_ms': round(float(np.mean(tempos)), 2)
+    }
+
+
+def executar(net, image_bgr):
+    """Pipeline de detecção com uma rede explícita; retorna (detections, rois, forward_ms, total_ms)"""
+    inicio = time.perf_counter()
+    _, blob, scale, pad = preprocess_numpy_image(image_bgr)
+    inicio_forward = time.perf_counter()
+    net.setInput(blob)
+    outputs = net.forward()
+    forward_ms = (time.perf_counter() - inicio_forward) * 1000
+    if not isinstance(outputs, (list, tuple)):
+        outputs = [outputs]
+    detections = postprocess_detections(outputs, image_bgr.shape[:2], scale, pad)
+    rois = montar_rois(detections)
+    return detections, rois, forward_ms, (time.perf_counter() - inicio) * 1000
+
+
+def comparar(pasta, modelo_referencia, modelo_candidato, backend=None, aquecimento=3):
+    net_ref, info_ref = create_net(modelo_referencia, backend)
+    net_cand, info_cand = create_net(modelo_candidato, backend)
+
+    imagens = []
+    for caminho in listar_imagens(pasta):
+        try:
+            # Já reduzida para 640 px: o lote inteiro fica em memória
+            imagens.append(load_image_robust(str(caminho), lado_maximo=max(INPUT_SIZE)))
+        except Exception as e:
+            print(f"[COMPARAR] Ignorando {caminho}: {e}", file=sys.stderr)
+    if not imagens:
+        raise ValueError(f"Nenhuma imagem válida em: {pasta}")
+
+    # Aquecimento (alocações e otimizações de grafo ficam fora das medições)
+    for net in (net_ref, net_cand):
+        for img in imagens[:aquecimento]:
+            executar(net, img)
+
+    tempos = {'referencia': {'forward': [], 'total': []}, 'candidato': {'forward': [], 'total': []}}
+    referencias = {}   # classe -> {img: [bbox]}
+    predicoes = {}     # classe -> [(img, conf, bbox)]
+    ious_roi = {}      # classe de ROI -> [iou]
+    deteccao_concorda = 0
+
+    for i, img in enumerate(imagens):
+        det_ref, rois_ref, fwd, total = executar(net_ref, img)
+        tempos['referencia']['forward'].append(fwd)
+        tempos['referencia']['total'].append(total)
+
+        det_cand, rois_cand, fwd, total = executar(net_cand, img)
+        tempos['candidato']['forward'].append(fwd)
+        tempos['candidato']['total'].append(total)
+
+        for d in det_ref:
+            referencias.setdefault(d['class_name'], {}).setdefault(i, []).append(d['bbox'])
+        for d in det_cand:
+            predicoes.setdefault(d['class_name'], []).append((i, d['confidence'], d['bbox']))
+
+        for classe, itens in rois_ref.items():
+            cand = rois_cand.get(classe)
+            ious_roi.setdefault(classe, []).append(iou(itens[0]['bbox'], cand[0]['bbox']) if cand else 0.0)
+
+        detectado_ref = 'day_region' in rois_ref and 'answer_area_enem' in rois_ref
+        detectado_cand = 'day_region' in rois_cand and 'answer_area_enem' in rois_cand
+        deteccao_concorda += int(detectado_ref == detectado_cand)
+
+    aps = {}
+    for classe, por_imagem in referencias.items():
+        total = sum(len(c) for c in por_imagem.values())
+        aps[classe] = average_precision(predicoes.get(classe, []), por_imagem, total)
+    aps_validos = [v for v in aps.values() if v is not None]
+
+    return {
+        'sucesso': True,
+        'imagens': len(imagens),
+        'referencia': {'backend': info_ref, 'forward': percentis(tempos['referencia']['forward']),
+                       'total': percentis(tempos['referencia']['total'])},
+        'candidato': {'backend': info_cand, 'forward': percentis(tempos['candidato']['forward']),
+                      'total': percentis(tempos['candidato']['total'])},
+        'concordancia': {
+            'map50_vs_referencia': round(float(np.mean(aps_validos)), 4) if aps_validos else None,
+            'ap50_por_classe': {k: (round(v, 4) if v is not None else None) for k, v in aps.items()},
+            'iou_medio_roi': {k: round(float(np.mean(v)), 4) for k, v in ious_roi.items()},
+            'iou_min_roi': {k: round(float(np.min(v)), 4) for k, v in ious_roi.items()},
+            'taxa_mesmo_detectado': round(deteccao_concorda / len(imagens), 4)
+        }
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(json.dumps({
+            'sucesso': False,
+            'erro': 'Uso: python comparar_modelos.py <pasta_imagens> [modelo_referencia] [modelo_candidato] [backend]'
+        }))
+        sys.exit(1)
+
+    pasta = sys.argv[1]
+    ref = sys.argv[2] if len(sys.argv) > 2 else 'fp32'
+    cand = sys.argv[3] if len(sys.argv) > 3 else 'int8'
+    backend = sys.argv[4] if len(sys.argv) > 4 else INFERENCE_BACKEND
+
+    try:
+        resultado = comparar(
+            pasta,
+            MODEL_VARIANTS.get(ref, Path(ref)),
+            MODEL_VARIANTS.get(cand, Path(cand)),
+            backend
+        )
+    except Exception as e:
+        resultado = {'sucesso': False, 'erro': str(e)}
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Contexto de imagem de um upload
+O arquivo é lido e decodificado (com a orientação EXIF aplicada) uma única vez;
+classificação do tipo, YOLO, OCR e leitura das bolhas recebem o mesmo objeto e
+usam a imagem BGR, a versão em cinza ou reduções dela, calculadas sob demanda
+e guardadas para as etapas seguintes.
+
+A decodificação é uma só, pelo OpenCV; a orientação EXIF é lida do cabeçalho e
+aplicada como view (transposição/espelhamento), sem as cópias do caminho
+PIL -> exif_transpose -> RGB -> numpy -> BGR.
+
+Reduções pedidas antes da imagem inteira (YOLO em 640 px, classificação em
+800 px) decodificam o JPEG já reduzido (IMREAD_REDUCED_COLOR_2/4/8: escala
+aplicada na própria DCT), sem materializar o bitmap em resolução total. A
+imagem inteira só é decodificada quando uma etapa acessa .bgr (ex.: o recorte
+da área de respostas). DECODIFICACAO_REDUZIDA=0 desliga esse atalho.
+
+Uso:
+    contexto = ContextoImagem.de_arquivo(caminho, cronometro)
+    resultado_yolo = detect_rois(contexto, cronometro)
+    img = contexto.bgr                  # mesma decodificação usada pelo YOLO
+    miniatura = contexto.reduzida(800)  # maior lado <= 800 px
+"""
+
+import io
+import os
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+from cronometro import Cronometro
+
+DECODIFICACAO_REDUZIDA = os.environ.get("DECODIFICACAO_REDUZIDA", "1").lower() in ("1", "true")
+ORIENTACOES_TRANSPOSTAS = (5, 6, 7, 8)  # Tag EXIF Orientation que troca largura e altura
+
+
+def ler_cabecalho(dados):
+    """
+    Formato, tamanho bruto e orientação EXIF lendo só o cabeçalho (o PIL não decodifica os pixels aqui).
+
+    Returns:
+        tuple ou None: (formato, (largura, altura) antes da orientação, orientação 1-8);
+                       None se o PIL não reconhecer o formato
+    """
+    try:
+        img_pil = Image.open(io.BytesIO(dados))
+    except Exception:
+        return None
+    try:
+        orientacao = int(img_pil.getexif().get(0x0112, 1))
+    except Exception:
+        orientacao = 1
+    return img_pil.format, img_pil.size, orientacao if 1 <= orientacao <= 8 else 1
+
+
+def orientar(img, orientacao):
+    """
+    Aplica a orientação EXIF com transposição/espelhamento por strides do NumPy:
+    o resultado é uma view, sem cópia da imagem (as funções do OpenCV aceitam a
+    view como entrada; quem for desenhar sobre ela deve copiá-la antes).
+    """
+    if orientacao in ORIENTACOES_TRANSPOSTAS:
+        img = img.swapaxes(0, 1)
+    if orientacao in (2, 3, 6, 7):
+        img = img[:, ::-1]   # Espelhamento horizontal
+    if orientacao in (3, 4, 7, 8):
+        img = img[::-1]      # Espelhamento vertical
+    return img
+
+
+def decodificar_bgr(dados, cronometro=None, lado_minimo=None):
+    """
+    Decodifica bytes de imagem para BGR aplicando a orientação EXIF (crítico para fotos de celular).
+    Uma única decodificação pelo OpenCV (que ignora a orientação) e a rotação lida
+    do cabeçalho aplicada como view; formatos que o OpenCV não abre passam pelo PIL.
+
+    Args:
+        dados: Conteúdo do arquivo (bytes)
+        cronometro: Cronometro opcional (etapas decodificacao e exif_transpose)
+        lado_minimo: Se informado, JPEGs são decodificados na menor escala DCT
+                     (1/2, 1/4, 1/8) cujo maior lado ainda é >= lado_minimo
+                     (etapa decodificacao_reduzida); outros formatos vêm inteiros
+
+    Returns:
+        np.ndarray: Imagem BGR
+    """
+    if cronometro is None:
+        cronometro = Cronometro()
+
+    cabecalho = ler_cabecalho(dados)
+    formato, (largura, altura), orientacao = cabecalho if cabecalho else (None, (0, 0), 1)
+
+    flags, etapa = cv2.IMREAD_COLOR, 'decodificacao'
+    if lado_minimo and formato == 'JPEG':
+        for fator, flag_reduzida in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                     (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if max(largura, altura) / fator >= lado_minimo:
+                flags, etapa = flag_reduzida, 'decodificacao_reduzida'
+                break
+
+    with cronometro.etapa(etapa):
+        img = cv2.imdecode(np.frombuffer(dados, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img is None:
+        return _decodificar_pil(dados, cronometro)
+
+    with cronometro.etapa('exif_transpose'):
+        return orientar(img, orientacao)
+
+
+def _decodificar_pil(dados, cronometro):
+    """Fallback para formatos que só o PIL abre (exif_transpose + RGB -> BGR)"""
+    try:
+        img_pil = Image.open(io.BytesIO(dados))
+        with cronometro.etapa('decodificacao'):
+            img_pil.load()
+    except Exception:
+        raise ValueError("Não foi possível decodificar a imagem")
+
+    with cronometro.etapa('exif_transpose'):
+        img_pil = ImageOps.exif_transpose(img_pil)
+
+    with cronometro.etapa('decodificacao'):
+        # PIL usa RGB, OpenCV usa BGR
+        if img_pil.mode != 'RGB':
+            img_pil = img_pil.convert('RGB')
+        return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+
+
+def ler_tamanho(dados):
+    """
+    (altura, largura) da imagem já com a orientação EXIF aplicada, lendo só o cabeçalho.
+
+    Returns:
+        tuple ou None: None se o PIL não reconhecer o formato
+    """
+    cabecalho = ler_cabecalho(dados)
+    if cabecalho is None:
+        return None
+    _, (largura, altura), orientacao = cabecalho
+    if orientacao in ORIENTACOES_TRANSPOSTAS:
+        largura, altura = altura, largura
+    return altura, largura
+
+
+class ContextoImagem:
+    """
+    Bytes do upload + imagem decodificada e suas derivações, criados uma vez por upload.
+
+    Atributos:
+        dados: Conteúdo original do arquivo (None quando criado a partir de um array)
+        origem: Caminho do arquivo, para mensagens de erro e logs
+        cronometro: Cronometro onde a leitura e a decodificação são registradas
+    """
+
+    def __init__(self, dados=None, bgr=None, origem=None, cronometro=None):
+        if dados is None and bgr is None:
+            raise ValueError("ContextoImagem precisa dos bytes ou da imagem BGR")
+        self.dados = dados
+        self.origem = origem
+        self.cronometro = cronometro if cronometro is not None else Cronometro()
+        self._bgr = bgr
+        self._cinza = None
+        self._reduzidas = {}
+        self._tamanho = None
+        self._rascunho = None  # Decodificação em escala DCT reduzida, base das reduções
+
+    @classmethod
+    def de_arquivo(cls, caminho, cronometro=None):
+        """Lê o arquivo (caminhos com acentos incluídos); a decodificação só acontece no primeiro uso"""
+        cronometro = cronometro if cronometro is not None else Cronometro()
+        with cronometro.etapa('leitura_arquivo'):
+            with open(caminho, 'rb') as f:
+                dados = f.read()
+        return cls(dados=dados, origem=str(caminho), cronometro=cronometro)
+
+    @property
+    def bgr(self):
+        """Imagem BGR com EXIF aplicado (decodificada no primeiro acesso)"""
+        if self._bgr is None:
+            try:
+                self._bgr = decodificar_bgr(self.dados, self.cronometro)
+            except ValueError:
+                raise ValueError(f"Erro ao carregar a imagem: {self.origem}")
+        return self._bgr
+
+    @property
+    def tamanho(self):
+        """(altura, largura) em resolução total; lido do cabeçalho sem decodificar quando possível"""
+        if self._tamanho is None:
+            if self._bgr is None and self.dados is not None:
+                self._tamanho = ler_tamanho(self.dados)
+            if self._tamanho is None:
+                self._tamanho = self.bgr.shape[:2]
+        return self._tamanho
+
+    def _base_reducao(self, lado_maximo):
+        """
+        Imagem de onde sai uma redução com maior lado lado_maximo: a inteira, se já
+        decodificada; senão uma decodificação reduzida (reaproveitada se for grande o bastante).
+        """
+        if self._bgr is not None or not DECODIFICACAO_REDUZIDA or self.dados is None:
+            return self.bgr
+        if self._rascunho is None or max(self._rascunho.shape[:2]) < lado_maximo:
+            try:
+                rascunho = decodificar_bgr(self.dados, self.cronometro, lado_minimo=lado_maximo)
+            except ValueError:
+                raise ValueError(f"Erro ao carregar a imagem: {self.origem}")
+            if rascunho.shape[:2] == tuple(self.tamanho):
+                # Formato sem decodificação reduzida: já é a imagem inteira
+                self._bgr = rascunho
+                return rascunho
+            self._rascunho = rascunho
+        return self._rascunho
+
+    @property
+    def cinza(self):
+        """Imagem inteira em escala de cinza"""
+        if self._cinza is None:
+            self._cinza = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self._cinza
+
+    def reduzida(self, lado_maximo, cinza=False):
+        """
+        Versão com o maior lado <= lado_maximo (INTER_AREA); a própria imagem se já for menor.
+        Antes de a imagem inteira ser decodificada, vem de uma decodificação JPEG reduzida.
+
+        Returns:
+            tuple: (imagem, escala aplicada em relação à original)
+        """
+        chave = (lado_maximo, cinza)
+        if chave not in self._reduzidas:
+            altura, largura = self.tamanho
+            escala = lado_maximo / max(largura, altura)
+            if escala >= 1.0:
+                self._reduzidas[chave] = (self.cinza if cinza else self.bgr, 1.0)
+            elif cinza:
+                # Reduzir antes de converter: o cinza da miniatura não exige o cinza da imagem inteira
+                reduzida, escala = self.reduzida(lado_maximo)
+                self._reduzidas[chave] = (cv2.cvtColor(reduzida, cv2.COLOR_BGR2GRAY), escala)
+            else:
+                tamanho = (int(round(largura * escala)), int(round(altura * escala)))
+                base = self._base_reducao(lado_maximo)
+                self._reduzidas[chave] = (cv2.resize(base, tamanho, interpolation=cv2.INTER_AREA), escala)
+        return self._reduzidas[chave]
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cronômetro de etapas dos pipelines
+Cada requisição cria um Cronometro e o repassa às funções que executam as
+etapas (decodificação, letterbox, forward, OCR, bolhas...). O resultado JSON
+leva o dicionário timings_ms e uma linha [TEMPOS] vai para o stderr, de modo
+que requisições lentas possam ser diagnosticadas pelos logs.
+
+Com MEDIR_ALOCACOES=1, cada etapa também registra o pico de memória alocada
+(tracemalloc, que enxerga os arrays do NumPy e as saídas do OpenCV) e o
+resultado pode levar alocacoes_kb. O tracemalloc é global ao processo: com
+requisições simultâneas os valores se misturam, então é uma medição de
+diagnóstico, não para ficar ligada em produção.
+
+Uso:
+    cronometro = Cronometro()
+    with cronometro.etapa('ocr'):
+        resultado_ocr = detect_day_from_image(day_region_img)
+    resultado['timings_ms'] = cronometro.como_dict()
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+MEDIR_ALOCACOES = os.environ.get("MEDIR_ALOCACOES", "0").lower() in ("1", "true")
+
+
+class Cronometro:
+    """Soma a duração (ms) de etapas nomeadas; etapas repetidas acumulam"""
+
+    def __init__(self, medir_alocacoes=None):
+        self._inicio = time.perf_counter()
+        self.tempos = {}
+        self.alocacoes = {}
+        self.medir_alocacoes = MEDIR_ALOCACOES if medir_alocacoes is None else medir_alocacoes
+        if self.medir_alocacoes and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def etapa(self, nome):
+        if self.medir_alocacoes:
+            memoria_inicio = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(nome, (time.perf_counter() - inicio) * 1000)
+            if self.medir_alocacoes:
+                pico = tracemalloc.get_traced_memory()[1] - memoria_inicio
+                self.alocacoes[nome] = self.alocacoes.get(nome, 0) + max(0, pico)
+
+    def registrar(self, nome, ms):
+        """Registra uma duração medida fora do cronômetro (ex.: forward compartilhado por um lote)"""
+        self.tempos[nome] = self.tempos.get(nome, 0.0) + ms
+
+    def como_dict(self):
+        """
+        Returns:
+            dict: {etapa: ms, ..., total: ms desde a criação do cronômetro}
+        """
+        tempos = {nome: round(ms, 2) for nome, ms in self.tempos.items()}
+        tempos['total'] = round((time.perf_counter() - self._inicio) * 1000, 2)
+        return tempos
+
+    def alocacoes_kb(self):
+        """
+        Returns:
+            dict ou None: {etapa: pico de memória alocada na etapa (KB)}; None sem MEDIR_ALOCACOES
+        """
+        if not self.medir_alocacoes:
+            return None
+        return {nome: round(b / 1024, 1) for nome, b in self.alocacoes.items()}
+
+    def registrar_log(self, rotulo):
+        """Escreve uma linha [TEMPOS] no stderr (stdout é reservado para o JSON dos scripts)"""
+        etapas = " ".join(f"{nome}={ms}" for nome, ms in self.como_dict().items())
+        print(f"[TEMPOS] {rotulo} {etapas}", file=sys.stderr)
@@ -3,48 +3,173 @@ import numpy as np
 import base64
 import sys
 import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
+from cronometro import Cronometro
+from contexto_imagem import ContextoImagem, decodificar_bgr
+
 # Configurações do modelo
-MODEL_PATH = Path(__file__).parent / "best_yolo11s_optimized.onnx"
+# YOLO_MODEL escolhe a variante ("fp32", "int8") ou aponta direto para um arquivo .onnx
+MODEL_VARIANTS = {
+    "fp32": Path(__file__).parent / "best_yolo11s_optimized.onnx",
+    "int8": Path(__file__).parent / "best_yolo11s_int8.onnx",  # Gerado por quantizar_modelo.py
+}
+MODEL_VARIANT = os.environ.get("YOLO_MODEL", "fp32")
+MODEL_PATH = MODEL_VARIANTS.get(MODEL_VARIANT.lower(), Path(MODEL_VARIANT))
 INPUT_SIZE = (640, 640)
 CONFIDENCE_THRESHOLD = 0.15
 NMS_THRESHOLD = 0.45
+MAX_BATCH_SIZE = 8  # Imagens por forward em detect_enem_sheet_batch (limita memória do blob)
+
+# Debug visual: desligado por padrão (sem dump em disco nem JPEG/base64 por frame).
+# YOLO_DEBUG=1 liga para todas as chamadas; detect_enem_sheet(..., debug=True) liga por requisição.
+DEBUG_MODE = os.environ.get("YOLO_DEBUG", "0").lower() in ("1", "true")
+# Quantas detecções recentes ficam guardadas para render_debug_overlay (0 desativa)
+DEBUG_CACHE_SIZE = int(os.environ.get("YOLO_DEBUG_CACHE", "8"))
 
 CLASS_NAMES = {
     0: "answer_area_enem",
     1: "day_region"
 }
 
-_NET = None
-def load_model():
-    global _NET
-    if _NET is None:
-        if not MODEL_PATH.exists():
-            raise FileNotFoundError(f"Modelo não encontrado: {MODEL_PATH}")
+# Backend de inferência: "opencv" (cv2.dnn) ou "onnxruntime"
+INFERENCE_BACKEND = os.environ.get("YOLO_BACKEND", "opencv").lower()
+
+# Opções da sessão ONNX Runtime (0 = deixar o runtime decidir)
+ORT_INTRA_OP_THREADS = int(os.environ.get("ORT_INTRA_OP_THREADS", "0"))
+ORT_INTER_OP_THREADS = int(os.environ.get("ORT_INTER_OP_THREADS", "0"))
+ORT_GRAPH_OPTIMIZATION = os.environ.get("ORT_GRAPH_OPTIMIZATION", "all").lower()  # disable | basic | extended | all
+ORT_ENABLE_MEM_ARENA = os.environ.get("ORT_ENABLE_MEM_ARENA", "1") not in ("0", "false", "False")
+
+class OnnxRuntimeNet:
+    """
+    Adaptador de uma InferenceSession do ONNX Runtime para a mesma interface
+    usada com cv2.dnn (setInput/forward), para o resto do pipeline não mudar.
+    """
+    def __init__(self, model_path):
+        import onnxruntime as ort
         
+        niveis = {
+            "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }
+        if ORT_GRAPH_OPTIMIZATION not in niveis:
+            raise ValueError(f"ORT_GRAPH_OPTIMIZATION inválido: {ORT_GRAPH_OPTIMIZATION}")
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+        options.inter_op_num_threads = ORT_INTER_OP_THREADS
+        options.graph_optimization_level = niveis[ORT_GRAPH_OPTIMIZATION]
+        options.enable_cpu_mem_arena = ORT_ENABLE_MEM_ARENA
+        
+        self.session = ort.InferenceSession(str(model_path), sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self._blob = None
+    
+    def setInput(self, blob):
+        self._blob = blob
+    
+    def forward(self):
+        return self.session.run(None, {self.input_name: self._blob})[0]
+
+def create_net(model_path, backend=None):
+    """
+    Cria uma rede para o modelo informado, sem usar o cache global.
+    Usado por load_model e pelas ferramentas que comparam variantes do modelo.
+    
+    Returns:
+        tuple: (net com setInput/forward, dict com informações do backend)
+    """
+    model_path = Path(model_path)
+    backend = (backend or INFERENCE_BACKEND).lower()
+    if not model_path.exists():
+        raise FileNotFoundError(f"Modelo não encontrado: {model_path}")
+    
+    if backend == "onnxruntime":
         try:
-            # Tentar carregar com OpenCV DNN
-            _NET = cv2.dnn.readNetFromONNX(str(MODEL_PATH))
-            # Configurar backend preferencial (CPU)
-            _NET.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-            _NET.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            net = OnnxRuntimeNet(model_path)
+            return net, {
+                'nome': 'onnxruntime',
+                'modelo': model_path.name,
+                'intra_op_threads': ORT_INTRA_OP_THREADS,
+                'inter_op_threads': ORT_INTER_OP_THREADS,
+                'graph_optimization': ORT_GRAPH_OPTIMIZATION,
+                'mem_arena': ORT_ENABLE_MEM_ARENA
+            }
+        except ImportError:
+            print("[DETECTOR] onnxruntime não instalado, usando OpenCV DNN", file=sys.stderr)
         except Exception as e:
-            raise RuntimeError(f"Erro ao carregar modelo com OpenCV DNN: {e}")
+            raise RuntimeError(f"Erro ao carregar modelo com ONNX Runtime: {e}")
+    
+    try:
+        # Tentar carregar com OpenCV DNN
+        net = cv2.dnn.readNetFromONNX(str(model_path))
+        # Configurar backend preferencial (CPU)
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        return net, {'nome': 'opencv', 'modelo': model_path.name, 'threads': cv2.getNumThreads()}
+    except Exception as e:
+        raise RuntimeError(f"Erro ao carregar modelo com OpenCV DNN: {e}")
+
+_NET = None
+_BACKEND_INFO = None
+_NET_LOCK = threading.Lock()
+def load_model(*cronometros):
+    """
+    Modelo do processo, carregado uma única vez e compartilhado por todos os chamadores.
+    
+    Args:
+        cronometros: Cronometros da(s) requisição(ões) que esperaram o carregamento;
+                     recebem a etapa carregamento_modelo, separada do custo por imagem
+    """
+    global _NET, _BACKEND_INFO
+    if _NET is None:
+        with _NET_LOCK:
+            if _NET is None:
+                inicio = time.perf_counter()
+                net, info = create_net(MODEL_PATH)
+                tempo_ms = (time.perf_counter() - inicio) * 1000
+                info['tempo_carregamento_ms'] = round(tempo_ms, 2)
+                _NET, _BACKEND_INFO = net, info
+                print(f"[DETECTOR] Modelo {info['modelo']} carregado ({info['nome']}) em {tempo_ms:.0f} ms", file=sys.stderr)
+                for cronometro in cronometros:
+                    cronometro.registrar('carregamento_modelo', tempo_ms)
     return _NET
 
-from PIL import Image, ImageOps
-import io
+def get_backend_info():
+    """Backend efetivamente carregado (após load_model) e suas opções"""
+    return dict(_BACKEND_INFO) if _BACKEND_INFO else None
 
-def load_image_robust(image_source):
+def load_image_robust(image_source, cronometro=None, lado_maximo=None):
     """
     Carrega imagem de forma robusta usando PIL para tratar EXIF orientation.
     Converte para BGR (OpenCV format) para ser compatível com o resto do pipeline.
+
+    Args:
+        image_source: Caminho, bytes, ContextoImagem ou numpy BGR
+        cronometro: Cronometro opcional (etapas decodificacao e exif_transpose)
+        lado_maximo: Se informado, retorna a imagem com o maior lado <= lado_maximo,
+                     decodificada já reduzida quando é um JPEG (arrays são devolvidos como estão)
     """
-    if isinstance(image_source, str) or isinstance(image_source, Path):
-        img_pil = Image.open(image_source)
+    if lado_maximo and not isinstance(image_source, np.ndarray):
+        if not isinstance(image_source, ContextoImagem):
+            image_source = (ContextoImagem.de_arquivo(image_source, cronometro)
+                            if isinstance(image_source, (str, Path))
+                            else ContextoImagem(dados=bytes(image_source), cronometro=cronometro))
+        return image_source.reduzida(lado_maximo)[0]
+    if isinstance(image_source, ContextoImagem):
+        # Já decodificada (ou decodificada agora, uma única vez, para as próximas etapas)
+        return image_source.bgr
+    elif isinstance(image_source, str) or isinstance(image_source, Path):
+        return ContextoImagem.de_arquivo(image_source, cronometro).bgr
     elif isinstance(image_source, bytes) or isinstance(image_source, bytearray):
-        img_pil = Image.open(io.BytesIO(image_source))
+        return decodificar_bgr(bytes(image_source), cronometro)
     elif isinstance(image_source, np.ndarray):
         # Assumindo BGR do OpenCV, converte para PIL para garantir consistência se necessário,
         # mas se já é numpy, EXIF já foi perdido provavelmente.
@@ -53,21 +178,37 @@ def load_image_robust(image_source):
     else:
         raise ValueError("Formato de imagem não suportado")
 
-    # Corrigir orientação baseada no EXIF (Crítico para mobile!)
-    img_pil = ImageOps.exif_transpose(img_pil)
-    
-    # Converter para RGB (PIL usa RGB, OpenCV usa BGR)
-    if img_pil.mode != 'RGB':
-        img_pil = img_pil.convert('RGB')
-    
-    img_np = np.array(img_pil)
-    # Converter RGB -> BGR
-    img_bgr = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-    
-    return img_bgr
+def imagem_para_deteccao(image_input, cronometro=None):
+    """
+    Imagem que vai ao letterbox e sua relação com a imagem original.
 
-def preprocess_numpy_image(img):
-    """Implementação correta do Letterbox (estilo Ultralytics)"""
+    Caminhos, bytes e ContextoImagem usam a redução de 640 px do contexto, que vem de
+    uma decodificação JPEG reduzida: o YOLO nunca precisa do bitmap em resolução total
+    (que fica para os recortes, decodificado só quando pedido).
+
+    Returns:
+        tuple: (imagem, (altura, largura) originais, escala da imagem em relação à original)
+    """
+    if isinstance(image_input, np.ndarray):
+        return image_input, image_input.shape[:2], 1.0
+    if isinstance(image_input, ContextoImagem):
+        contexto = image_input
+    elif isinstance(image_input, (str, Path)):
+        contexto = ContextoImagem.de_arquivo(image_input, cronometro)
+    elif isinstance(image_input, (bytes, bytearray)):
+        contexto = ContextoImagem(dados=bytes(image_input), cronometro=cronometro)
+    else:
+        raise ValueError("Formato de imagem não suportado")
+    imagem, escala = contexto.reduzida(max(INPUT_SIZE))
+    return imagem, tuple(contexto.tamanho), escala
+
+def letterbox_image(img):
+    """
+    Implementação correta do Letterbox (estilo Ultralytics)
+
+    Returns:
+        tuple: (img_padded, escala, (pad_left, pad_top))
+    """
     shape = img.shape[:2]  # altura, largura atual
     new_shape = INPUT_SIZE
     
@@ -94,61 +235,81 @@ def preprocess_numpy_image(img):
     
     img_padded = cv2.copyMakeBorder(img_resized, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
     
+    return img_padded, r, (left, top)
+
+def preprocess_numpy_image(img):
+    """Letterbox + blob NCHW de uma única imagem"""
+    img_padded, r, pad = letterbox_image(img)
+    
     # Normalização e Blob
-    blob = cv2.dnn.blobFromImage(img_padded, 1/255.0, new_shape, swapRB=True, crop=False)
+    blob = cv2.dnn.blobFromImage(img_padded, 1/255.0, INPUT_SIZE, swapRB=True, crop=False)
     
-    return img_padded, blob, r, (left, top)
+    return img_padded, blob, r, pad
 
 def postprocess_detections(outputs, original_shape, scale, pad):
-    """Post-processamento robusto para YOLOv8/v11 ONNX"""
-    output = outputs[0]
-    
-    # Se o shape for (1, 6, 8400), transpõe para (1, 8400, 6)
+    """
+    Post-processamento robusto para YOLOv8/v11 ONNX (vetorizado)
+
+    Filtro de confiança, argmax de classe, remoção do padding, reescala e
+    normalização são feitos sobre o array inteiro; os dicts só são montados
+    para as caixas que sobrevivem ao NMS.
+    """
+    return postprocess_batch_item(outputs[0], 0, original_shape, scale, pad)
+
+def postprocess_batch_item(output, batch_index, original_shape, scale, pad):
+    """
+    Post-processa um item de uma saída em lote (N, 6, 8400) ou (N, 8400, 6),
+    usando a escala e o padding da imagem correspondente.
+    """
+    # Se o shape for (N, 6, 8400), transpõe para (N, 8400, 6)
     if output.shape[1] < output.shape[2]: 
         output = np.transpose(output, (0, 2, 1))
     
-    output = output[0] # Remover batch -> agota é (8400, 6)
-        
-    detections = []
+    output = output[batch_index] # Selecionar item do lote -> agora é (8400, 6)
+    
+    # 1. Classe e confiança de todas as âncoras de uma vez
+    scores = output[:, 4:]
+    class_ids = np.argmax(scores, axis=1)
+    confs = scores[np.arange(scores.shape[0]), class_ids]
+    
+    mask = confs > CONFIDENCE_THRESHOLD
+    if not np.any(mask):
+        return []
+    
+    boxes = output[mask, :4].astype(np.float64)
+    class_ids = class_ids[mask]
+    confs = confs[mask]
+    
+    # 2. Remover o padding (centralizado) e 3. escalar de volta para o tamanho original
+    # Importante: a escala deve ser aplicada após remover o padding
     pad_left, pad_top = pad
+    cx, cy, w, h = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    x0 = (cx - pad_left - w / 2) / scale
+    y0 = (cy - pad_top - h / 2) / scale
+    w0 = w / scale
+    h0 = h / scale
     
-    for row in output:
-        scores = row[4:]
-        class_id = np.argmax(scores)
-        conf = scores[class_id]
-        
-        if conf > CONFIDENCE_THRESHOLD:
-            # 1. Coordenadas no espaço 640x640
-            cx, cy, w, h = row[0:4]
-            
-            # 2. Remover o padding (centralizado)
-            x_unpad = cx - pad_left
-            y_unpad = cy - pad_top
-            
-            # 3. Escalar de volta para o tamanho original
-            # Importante: a escala deve ser aplicada após remover o padding
-            x0 = (x_unpad - w/2) / scale
-            y0 = (y_unpad - h/2) / scale
-            w0 = w / scale
-            h0 = h / scale
-            
-            # 4. Normalizar (0.0 - 1.0)
-            height_orig, width_orig = original_shape
-            
-            x_norm = x0 / width_orig
-            y_norm = y0 / height_orig
-            w_norm = w0 / width_orig
-            h_norm = h0 / height_orig
-            
-            detections.append({
-                'class_id': int(class_id),
-                'class_name': CLASS_NAMES.get(int(class_id), f'class_{class_id}'),
-                'confidence': float(conf),
-                'bbox': [int(x0), int(y0), int(w0), int(h0)], # Pixel coords for NMS
-                'bbox_norm': [x_norm, y_norm, w_norm, h_norm] # Normalized for Frontend
-            })
+    # Pixel coords para NMS (int() trunca em direção a zero, como astype)
+    boxes_px = np.stack([x0, y0, w0, h0], axis=1).astype(np.int32)
+    
+    # 4. Normalizar (0.0 - 1.0)
+    height_orig, width_orig = original_shape
+    boxes_norm = np.stack([x0 / width_orig, y0 / height_orig, w0 / width_orig, h0 / height_orig], axis=1)
+    
+    indices = cv2.dnn.NMSBoxes(boxes_px.tolist(), confs.tolist(), CONFIDENCE_THRESHOLD, NMS_THRESHOLD)
+    
+    detections = []
+    for i in np.asarray(indices).flatten():
+        class_id = int(class_ids[i])
+        detections.append({
+            'class_id': class_id,
+            'class_name': CLASS_NAMES.get(class_id, f'class_{class_id}'),
+            'confidence': float(confs[i]),
+            'bbox': boxes_px[i].tolist(), # Pixel coords for NMS
+            'bbox_norm': boxes_norm[i].tolist() # Normalized for Frontend
+        })
             
-    return apply_nms(detections, NMS_THRESHOLD)
+    return detections
 
 def apply_nms(detections, iou_threshold):
     if not detections: return []
@@ -164,108 +325,312 @@ def apply_nms(detections, iou_threshold):
             
     return final_detections
 
-def detect_enem_sheet(image_input):
-    try:
-        # Carregar imagem de forma robusta (trata EXIF se for bytes/path)
-        if isinstance(image_input, np.ndarray):
-            image_bgr = image_input
+def montar_rois(detections):
+    """
+    Agrupa as detecções por classe, unindo as caixas de answer_area_enem.
+
+    Returns:
+        dict: {class_name: [{bbox, bbox_norm, confidence}]}
+    """
+    rois = {}
+    
+    # Separar por classes
+    answer_dets = []
+    
+    for det in detections:
+        cname = det['class_name']
+        if cname == 'answer_area_enem':
+            answer_dets.append(det)
         else:
-            image_bgr = load_image_robust(image_input)
+            if cname not in rois: rois[cname] = []
+            rois[cname].append({
+                'bbox': det['bbox'], 
+                'bbox_norm': det['bbox_norm'],
+                'confidence': det['confidence']
+            })
+    
+    # Merge Answer Area (Usando coordenadas normalizadas também)
+    if len(answer_dets) > 0:
+        # Merge Pixel Coords
+        min_x = min([d['bbox'][0] for d in answer_dets])
+        min_y = min([d['bbox'][1] for d in answer_dets])
+        max_x = max([d['bbox'][0] + d['bbox'][2] for d in answer_dets])
+        max_y = max([d['bbox'][1] + d['bbox'][3] for d in answer_dets])
+        
+        # Merge Normalized Coords
+        min_xn = min([d['bbox_norm'][0] for d in answer_dets])
+        min_yn = min([d['bbox_norm'][1] for d in answer_dets])
+        max_xn = max([d['bbox_norm'][0] + d['bbox_norm'][2] for d in answer_dets])
+        max_yn = max([d['bbox_norm'][1] + d['bbox_norm'][3] for d in answer_dets])
+        
+        # Usar a maior confiança
+        max_conf = max([d['confidence'] for d in answer_dets])
+        
+        rois['answer_area_enem'] = [{
+            'bbox': [min_x, min_y, max_x - min_x, max_y - min_y],
+            'bbox_norm': [min_xn, min_yn, max_xn - min_xn, max_yn - min_yn],
+            'confidence': max_conf
+        }]
+    
+    return rois
 
-        # DEBUG DA ORIENTAÇÃO DO FRAME (Salvar para verificar)
-        h, w = image_bgr.shape[:2]
-        print(f"DEBUG: Frame recebido -> Largura: {w}, Altura: {h}")
-        # Salvar frame debug (sobrescreve o anterior)
-        try:
-            cv2.imwrite("debug_frame_input.jpg", image_bgr)
-        except:
-            pass
+_DEBUG_CACHE = OrderedDict()
+_DEBUG_CACHE_LOCK = threading.Lock()
+
+def _guardar_para_debug(img_padded, detections, scale, pad, ordem_canais='bgr'):
+    """
+    Guarda a imagem letterboxed (referência, sem cópia) e as detecções para que o
+    overlay possa ser desenhado depois, sob demanda.
+
+    Returns:
+        str ou None: deteccao_id para render_debug_overlay
+    """
+    if DEBUG_CACHE_SIZE <= 0:
+        return None
+    deteccao_id = uuid.uuid4().hex[:12]
+    with _DEBUG_CACHE_LOCK:
+        _DEBUG_CACHE[deteccao_id] = (img_padded, detections, scale, pad, ordem_canais)
+        while len(_DEBUG_CACHE) > DEBUG_CACHE_SIZE:
+            _DEBUG_CACHE.popitem(last=False)
+    return deteccao_id
+
+def desenhar_overlay(img_padded, detections, scale, pad, ordem_canais='bgr'):
+    """Desenha as caixas sobre uma cópia da imagem 640x640 e retorna o JPEG em base64"""
+    # imencode espera BGR; a conversão já produz a cópia onde as caixas são desenhadas
+    debug_img = cv2.cvtColor(img_padded, cv2.COLOR_RGB2BGR) if ordem_canais == 'rgb' else img_padded.copy()
+    pad_left, pad_top = pad
+    
+    for det in detections:
+        x_orig, y_orig, w_orig, h_orig = det['bbox']
+        
+        # Reverter para 640x640 para desenho debug
+        x_640 = int(x_orig * scale + pad_left)
+        y_640 = int(y_orig * scale + pad_top)
+        w_640 = int(w_orig * scale)
+        h_640 = int(h_orig * scale)
+        
+        color = (0, 255, 0) if det['class_id'] == 0 else (0, 0, 255) 
+        cv2.rectangle(debug_img, (x_640, y_640), (x_640 + w_640, y_640 + h_640), color, 2)
+        
+    _, buffer = cv2.imencode('.jpg', debug_img)
+    return base64.b64encode(buffer).decode('utf-8')
+
+def render_debug_overlay(deteccao_id):
+    """
+    Renderiza o overlay de uma detecção recente a partir do cache
+
+    Args:
+        deteccao_id: Valor de 'deteccao_id' retornado por detect_enem_sheet
         
-        net = load_model()
+    Returns:
+        dict: {sucesso, debug_base64} ou {sucesso: False, erro}
+    """
+    with _DEBUG_CACHE_LOCK:
+        item = _DEBUG_CACHE.get(deteccao_id)
+    if item is None:
+        return {'sucesso': False, 'erro': 'Detecção não encontrada no cache (expirada ou id inválido)'}
+    return {'sucesso': True, 'deteccao_id': deteccao_id, 'debug_base64': desenhar_overlay(*item)}
+
+def detect_enem_sheet(image_input, debug=None, cronometro=None):
+    """
+    Detecta as ROIs da folha ENEM em uma imagem
+
+    Args:
+        image_input: numpy BGR, bytes, caminho ou ContextoImagem (os três últimos
+                     decodificados já reduzidos para 640 px)
+        debug: Se True, salva debug_frame_input.jpg e inclui debug_base64 no resultado.
+               None usa o padrão de YOLO_DEBUG.
+        cronometro: Cronometro da requisição (o resultado traz timings_ms dele)
+    """
+    if debug is None:
+        debug = DEBUG_MODE
+    if cronometro is None:
+        cronometro = Cronometro()
+    
+    try:
+        # Carregar imagem de forma robusta (trata EXIF se for bytes/path), já reduzida para o YOLO
+        image_bgr, (h, w), escala_entrada = imagem_para_deteccao(image_input, cronometro)
+        if debug:
+            # DEBUG DA ORIENTAÇÃO DO FRAME (Salvar para verificar)
+            print(f"DEBUG: Frame recebido -> Largura: {w}, Altura: {h}", file=sys.stderr)
+            # Salvar frame debug (sobrescreve o anterior)
+            try:
+                cv2.imwrite("debug_frame_input.jpg", image_bgr)
+            except:
+                pass
+        
+        net = load_model(cronometro)
         
         # Preprocessamento Robust (Ultralytics Style)
-        img_padded, blob, scale, pad = preprocess_numpy_image(image_bgr)
+        with cronometro.etapa('letterbox'):
+            img_padded, blob, scale, pad = preprocess_numpy_image(image_bgr)
+        # Caixas voltam para a resolução original, não para a da imagem reduzida
+        scale *= escala_entrada
         
         # Inferência
+        inicio_forward = time.perf_counter()
         net.setInput(blob)
         outputs = net.forward()
+        tempo_inferencia_ms = (time.perf_counter() - inicio_forward) * 1000
+        cronometro.registrar('forward', tempo_inferencia_ms)
         if not isinstance(outputs, (list, tuple)):
             outputs = [outputs]
         
         # Post-processamento
-        detections = postprocess_detections(outputs, (h, w), scale, pad)
-        
-        # --- VISUAL DEBUG (Opcional) ---
-        debug_img = img_padded.copy()
-        pad_left, pad_top = pad
-        
-        for det in detections:
-            x_orig, y_orig, w_orig, h_orig = det['bbox']
-            
-            # Reverter para 640x640 para desenho debug
-            x_640 = int(x_orig * scale + pad_left)
-            y_640 = int(y_orig * scale + pad_top)
-            w_640 = int(w_orig * scale)
-            h_640 = int(h_orig * scale)
-            
-            color = (0, 255, 0) if det['class_id'] == 0 else (0, 0, 255) 
-            cv2.rectangle(debug_img, (x_640, y_640), (x_640 + w_640, y_640 + h_640), color, 2)
-            
-        _, buffer = cv2.imencode('.jpg', debug_img)
-        debug_base64 = base64.b64encode(buffer).decode('utf-8')
-        # ------------------------------------------
-
-        rois = {}
-        
-        # Separar por classes
-        answer_dets = []
-        day_dets = []
-        
-        for det in detections:
-            cname = det['class_name']
-            if cname == 'answer_area_enem':
-                answer_dets.append(det)
-            else:
-                if cname not in rois: rois[cname] = []
-                rois[cname].append({
-                    'bbox': det['bbox'], 
-                    'bbox_norm': det['bbox_norm'],
-                    'confidence': det['confidence']
-                })
-        
-        # Merge Answer Area (Usando coordenadas normalizadas também)
-        if len(answer_dets) > 0:
-            # Merge Pixel Coords
-            min_x = min([d['bbox'][0] for d in answer_dets])
-            min_y = min([d['bbox'][1] for d in answer_dets])
-            max_x = max([d['bbox'][0] + d['bbox'][2] for d in answer_dets])
-            max_y = max([d['bbox'][1] + d['bbox'][3] for d in answer_dets])
-            
-            # Merge Normalized Coords
-            min_xn = min([d['bbox_norm'][0] for d in answer_dets])
-            min_yn = min([d['bbox_norm'][1] for d in answer_dets])
-            max_xn = max([d['bbox_norm'][0] + d['bbox_norm'][2] for d in answer_dets])
-            max_yn = max([d['bbox_norm'][1] + d['bbox_norm'][3] for d in answer_dets])
-            
-            # Usar a maior confiança
-            max_conf = max([d['confidence'] for d in answer_dets])
-            
-            rois['answer_area_enem'] = [{
-                'bbox': [min_x, min_y, max_x - min_x, max_y - min_y],
-                'bbox_norm': [min_xn, min_yn, max_xn - min_xn, max_yn - min_yn],
-                'confidence': max_conf
-            }]
-            
+        with cronometro.etapa('nms'):
+            detections = postprocess_detections(outputs, (h, w), scale, pad)
+            rois = montar_rois(detections)
         detectado = 'day_region' in rois and 'answer_area_enem' in rois
         
-        return {
+        resultado = {
             'sucesso': True, 
             'detectado': detectado, 
             'rois': rois, 
             'total_deteccoes': len(detections),
-            'debug_base64': debug_base64
+            'backend_inferencia': get_backend_info(),
+            'tempo_inferencia_ms': round(tempo_inferencia_ms, 2),
+            'deteccao_id': _guardar_para_debug(img_padded, detections, scale, pad)
         }
+        
+        # --- VISUAL DEBUG (Opcional) ---
+        if debug:
+            resultado['debug_base64'] = desenhar_overlay(img_padded, detections, scale, pad)
+        
+        resultado['timings_ms'] = cronometro.como_dict()
+        return resultado
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return {'sucesso': False, 'erro': str(e), 'detectado': False, 'rois': {}}
+        return {'sucesso': False, 'erro': str(e), 'detectado': False, 'rois': {}, 'timings_ms': cronometro.como_dict()}
+
+def detect_rois(image_input, cronometro=None):
+    """Nome usado pelos scripts do backend (detectar_tipo_imagem, processar_respostas_enem_mobile)"""
+    return detect_enem_sheet(image_input, cronometro=cronometro)
+
+def _forward_lote(net, blob):
+    """
+    Executa um forward com o blob NCHW inteiro. Se o modelo foi exportado com
+    batch fixo = 1, recai para um forward por imagem e concatena as saídas.
+    """
+    try:
+        net.setInput(blob)
+        output = net.forward()
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        if output.shape[0] == blob.shape[0]:
+            return output
+    except Exception as e:
+        print(f"[DETECTOR] Forward em lote indisponível, usando um por imagem: {e}", file=sys.stderr)
+    
+    saidas = []
+    for i in range(blob.shape[0]):
+        net.setInput(blob[i:i + 1])
+        output = net.forward()
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        saidas.append(output)
+    return np.concatenate(saidas, axis=0)
+
+def detect_enem_sheet_batch(images, cronometros=None, ordem_canais='bgr'):
+    """
+    Detecta ROIs em várias imagens com um único forward por lote
+
+    Cada imagem é letterboxed para 640x640 e empilhada em um blob NCHW; as
+    detecções de cada item são mapeadas de volta com a escala e o padding da
+    própria imagem. Lotes maiores que MAX_BATCH_SIZE são divididos para manter
+    a memória do blob limitada.
+    
+    Args:
+        images: Lista de imagens (numpy BGR, bytes, caminhos ou ContextoImagem)
+        cronometros: Um Cronometro por imagem (opcional); o forward do lote é
+                     registrado em todas as imagens que participaram dele
+        ordem_canais: Ordem dos arrays numpy recebidos, 'bgr' (OpenCV) ou 'rgb'
+                      (Gradio/PIL). Arrays RGB vão ao blob sem nenhuma conversão
+                      de cor; caminhos e bytes são decodificados em BGR.
+        
+    Returns:
+        list: Um resultado por imagem, no mesmo formato de detect_enem_sheet (overlay via render_debug_overlay)
+    """
+    resultados = [None] * len(images)
+    if cronometros is None:
+        cronometros = [Cronometro() for _ in images]
+    
+    try:
+        net = load_model(*cronometros)
+    except Exception as e:
+        return [{'sucesso': False, 'erro': str(e), 'detectado': False, 'rois': {}} for _ in images]
+    
+    for inicio in range(0, len(images), MAX_BATCH_SIZE):
+        lote = []  # (indice_original, shape, escala, pad, img_padded, ordem)
+        
+        for i in range(inicio, min(inicio + MAX_BATCH_SIZE, len(images))):
+            try:
+                image_input = images[i]
+                image_np, shape, escala_entrada = imagem_para_deteccao(image_input, cronometros[i])
+                ordem = ordem_canais if isinstance(image_input, np.ndarray) else 'bgr'
+                with cronometros[i].etapa('letterbox'):
+                    img_padded, scale, pad = letterbox_image(image_np)
+                # Caixas voltam para a resolução original, não para a da imagem reduzida
+                lote.append((i, shape, scale * escala_entrada, pad, img_padded, ordem))
+            except Exception as e:
+                resultados[i] = {'sucesso': False, 'erro': str(e), 'detectado': False, 'rois': {},
+                                 'timings_ms': cronometros[i].como_dict()}
+        
+        if not lote:
+            continue
+        
+        try:
+            inicio_blob = time.perf_counter()
+            # O modelo espera RGB: lote todo BGR troca os canais no próprio blob; com
+            # arrays RGB, só os itens BGR (decodificados aqui) são convertidos, já em 640x640
+            if all(item[5] == 'bgr' for item in lote):
+                blob = cv2.dnn.blobFromImages([item[4] for item in lote], 1/255.0, INPUT_SIZE, swapRB=True, crop=False)
+            else:
+                imgs_rgb = [item[4] if item[5] == 'rgb' else cv2.cvtColor(item[4], cv2.COLOR_BGR2RGB) for item in lote]
+                blob = cv2.dnn.blobFromImages(imgs_rgb, 1/255.0, INPUT_SIZE, swapRB=False, crop=False)
+            tempo_blob_ms = (time.perf_counter() - inicio_blob) * 1000
+            inicio_forward = time.perf_counter()
+            output = _forward_lote(net, blob)
+            tempo_inferencia_ms = (time.perf_counter() - inicio_forward) * 1000
+            
+            for batch_index, (i, shape, scale, pad, img_padded, ordem) in enumerate(lote):
+                cronometros[i].registrar('letterbox', tempo_blob_ms)  # Blob NCHW do lote
+                cronometros[i].registrar('forward', tempo_inferencia_ms)
+                with cronometros[i].etapa('nms'):
+                    detections = postprocess_batch_item(output, batch_index, shape, scale, pad)
+                    rois = montar_rois(detections)
+                resultados[i] = {
+                    'sucesso': True,
+                    'detectado': 'day_region' in rois and 'answer_area_enem' in rois,
+                    'rois': rois,
+                    'total_deteccoes': len(detections),
+                    'backend_inferencia': get_backend_info(),
+                    'tempo_inferencia_ms': round(tempo_inferencia_ms, 2),  # Forward do lote inteiro
+                    'tamanho_lote': len(lote),
+                    'deteccao_id': _guardar_para_debug(img_padded, detections, scale, pad, ordem),
+                    'timings_ms': cronometros[i].como_dict()
+                }
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            for item in lote:
+                resultados[item[0]] = {'sucesso': False, 'erro': str(e), 'detectado': False, 'rois': {}}
+    
+    return resultados
+
+
+if __name__ == "__main__":
+    import json
+    
+    if len(sys.argv) < 2:
+        print(json.dumps({
+            'sucesso': False,
+            'erro': 'Uso: python detector_yolo_enem.py <imagem1> [imagem2 ...]'
+        }))
+        sys.exit(1)
+    
+    caminhos = sys.argv[1:]
+    resultados = detect_enem_sheet_batch(caminhos)
+    for caminho, resultado in zip(caminhos, resultados):
+        resultado['arquivo'] = caminho
+    print(json.dumps(resultados, ensure_ascii=False, indent=2))
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Limites de concorrência e agrupamento em lote das requisições do Space
+A fila do Gradio limita quantas requisições ficam pendentes; aqui fica o que ela
+não mede: quantas requisições aguardam a vez de cada endpoint, quanto tempo
+esperaram e quantos frames o /detect juntou em cada chamada ao detector.
+
+    Fila: no máximo `concorrencia` execuções simultâneas de um endpoint;
+          cada entrada informa a profundidade da fila e a espera (ms).
+          Com limitar=False só conta: o limite fica com o concurrency_limit do
+          Gradio, cuja fila não prende uma thread por requisição aguardando;
+          a espera é medida desde a chegada da requisição (CarimboChegada) e a
+          profundidade vem de `contar_aguardando`.
+    CarimboChegada: middleware ASGI que anota em request.state.chegada o
+          instante em que a requisição chegou ao servidor.
+    LoteDeteccao: frames que chegam juntos (dentro de janela_ms, até
+          tamanho_maximo) são detectados em um único detect_enem_sheet_batch.
+
+Uso:
+    with FILA_PROCESS.entrar(chegada=request.state.chegada) as fila:
+        resultado = processar(...)
+    resultado['fila'] = fila
+
+    resultado, fila = LOTE_DETECT.submeter(image_bgr)
+"""
+
+import sys
+import time
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from cronometro import Cronometro
+
+
+class CarimboChegada:
+    """
+    Middleware ASGI: guarda em scope['state']['chegada'] (request.state.chegada) o
+    time.perf_counter() da chegada da requisição, antes de ela entrar na fila do Gradio.
+
+    Uso: demo.launch(app_kwargs={'middleware': [Middleware(CarimboChegada)]})
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            scope.setdefault('state', {})['chegada'] = time.perf_counter()
+        await self.app(scope, receive, send)
+
+
+class Fila:
+    """Semáforo com contadores: aguardando, em execução, atendidas e tempo de espera"""
+
+    def __init__(self, nome, concorrencia, limitar=True, contar_aguardando=None):
+        self.nome = nome
+        self.concorrencia = max(1, int(concorrencia))
+        self.limitar = limitar
+        # Sem limitar, quem aguarda está numa fila externa (a do Gradio); a contagem vem dela
+        self.contar_aguardando = contar_aguardando
+        self._semaforo = threading.BoundedSemaphore(self.concorrencia) if limitar else None
+        self._lock = threading.Lock()
+        self.aguardando = 0
+        self.em_execucao = 0
+        self.atendidas = 0
+        self._espera_total_ms = 0.0
+        self._espera_maxima_ms = 0.0
+        self._esperas_medidas = 0
+
+    def _aguardando_externo(self):
+        try:
+            return self.contar_aguardando() if self.contar_aguardando else None
+        except Exception:
+            return None
+
+    def _registrar_espera(self, espera_ms):
+        self._espera_total_ms += espera_ms
+        self._espera_maxima_ms = max(self._espera_maxima_ms, espera_ms)
+        self._esperas_medidas += 1
+
+    @contextmanager
+    def entrar(self, chegada=None):
+        """
+        Aguarda uma vaga e executa o bloco (sem limitar, só registra a execução).
+
+        Args:
+            chegada: Sem limitar, time.perf_counter() da chegada da requisição
+                     (request.state.chegada); a espera vai dela até aqui
+
+        Yields:
+            dict: {profundidade (requisições já aguardando na chegada), espera_ms};
+                  sem limitar, {profundidade (ainda aguardando na fila externa),
+                  espera_ms, em_execucao (incluindo esta)}, com None no que não
+                  foi possível medir
+        """
+        if not self.limitar:
+            espera_ms = (time.perf_counter() - chegada) * 1000 if chegada is not None else None
+            profundidade = self._aguardando_externo()
+            with self._lock:
+                self.em_execucao += 1
+                self.atendidas += 1
+                em_execucao = self.em_execucao
+                if espera_ms is not None:
+                    self._registrar_espera(espera_ms)
+            try:
+                yield {
+                    'profundidade': profundidade,
+                    'espera_ms': round(espera_ms, 2) if espera_ms is not None else None,
+                    'em_execucao': em_execucao
+                }
+            finally:
+                with self._lock:
+                    self.em_execucao -= 1
+            return
+
+        inicio_espera = time.perf_counter()
+        with self._lock:
+            profundidade = self.aguardando
+            self.aguardando += 1
+        self._semaforo.acquire()
+        espera_ms = (time.perf_counter() - inicio_espera) * 1000
+        with self._lock:
+            self.aguardando -= 1
+            self.em_execucao += 1
+            self.atendidas += 1
+            self._registrar_espera(espera_ms)
+        try:
+            yield {'profundidade': profundidade, 'espera_ms': round(espera_ms, 2)}
+        finally:
+            with self._lock:
+                self.em_execucao -= 1
+            self._semaforo.release()
+
+    def estatisticas(self):
+        aguardando_externo = None if self.limitar else self._aguardando_externo()
+        with self._lock:
+            return {
+                'concorrencia': self.concorrencia,
+                'aguardando': self.aguardando if self.limitar else aguardando_externo,
+                'em_execucao': self.em_execucao,
+                'atendidas': self.atendidas,
+                'espera_media_ms': (round(self._espera_total_ms / self._esperas_medidas, 2)
+                                    if self._esperas_medidas else None),
+                'espera_maxima_ms': round(self._espera_maxima_ms, 2)
+            }
+
+
+class LoteDeteccao:
+    """
+    Agrupa frames concorrentes em uma chamada a `detectar_lote(imagens, cronometros)`.
+
+    A requisição que encontra o detector livre vira líder: espera até janela_ms por
+    outros frames (ou até tamanho_maximo), executa o lote e devolve a liderança a
+    uma das que ainda aguardam, que monta o próximo lote com o que chegou nesse meio
+    tempo. Sem concorrência, o custo extra é a janela.
+    """
+
+    def __init__(self, detectar_lote, tamanho_maximo=8, janela_ms=10):
+        self.detectar_lote = detectar_lote
+        self.tamanho_maximo = max(1, int(tamanho_maximo))
+        self.janela_s = max(0.0, float(janela_ms)) / 1000
+        self._cond = threading.Condition()
+        self._pendentes = []  # (imagem, cronometro, future, chegada)
+        self._ocupado = False
+        self.lotes = 0
+        self.frames = 0
+
+    def submeter(self, imagem, cronometro=None):
+        """
+        Detecta a imagem junto com os frames que chegarem ao mesmo tempo.
+
+        Returns:
+            tuple: (resultado de detect_enem_sheet_batch para a imagem,
+                    {profundidade, espera_ms, tamanho_lote})
+        """
+        cronometro = cronometro if cronometro is not None else Cronometro()
+        future = Future()
+        with self._cond:
+            profundidade = len(self._pendentes)
+            self._pendentes.append((imagem, cronometro, future, time.perf_counter()))
+            self._cond.notify_all()
+
+        while True:
+            with self._cond:
+                while self._ocupado and not future.done():
+                    self._cond.wait()
+                if future.done():
+                    break
+                self._ocupado = True
+            self._executar_lote()
+
+        resultado, info = future.result()
+        info['profundidade'] = profundidade
+        return resultado, info
+
+    def _executar_lote(self):
+        """Executado pela thread líder: junta um lote, detecta e libera a liderança"""
+        lote = []
+        try:
+            with self._cond:
+                limite = time.perf_counter() + self.janela_s
+                while len(self._pendentes) < self.tamanho_maximo:
+                    restante = limite - time.perf_counter()
+                    if restante <= 0:
+                        break
+                    self._cond.wait(restante)
+                lote = self._pendentes[:self.tamanho_maximo]
+                del self._pendentes[:self.tamanho_maximo]
+
+            inicio = time.perf_counter()
+            try:
+                resultados = self.detectar_lote([item[0] for item in lote], [item[1] for item in lote])
+            except Exception as e:
+                resultados = [{'sucesso': False, 'erro': str(e), 'detectado': False, 'rois': {}} for _ in lote]
+            for (_, _, future, chegada), resultado in zip(lote, resultados):
+                future.set_result((resultado, {
+                    'espera_ms': round((inicio - chegada) * 1000, 2),
+                    'tamanho_lote': len(lote)
+                }))
+            if len(lote) > 1:
+                print(f"[FILA] /detect: lote de {len(lote)} frames em "
+                      f"{(time.perf_counter() - inicio) * 1000:.1f} ms", file=sys.stderr)
+        finally:
+            with self._cond:
+                if lote:
+                    self.lotes += 1
+                    self.frames += len(lote)
+                self._ocupado = False
+                self._cond.notify_all()
+
+    def estatisticas(self):
+        with self._cond:
+            return {
+                'tamanho_maximo': self.tamanho_maximo,
+                'janela_ms': round(self.janela_s * 1000, 2),
+                'aguardando': len(self._pendentes),
+                'lotes': self.lotes,
+                'frames': self.frames,
+                'frames_por_lote': round(self.frames / self.lotes, 2) if self.lotes else None
+            }
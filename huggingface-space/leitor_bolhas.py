@@ -0,0 +1,420 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Leitor de bolhas compartilhado pelos pipelines de correção
+(app.py, processar_respostas_enem_mobile.py, processar_respostas_Imagem_original.py
+e processar_respostas_imagem_processadas.py)
+
+Pipeline: máscara binária (Otsu + morfologia) → leitura das marcações → matriz
+(blocos x questões x alternativas) → resultado no formato padrão
+{respostas, total_bolhas_detectadas, questoes_com_dupla_marcacao, ...}.
+
+Cada layout é um descritor declarativo (dict) compilado, para a largura da
+máscara, em arrays NumPy (centros X das alternativas e limites X dos blocos);
+a classificação das bolhas é vetorizada sobre esses arrays.
+
+Motores (OMR_MOTOR_BOLHAS ou argumento motor):
+    contornos (padrão): contornos + circularidade + preenchimento; centróides classificados pelo layout
+    grade: preenchimento de todas as células lido de uma vez pela imagem integral
+
+Layouts:
+    LAYOUT_ENEM_90: 3 colunas x 30 questões x 5 alternativas (answer_area_enem)
+    LAYOUT_SIS_60:  3 blocos x 20 questões x 5 alternativas (folha retificada, 678 px de largura)
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+# Motor de leitura de bolhas: 'contornos' (padrão) ou 'grade'
+MOTOR_BOLHAS = os.environ.get('OMR_MOTOR_BOLHAS', 'contornos')
+MOTORES = ('contornos', 'grade')
+
+LIMIAR_MARCACAO = 0.5  # Fração mínima de pixels marcados na célula para considerar a bolha preenchida (grade)
+
+# Descritores de layout. Medidas em pixels da máscara de trabalho:
+#   largura_trabalho: máscara é redimensionada para essa largura antes da leitura (None = resolução do recorte)
+#   centros_x / limites_x: em coordenadas de largura_referencia (None = blocos de mesma largura
+#                          e alternativas equidistantes dentro de cada bloco)
+#   area_minima, limiar_branco, margem_coluna, max_bolhas: filtros do motor por contornos
+LAYOUT_ENEM_90 = {
+    'nome': 'enem_90',
+    'blocos': 3,
+    'questoes_por_bloco': 30,
+    'letras': ['A', 'B', 'C', 'D', 'E'],
+    'largura_trabalho': None,
+    'largura_referencia': None,
+    'centros_x': None,
+    'limites_x': None,
+    'area_minima': 100,
+    'limiar_branco': 0.70,
+    'margem_coluna': 20,
+    'max_bolhas': None,
+}
+
+LAYOUT_SIS_60 = {
+    'nome': 'sis_60',
+    'blocos': 3,
+    'questoes_por_bloco': 20,
+    'letras': ['A', 'B', 'C', 'D', 'E'],
+    'largura_trabalho': 678,
+    'largura_referencia': 678,
+    'centros_x': [
+        [75, 104, 134, 163, 192],    # Bloco 1-20
+        [301, 330, 357, 387, 415],   # Bloco 21-40
+        [525, 553, 584, 612, 641],   # Bloco 41-60
+    ],
+    'limites_x': [(0, 250), (250, 450), (450, 700)],
+    'area_minima': 200,
+    'limiar_branco': 0.75,
+    'margem_coluna': 15,
+    'max_bolhas': 180,  # 3 blocos de 60 bolhas
+}
+
+_LAYOUTS_COMPILADOS = {}
+
+
+def compilar_layout(layout, largura):
+    """
+    Converte o descritor em arrays para uma largura de máscara (resultado em cache).
+
+    Returns:
+        dict: {centros_x: (blocos, alternativas), limites_x: (blocos, 2)}
+    """
+    chave = (layout['nome'], int(largura))
+    compilado = _LAYOUTS_COMPILADOS.get(chave)
+    if compilado is not None:
+        return compilado
+
+    blocos = layout['blocos']
+    num_letras = len(layout['letras'])
+
+    if layout['centros_x'] is not None:
+        fator = largura / layout['largura_referencia']
+        centros_x = np.asarray(layout['centros_x'], dtype=np.float64) * fator
+        limites_x = np.asarray(layout['limites_x'], dtype=np.float64) * fator
+    else:
+        largura_bloco = largura / blocos
+        inicio = np.floor(np.arange(blocos) * largura_bloco)
+        fim = np.floor(np.arange(1, blocos + 1) * largura_bloco)
+        centros_x = inicio[:, None] + (fim - inicio)[:, None] * (np.arange(num_letras) + 0.5)[None, :] / num_letras
+        limites_x = np.stack([inicio, fim], axis=1)
+
+    compilado = {'centros_x': centros_x, 'limites_x': limites_x}
+    _LAYOUTS_COMPILADOS[chave] = compilado
+    return compilado
+
+
+def gerar_mascara(imagem):
+    """
+    Máscara binária das marcações (bolhas preenchidas = 255): Otsu invertido + abertura/fechamento.
+
+    Args:
+        imagem: Imagem BGR ou em tons de cinza
+    """
+    cinza = cv2.cvtColor(imagem, cv2.COLOR_BGR2GRAY) if imagem.ndim == 3 else imagem
+    suavizada = cv2.GaussianBlur(cinza, (5, 5), 0)
+    _, binaria = cv2.threshold(suavizada, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    # Remoção de ruído
+    kernel = np.ones((5, 5), np.uint8)
+    mascara = cv2.morphologyEx(binaria, cv2.MORPH_OPEN, kernel)
+    return cv2.morphologyEx(mascara, cv2.MORPH_CLOSE, kernel)
+
+
+def preparar_mascara(imagem, layout):
+    """Máscara na resolução de trabalho do layout"""
+    mascara = gerar_mascara(imagem)
+    largura_trabalho = layout['largura_trabalho']
+    if largura_trabalho and mascara.shape[1] != largura_trabalho:
+        escala = largura_trabalho / mascara.shape[1]
+        mascara = cv2.resize(mascara, (largura_trabalho, int(mascara.shape[0] * escala)))
+    return mascara
+
+
+def calcular_proporcao_preenchimento(mascara, contorno):
+    """
+    Proporção de pixels brancos da máscara dentro do contorno.
+    Trabalha só no bounding box do contorno (máscara local do tamanho da bolha),
+    em vez de alocar e varrer uma máscara do tamanho da imagem inteira.
+
+    Returns:
+        float ou None: proporção (0.0 - 1.0) ou None se o contorno não tiver pixels
+    """
+    x, y, w, h = cv2.boundingRect(contorno)
+    mascara_local = np.zeros((h, w), dtype=np.uint8)
+    cv2.drawContours(mascara_local, [contorno], -1, 255, -1, offset=(-x, -y))
+    dentro = mascara_local == 255
+    total_pixels = np.count_nonzero(dentro)
+    if total_pixels == 0:
+        return None
+    pixels_brancos = np.count_nonzero(mascara[y:y + h, x:x + w][dentro] == 255)
+    return pixels_brancos / total_pixels
+
+
+def ler_contornos(mascara, layout):
+    """
+    Motor por contornos: filtra bolhas preenchidas (área, circularidade, preenchimento)
+    e classifica os centróides em (bloco, questão, alternativa) pelo layout compilado.
+
+    Returns:
+        tuple: (marcadas (blocos, questoes, alternativas) bool, total de bolhas detectadas)
+    """
+    blocos = layout['blocos']
+    questoes = layout['questoes_por_bloco']
+    compilado = compilar_layout(layout, mascara.shape[1])
+
+    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    bolhas_validas = []
+    for contorno in contornos:
+        area = cv2.contourArea(contorno)
+        if area <= layout['area_minima']:
+            continue
+        perimetro = cv2.arcLength(contorno, True)
+        if perimetro == 0 or 4 * np.pi * area / (perimetro ** 2) <= 0.4:
+            continue
+        proporcao_branco = calcular_proporcao_preenchimento(mascara, contorno)
+        if proporcao_branco is not None and proporcao_branco >= layout['limiar_branco']:
+            bolhas_validas.append(contorno)
+
+    # Ordem vertical pelo topo do bounding box (limite de bolhas aplicado nessa ordem)
+    bolhas_validas.sort(key=lambda c: cv2.boundingRect(c)[1])
+    if layout['max_bolhas']:
+        bolhas_validas = bolhas_validas[:layout['max_bolhas']]
+
+    centroides = []
+    for contorno in bolhas_validas:
+        M = cv2.moments(contorno)
+        if M["m00"] != 0:
+            centroides.append((int(M["m10"] / M["m00"]), int(M["m01"] / M["m00"])))
+
+    marcadas = np.zeros((blocos, questoes, len(layout['letras'])), dtype=bool)
+    if not centroides:
+        return marcadas, 0
+
+    pontos = np.array(centroides, dtype=np.int64)
+    pontos = pontos[np.argsort(pontos[:, 1], kind='stable')]
+    xs, ys = pontos[:, 0], pontos[:, 1]
+
+    limites = compilado['limites_x']
+    dentro_bloco = (xs[:, None] >= limites[None, :, 0]) & (xs[:, None] < limites[None, :, 1])
+
+    for bloco in range(blocos):
+        indices = np.flatnonzero(dentro_bloco[:, bloco])
+        if len(indices) == 0:
+            continue
+        x_bloco, y_bloco = xs[indices], ys[indices]
+
+        # Questões distribuídas uniformemente entre a primeira e a última marcação do bloco
+        passo_y = (y_bloco[-1] - y_bloco[0]) / (questoes - 1)
+        if passo_y > 0:
+            questao = np.minimum(np.round((y_bloco - y_bloco[0]) / passo_y).astype(int), questoes - 1)
+        else:
+            questao = np.zeros(len(indices), dtype=int)
+
+        distancias = np.abs(x_bloco[:, None] - compilado['centros_x'][bloco][None, :])
+        alternativa = np.argmin(distancias, axis=1)
+        dentro_margem = distancias[np.arange(len(indices)), alternativa] <= layout['margem_coluna']
+        marcadas[bloco, questao[dentro_margem], alternativa[dentro_margem]] = True
+
+    return marcadas, len(centroides)
+
+
+def estimar_linhas(integral, centros_x, meia_largura, questoes):
+    """
+    Estima os centros Y das questões de cada bloco pelo perfil vertical das
+    faixas das alternativas: a primeira e a última linha com marcação delimitam
+    a grade (mesma premissa do motor por contornos), e as questões são
+    distribuídas uniformemente entre elas. Sem marcações suficientes, a grade
+    ocupa a altura inteira.
+
+    Args:
+        integral: Imagem integral (altura+1, largura+1) da máscara binária (0/1)
+
+    Returns:
+        np.ndarray: (blocos, questoes)
+    """
+    altura, largura = integral.shape[0] - 1, integral.shape[1] - 1
+    linhas = np.empty((centros_x.shape[0], questoes), dtype=np.float64)
+    uniforme = altura * (np.arange(questoes) + 0.5) / questoes
+
+    for bloco, xs in enumerate(centros_x):
+        x1 = np.clip(np.round(xs - meia_largura).astype(int), 0, largura)
+        x2 = np.clip(np.round(xs + meia_largura).astype(int), 0, largura)
+        larguras = np.maximum(x2 - x1, 1)
+        # Soma de cada linha dentro de cada faixa = diferença vertical da integral nas bordas da faixa
+        por_linha = np.diff(integral[:, x2] - integral[:, x1], axis=0)
+        # Quantas alternativas têm a linha marcada; todas marcadas ao mesmo tempo é fundo
+        # (sobra da retificação nas bordas) ou traço impresso, não bolha
+        alternativas_marcadas = ((por_linha / larguras) >= LIMIAR_MARCACAO).sum(axis=1)
+        marcadas = (alternativas_marcadas > 0) & (alternativas_marcadas < centros_x.shape[1])
+
+        bordas = np.flatnonzero(np.diff(np.concatenate([[0], marcadas.astype(np.int8), [0]]))).reshape(-1, 2)
+        # Trechos colados na borda superior/inferior, mais baixos que meia célula ou mais altos
+        # que uma questão inteira também não são bolhas
+        alturas = bordas[:, 1] - bordas[:, 0]
+        bordas = bordas[(bordas[:, 0] > 0) & (bordas[:, 1] < altura)
+                        & (alturas >= meia_largura) & (alturas <= altura / questoes)]
+        if len(bordas) < 2:  # menos de duas marcações separadas
+            linhas[bloco] = uniforme
+            continue
+
+        primeira = (bordas[0, 0] + bordas[0, 1] - 1) / 2
+        ultima = (bordas[-1, 0] + bordas[-1, 1] - 1) / 2
+        linhas[bloco] = primeira + (ultima - primeira) * np.arange(questoes) / (questoes - 1)
+
+    return linhas
+
+
+def ler_grade(mascara, layout, centros_y=None):
+    """
+    Motor por grade: lê o preenchimento de todas as células do layout em uma única passada vetorizada.
+
+    Args:
+        mascara: Máscara binária (bolhas marcadas = 255) da área de respostas
+        layout: Descritor de layout (LAYOUT_ENEM_90, LAYOUT_SIS_60, ...)
+        centros_y: Centros Y (blocos, questoes) já conhecidos; None estima pela máscara
+
+    Returns:
+        np.ndarray: Matriz (blocos, questoes, alternativas) com a fração preenchida de cada célula
+    """
+    altura, largura = mascara.shape[:2]
+    questoes = layout['questoes_por_bloco']
+    centros_x = compilar_layout(layout, largura)['centros_x']
+
+    passo_x = np.min(np.diff(centros_x, axis=1)) if centros_x.shape[1] > 1 else largura / layout['blocos']
+    passo_y = altura / questoes
+    # Célula quadrada inscrita na bolha (evita pegar contorno impresso e vizinhas)
+    meia = max(1.0, 0.3 * min(passo_x, passo_y))
+
+    integral = cv2.integral((mascara > 0).astype(np.uint8))
+
+    if centros_y is None:
+        centros_y = estimar_linhas(integral, centros_x, meia, questoes)
+    centros_y = np.asarray(centros_y, dtype=np.float64)
+
+    # Broadcast para (blocos, questoes, alternativas)
+    cx = centros_x[:, None, :]
+    cy = centros_y[:, :, None]
+    x1 = np.clip(np.round(cx - meia).astype(int), 0, largura)
+    x2 = np.clip(np.round(cx + meia).astype(int), 0, largura)
+    y1 = np.clip(np.round(cy - meia).astype(int), 0, altura)
+    y2 = np.clip(np.round(cy + meia).astype(int), 0, altura)
+    x1, x2, y1, y2 = np.broadcast_arrays(x1, x2, y1, y2)
+
+    soma = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+    area = np.maximum((x2 - x1) * (y2 - y1), 1)
+    return soma / area
+
+
+def montar_resultado(marcadas, layout, total_bolhas):
+    """
+    Converte a matriz de marcações no formato de resposta dos pipelines.
+
+    Returns:
+        dict: {respostas, total_bolhas_detectadas, questoes_com_dupla_marcacao,
+               questoes_sem_marcacao, questoes_validas, questoes_invalidas_detalhes}
+    """
+    letras = layout['letras']
+    questoes = layout['questoes_por_bloco']
+
+    respostas = []
+    questoes_invalidas = []
+    respostas_invalidas_count = 0
+    questoes_sem_marcacao_count = 0
+
+    for bloco in range(layout['blocos']):
+        for questao in range(questoes):
+            questao_real = questao + 1 + bloco * questoes
+            respostas_marcadas = [letras[i] for i in np.flatnonzero(marcadas[bloco, questao])]
+
+            if len(respostas_marcadas) == 0:
+                questoes_sem_marcacao_count += 1
+                resposta_str = ""
+            elif len(respostas_marcadas) > 1:
+                respostas_invalidas_count += 1
+                resposta_str = ",".join(sorted(respostas_marcadas))
+                questoes_invalidas.append({
+                    'questao': questao_real,
+                    'respostas': respostas_marcadas,
+                    'tipo': 'dupla_marcacao'
+                })
+            else:
+                resposta_str = respostas_marcadas[0]
+
+            respostas.append({
+                "Questão": str(questao_real),
+                "Resposta": resposta_str,
+                "Valida": len(respostas_marcadas) == 1
+            })
+
+    return {
+        'respostas': respostas,
+        'total_bolhas_detectadas': int(total_bolhas),
+        'questoes_com_dupla_marcacao': respostas_invalidas_count,
+        'questoes_sem_marcacao': questoes_sem_marcacao_count,
+        'questoes_validas': len(respostas) - respostas_invalidas_count - questoes_sem_marcacao_count,
+        'questoes_invalidas_detalhes': questoes_invalidas
+    }
+
+
+def ler_bolhas_mascara(mascara, layout, motor=None):
+    """
+    Lê as marcações de uma máscara já na resolução de trabalho do layout.
+
+    Args:
+        motor: 'contornos' ou 'grade' (padrão: OMR_MOTOR_BOLHAS ou 'contornos')
+    """
+    motor = motor or MOTOR_BOLHAS
+    if motor == 'grade':
+        matriz = ler_grade(mascara, layout)
+        marcadas = matriz >= LIMIAR_MARCACAO
+        resultado = montar_resultado(marcadas, layout, np.count_nonzero(marcadas))
+        resultado['matriz_preenchimento'] = np.round(matriz, 3).tolist()
+    elif motor == 'contornos':
+        marcadas, total_bolhas = ler_contornos(mascara, layout)
+        resultado = montar_resultado(marcadas, layout, total_bolhas)
+    else:
+        raise ValueError(f"Motor de bolhas desconhecido: {motor} (use um de {', '.join(MOTORES)})")
+
+    resultado['motor_bolhas'] = motor
+    return resultado
+
+
+def ler_bolhas(imagem, layout, motor=None):
+    """
+    Ponto de entrada único: máscara → resolução de trabalho → leitura pelo motor escolhido.
+
+    Args:
+        imagem: Área de respostas (BGR ou tons de cinza) já recortada/retificada
+        layout: Descritor de layout (LAYOUT_ENEM_90, LAYOUT_SIS_60, ...)
+        motor: 'contornos' ou 'grade' (padrão: OMR_MOTOR_BOLHAS ou 'contornos')
+
+    Returns:
+        dict: {respostas, total_bolhas_detectadas, questoes_com_dupla_marcacao,
+               questoes_sem_marcacao, questoes_validas, questoes_invalidas_detalhes, motor_bolhas}
+    """
+    return ler_bolhas_mascara(preparar_mascara(imagem, layout), layout, motor)
+
+
+def montar_resultado_final(resultado_bolhas):
+    """Acrescenta sucesso, total de respostas e avisos ao resultado da leitura de bolhas"""
+    resultado = dict(resultado_bolhas)
+    resultado["sucesso"] = True
+    resultado["total_respostas"] = len(resultado_bolhas["respostas"])
+    resultado["avisos"] = []
+
+    if resultado_bolhas["questoes_com_dupla_marcacao"] > 0:
+        resultado["avisos"].append(
+            f"ATENÇÃO: {resultado_bolhas['questoes_com_dupla_marcacao']} questão(ões) com dupla marcação detectada(s). "
+            "Essas questões serão consideradas inválidas e não contarão como acerto."
+        )
+
+    if resultado_bolhas["questoes_sem_marcacao"] > 0:
+        resultado["avisos"].append(
+            f"INFO: {resultado_bolhas['questoes_sem_marcacao']} questão(ões) deixada(s) em branco."
+        )
+
+    return resultado
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Modo ao vivo do /detect: reaproveita a última detecção enquanto a câmera está parada
+Para cada cliente (cliente_id enviado pelo app) guarda a miniatura em cinza do
+último frame que passou pelo YOLO e as ROIs encontradas. Cada novo frame é
+comparado com essa miniatura por correlação de fase (deslocamento) e pela
+diferença média depois de compensar o deslocamento:
+
+    deslocamento e diferença abaixo dos limiares -> ROIs do cache, deslocadas
+    cena mudou (ou cache velho/ausente)         -> YOLO, e o cache é renovado
+
+Variáveis de ambiente:
+    AO_VIVO_ATIVO: liga o reaproveitamento (padrão 1)
+    AO_VIVO_LARGURA_MINIATURA: largura da miniatura comparada (padrão 160 px)
+    AO_VIVO_DESLOCAMENTO_MAXIMO: deslocamento aceito, fração da largura (padrão 0.05)
+    AO_VIVO_DIFERENCA_MAXIMA: diferença média aceita após o alinhamento, 0-1 (padrão 0.04)
+    AO_VIVO_MAX_REUSO: frames seguidos sem YOLO antes de forçar uma detecção (padrão 15)
+    AO_VIVO_TTL_S: idade máxima do cache de um cliente (padrão 10 s)
+    AO_VIVO_MAX_CLIENTES: clientes guardados; os mais antigos saem primeiro (padrão 64)
+
+Uso:
+    resultado = AO_VIVO.detectar(cliente_id, frame, cronometro, detectar)
+    resultado['ao_vivo']  # {reaproveitado, deslocamento_px, diferenca, frames_reaproveitados}
+
+Um resultado reaproveitado traz as caixas deslocadas e não traz deteccao_id nem
+debug_base64, que pertencem ao frame detectado.
+"""
+
+import os
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from cronometro import Cronometro
+
+# Campos que só valem para o frame que passou pelo YOLO: o deteccao_id aponta para o
+# frame letterboxed guardado para o overlay, que não corresponde ao frame reaproveitado
+CAMPOS_DO_FRAME_DETECTADO = ('deteccao_id', 'debug_base64')
+
+AO_VIVO_ATIVO = os.environ.get("AO_VIVO_ATIVO", "1").lower() in ("1", "true")
+LARGURA_MINIATURA = int(os.environ.get("AO_VIVO_LARGURA_MINIATURA", "160"))
+DESLOCAMENTO_MAXIMO = float(os.environ.get("AO_VIVO_DESLOCAMENTO_MAXIMO", "0.05"))
+DIFERENCA_MAXIMA = float(os.environ.get("AO_VIVO_DIFERENCA_MAXIMA", "0.04"))
+MAX_REUSO = int(os.environ.get("AO_VIVO_MAX_REUSO", "15"))
+TTL_S = float(os.environ.get("AO_VIVO_TTL_S", "10"))
+MAX_CLIENTES = int(os.environ.get("AO_VIVO_MAX_CLIENTES", "64"))
+
+
+def miniatura_cinza(imagem, ordem_canais='bgr'):
+    """Miniatura em cinza (float32) com a largura LARGURA_MINIATURA, suavizada contra ruído do sensor"""
+    h, w = imagem.shape[:2]
+    escala = LARGURA_MINIATURA / w
+    tamanho = (LARGURA_MINIATURA, max(1, int(round(h * escala))))
+    # Reduzir antes de converter: a conversão para cinza fica no tamanho da miniatura
+    mini = cv2.resize(imagem, tamanho, interpolation=cv2.INTER_AREA)
+    if mini.ndim == 3:
+        mini = cv2.cvtColor(mini, cv2.COLOR_RGB2GRAY if ordem_canais == 'rgb' else cv2.COLOR_BGR2GRAY)
+    mini = cv2.GaussianBlur(mini, (3, 3), 0)
+    return mini.astype(np.float32) / 255.0, escala
+
+
+def comparar_miniaturas(referencia, atual, janela):
+    """
+    Deslocamento de `atual` em relação a `referencia` e a diferença média restante.
+
+    Returns:
+        tuple: ((dx, dy) em pixels da miniatura, diferença média 0-1 na área comum)
+    """
+    (dx, dy), _ = cv2.phaseCorrelate(referencia, atual, janela)
+    h, w = referencia.shape
+    deslocamento = np.float32([[1, 0, dx], [0, 1, dy]])
+    alinhada = cv2.warpAffine(referencia, deslocamento, (w, h), flags=cv2.INTER_LINEAR)
+    # Ignorar a borda que entrou em cena com o deslocamento
+    x0, x1 = int(np.ceil(max(0, dx))), int(w + min(0, np.floor(dx)))
+    y0, y1 = int(np.ceil(max(0, dy))), int(h + min(0, np.floor(dy)))
+    if x1 - x0 < w // 2 or y1 - y0 < h // 2:
+        return (dx, dy), 1.0
+    diferenca = float(np.mean(np.abs(alinhada[y0:y1, x0:x1] - atual[y0:y1, x0:x1])))
+    return (dx, dy), diferenca
+
+
+def deslocar_caixas(caixas, dx, dy, largura, altura):
+    """Cópia da lista de caixas (dicts com bbox e bbox_norm) deslocadas (dx, dy em pixels do frame)"""
+    deslocadas = copy.deepcopy(caixas)
+    for caixa in deslocadas:
+        x, y, w, h = caixa['bbox']
+        caixa['bbox'] = [int(round(x + dx)), int(round(y + dy)), w, h]
+        xn, yn, wn, hn = caixa['bbox_norm']
+        caixa['bbox_norm'] = [xn + dx / largura, yn + dy / altura, wn, hn]
+    return deslocadas
+
+
+def deslocar_rois(rois, dx, dy, largura, altura):
+    """Cópia das ROIs com as caixas deslocadas (dx, dy em pixels do frame)"""
+    return {classe: deslocar_caixas(caixas, dx, dy, largura, altura) for classe, caixas in rois.items()}
+
+
+class EstadoCliente:
+    """Miniatura e resultado do último frame de um cliente que passou pelo YOLO"""
+
+    def __init__(self, miniatura, escala, shape, resultado):
+        self.miniatura = miniatura
+        self.escala = escala
+        self.shape = shape
+        self.resultado = resultado
+        self.instante = time.monotonic()
+        self.frames_reaproveitados = 0
+
+
+class CacheAoVivo:
+    """Estados por cliente (LRU limitado a MAX_CLIENTES, expirados após TTL_S)"""
+
+    def __init__(self):
+        self._estados = OrderedDict()
+        self._janelas = {}
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.reaproveitados = 0
+
+    def _janela(self, shape):
+        """Janela de Hanning da correlação de fase, uma por tamanho de miniatura"""
+        with self._lock:
+            janela = self._janelas.get(shape)
+            if janela is None:
+                janela = self._janelas[shape] = cv2.createHanningWindow((shape[1], shape[0]), cv2.CV_32F)
+            return janela
+
+    def _obter(self, cliente_id):
+        with self._lock:
+            estado = self._estados.get(cliente_id)
+            if estado is not None and time.monotonic() - estado.instante > TTL_S:
+                del self._estados[cliente_id]
+                return None
+            if estado is not None:
+                self._estados.move_to_end(cliente_id)
+            return estado
+
+    def _guardar(self, cliente_id, estado):
+        with self._lock:
+            self._estados[cliente_id] = estado
+            self._estados.move_to_end(cliente_id)
+            while len(self._estados) > MAX_CLIENTES:
+                self._estados.popitem(last=False)
+
+    def detectar(self, cliente_id, frame, cronometro, detectar, ordem_canais='bgr'):
+        """
+        Detecção do frame, reaproveitando a do cliente quando a cena não mudou.
+
+        Args:
+            cliente_id: Identificador estável da câmera/sessão (vazio desliga o cache)
+            frame: Frame (numpy, na ordem de canais ordem_canais)
+            cronometro: Cronometro da requisição (etapa comparacao_movimento)
+            detectar: Função (frame, cronometro) -> resultado do YOLO
+            ordem_canais: 'bgr' ou 'rgb' (só afeta a conversão da miniatura para cinza)
+
+        Returns:
+            dict: Resultado do YOLO (ou o do cache com as caixas deslocadas, sem deteccao_id) + ao_vivo
+        """
+        if cronometro is None:
+            cronometro = Cronometro()
+        if not AO_VIVO_ATIVO or not cliente_id:
+            return detectar(frame, cronometro)
+
+        with cronometro.etapa('comparacao_movimento'):
+            miniatura, escala = miniatura_cinza(frame, ordem_canais)
+            estado = self._obter(cliente_id)
+            info = {'reaproveitado': False, 'deslocamento_px': None, 'diferenca': None,
+                    'frames_reaproveitados': 0}
+            if (estado is not None and estado.shape == frame.shape[:2]
+                    and estado.frames_reaproveitados < MAX_REUSO):
+                (dx, dy), diferenca = comparar_miniaturas(estado.miniatura, miniatura,
+                                                          self._janela(miniatura.shape))
+                info['deslocamento_px'] = [round(dx / escala, 1), round(dy / escala, 1)]
+                info['diferenca'] = round(diferenca, 4)
+                parado = (np.hypot(dx, dy) <= DESLOCAMENTO_MAXIMO * miniatura.shape[1]
+                          and diferenca <= DIFERENCA_MAXIMA)
+            else:
+                parado = False
+
+        with self._lock:
+            self.frames += 1
+            self.reaproveitados += int(parado)
+            if parado:
+                estado.frames_reaproveitados += 1
+                frames_reaproveitados = estado.frames_reaproveitados
+
+        if parado:
+            h, w = frame.shape[:2]
+            resultado = {chave: valor for chave, valor in estado.resultado.items()
+                         if chave not in CAMPOS_DO_FRAME_DETECTADO}
+            resultado['rois'] = deslocar_rois(estado.resultado.get('rois', {}), dx / escala, dy / escala, w, h)
+            if 'detections' in resultado:
+                resultado['detections'] = deslocar_caixas(resultado['detections'], dx / escala, dy / escala, w, h)
+            resultado['timings_ms'] = cronometro.como_dict()
+            info['reaproveitado'] = True
+            info['frames_reaproveitados'] = frames_reaproveitados
+            resultado['ao_vivo'] = info
+            return resultado
+
+        resultado = detectar(frame, cronometro)
+        if resultado.get('sucesso'):
+            self._guardar(cliente_id, EstadoCliente(miniatura, escala, frame.shape[:2], resultado))
+        resultado['ao_vivo'] = info
+        return resultado
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'ativo': AO_VIVO_ATIVO,
+                'clientes': len(self._estados),
+                'frames': self.frames,
+                'reaproveitados': self.reaproveitados,
+                'taxa_reaproveitamento': round(self.reaproveitados / self.frames, 3) if self.frames else None
+            }
+
+
+AO_VIVO = CacheAoVivo()
@@ -14,6 +14,12 @@ import os
 import re
 import sys
 import json
+import time
+import atexit
+import tempfile
+import threading
+
+from contexto_imagem import ContextoImagem
 
 # Configurar caminho do Tesseract se estiver no Windows (Desenvolvimento Local)
 if os.name == 'nt':
@@ -21,6 +27,358 @@ if os.name == 'nt':
     # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
     pass
 
+# Backend de OCR: "tesserocr" (API do Tesseract carregada uma vez no processo)
+# ou "pytesseract" (um processo tesseract por chamada). Sem tesserocr instalado,
+# ou se a API não inicializar, cai para pytesseract.
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "tesserocr").lower()
+OCR_IDIOMA = os.environ.get("OCR_IDIOMA", "por")
+# --psm 7: a day_region é uma única linha de texto; --oem 3: motor padrão
+OCR_PSM = 7
+OCR_OEM = 3
+
+
+class TesserocrOCR:
+    """
+    Handle do Tesseract em processo (tesserocr.PyTessBaseAPI), criado uma vez
+    com idioma e modo de segmentação já configurados e reaproveitado entre chamadas.
+    """
+    def __init__(self, idioma):
+        import tesserocr
+        
+        caminho_tessdata, idiomas = tesserocr.get_languages()
+        # Sem o pacote de idioma pedido, usa o inglês (mesmo fallback do pytesseract sem -l)
+        self.idioma = idioma if idioma in idiomas else 'eng'
+        self.api = tesserocr.PyTessBaseAPI(
+            path=caminho_tessdata,
+            lang=self.idioma,
+            psm=OCR_PSM,
+            oem=OCR_OEM
+        )
+        # A API não é thread-safe; o Gradio atende requisições em threads
+        self._lock = threading.Lock()
+    
+    def reconhecer(self, pil_img):
+        with self._lock:
+            self.api.SetImage(pil_img)
+            return self.api.GetUTF8Text()
+
+
+class PytesseractOCR:
+    """Tesseract via subprocesso (pytesseract); idioma verificado uma única vez"""
+    def __init__(self, idioma):
+        try:
+            idiomas = pytesseract.get_languages(config='')
+        except pytesseract.TesseractError:
+            idiomas = []
+        # Sem 'por' instalado, chama sem -l em vez de falhar e repetir o fork a cada imagem
+        self.idioma = idioma if idioma in idiomas else None
+        self.config = f'--oem {OCR_OEM} --psm {OCR_PSM}'
+    
+    def reconhecer(self, pil_img):
+        if self.idioma:
+            return pytesseract.image_to_string(pil_img, lang=self.idioma, config=self.config)
+        return pytesseract.image_to_string(pil_img, config=self.config)
+
+
+def create_ocr_engine(backend=None, idioma=None):
+    """
+    Cria um motor de OCR, sem usar o cache global.
+    
+    Returns:
+        tuple: (motor com reconhecer(pil_img) -> str, dict com informações do backend)
+    """
+    backend = (backend or OCR_BACKEND).lower()
+    idioma = idioma or OCR_IDIOMA
+    
+    if backend == "tesserocr":
+        try:
+            motor = TesserocrOCR(idioma)
+            return motor, {'nome': 'tesserocr', 'idioma': motor.idioma, 'psm': OCR_PSM}
+        except ImportError:
+            print("[OCR] tesserocr não instalado, usando pytesseract", file=sys.stderr)
+        except Exception as e:
+            print(f"[OCR] Falha ao iniciar tesserocr ({e}), usando pytesseract", file=sys.stderr)
+    elif backend != "pytesseract":
+        raise ValueError(f"OCR_BACKEND inválido: {backend}")
+    
+    motor = PytesseractOCR(idioma)
+    return motor, {'nome': 'pytesseract', 'idioma': motor.idioma, 'psm': OCR_PSM}
+
+_OCR = None
+_OCR_INFO = None
+_OCR_LOCK = threading.Lock()
+def load_ocr_engine():
+    global _OCR, _OCR_INFO
+    with _OCR_LOCK:
+        if _OCR is None:
+            _OCR, _OCR_INFO = create_ocr_engine()
+    return _OCR
+
+def get_ocr_backend_info():
+    """Backend de OCR efetivamente carregado (após load_ocr_engine) e suas opções"""
+    return dict(_OCR_INFO) if _OCR_INFO else None
+
+
+# Classificador rápido: a day_region só traz "1º DIA" ou "2º DIA", então a região
+# binarizada e normalizada é comparada (correlação) com modelos de cada dia e o
+# Tesseract só roda quando a confiança fica abaixo do limiar. Os modelos são
+# aprendidos das leituras inequívocas do Tesseract que o classificador confirma e,
+# com OCR_MODELOS_DIA, salvos em .npz para valerem entre reinícios.
+CLASSIFICADOR_RAPIDO = os.environ.get("OCR_CLASSIFICADOR_RAPIDO", "1").lower() in ("1", "true")
+# Confiança = folga entre os dois dias, normalizada pela distância entre os modelos
+# (1 = idêntica ao modelo do dia, 0 = no meio do caminho entre os dois dias)
+LIMIAR_CLASSIFICADOR = float(os.environ.get("OCR_LIMIAR_CLASSIFICADOR", "0.5"))
+# Correlação mínima com o modelo mais parecido (abaixo disso a região não parece um "DIA")
+SIMILARIDADE_MINIMA = float(os.environ.get("OCR_SIMILARIDADE_MINIMA", "0.6"))
+MODELOS_POR_DIA = int(os.environ.get("OCR_MODELOS_POR_DIA", "8"))
+MODELOS_DIA_PATH = os.environ.get("OCR_MODELOS_DIA")
+# Intervalo mínimo entre gravações do .npz (os modelos também são gravados ao sair)
+INTERVALO_SALVAR_MODELOS_S = float(os.environ.get("OCR_MODELOS_DIA_INTERVALO_S", "60"))
+TAMANHO_MODELO = (64, 16)  # (largura, altura) do texto normalizado
+# Enquanto falta modelo de um dos dias (o classificador não opina), uma leitura só vira
+# modelo depois de OCR_LEITURAS_CONCORDANTES leituras do mesmo dia: entra a mais parecida
+# com as demais
+LEITURAS_CONCORDANTES = int(os.environ.get("OCR_LEITURAS_CONCORDANTES", "3"))
+# 1 a cada N respostas do classificador também passa pelo Tesseract (0 desliga a conferência)
+VERIFICACAO_AMOSTRA = int(os.environ.get("OCR_VERIFICACAO_AMOSTRA", "20"))
+
+_MODELOS_DIA = {1: [], 2: []}
+_CANDIDATOS_DIA = {1: [], 2: []}  # Leituras aguardando concordância (sem modelos dos dois dias)
+_MODELOS_LOCK = threading.Lock()  # Protege modelos, candidatos e _ESTATISTICAS
+_MODELOS_ALTERADOS = False
+_ULTIMO_SALVAMENTO = float('-inf')
+_ESTATISTICAS = {'consultas': 0, 'classificador': 0, 'tesseract': 0,
+                 'verificacoes': 0, 'divergencias': 0, 'modelos_descartados': 0}
+
+
+def extrair_caracteristicas_dia(image):
+    """
+    Texto da região recortado pelas projeções de tinta e reduzido a TAMANHO_MODELO,
+    com média zero e norma 1 (o produto escalar entre dois vetores é a correlação).
+    
+    Returns:
+        np.ndarray (float32) ou None se a região não tiver tinta
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    _, tinta = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    
+    # Limites do texto pelas projeções (ignora pontos isolados de ruído)
+    perfil_linhas = tinta.sum(axis=1)
+    perfil_colunas = tinta.sum(axis=0)
+    linhas = np.flatnonzero(perfil_linhas > max(1, perfil_linhas.max() * 0.05))
+    colunas = np.flatnonzero(perfil_colunas > max(1, perfil_colunas.max() * 0.05))
+    if len(linhas) < 2 or len(colunas) < 2:
+        return None
+    
+    texto = tinta[linhas[0]:linhas[-1] + 1, colunas[0]:colunas[-1] + 1].astype(np.float32)
+    # Suavização leve tolera pequenos desalinhamentos (rotação, recorte do YOLO)
+    vetor = cv2.GaussianBlur(cv2.resize(texto, TAMANHO_MODELO, interpolation=cv2.INTER_AREA), (0, 0), 0.8).ravel()
+    vetor -= vetor.mean()
+    norma = np.linalg.norm(vetor)
+    if norma == 0:
+        return None
+    return vetor / norma
+
+
+def _adicionar_modelo(vetor, dia):
+    """Mantém os MODELOS_POR_DIA mais recentes do dia (chamar com _MODELOS_LOCK)"""
+    global _MODELOS_ALTERADOS
+    modelos = _MODELOS_DIA[dia]
+    modelos.append(vetor)
+    del modelos[:-MODELOS_POR_DIA]
+    _MODELOS_ALTERADOS = True
+
+
+def registrar_modelo_dia(image, dia):
+    """Adiciona a região como modelo do dia, sem conferência (dia conhecido, ex.: gabarito do benchmark)"""
+    vetor = extrair_caracteristicas_dia(image)
+    if vetor is None or dia not in _MODELOS_DIA:
+        return False
+    with _MODELOS_LOCK:
+        _adicionar_modelo(vetor, dia)
+    if MODELOS_DIA_PATH:
+        salvar_modelos_dia(MODELOS_DIA_PATH)
+    return True
+
+
+def _registrar_leitura_tesseract(vetor, dia):
+    """
+    Leitura inequívoca do Tesseract vira modelo só se o classificador concorda: o modelo
+    mais parecido é do mesmo dia (mesmo abaixo do limiar). Sem modelos dos dois dias, a
+    leitura aguarda até LEITURAS_CONCORDANTES leituras do mesmo dia e entra a que mais se
+    parece com as demais, então uma leitura errada isolada não vira modelo.
+
+    Returns:
+        bool: True se um modelo foi adicionado
+    """
+    if vetor is None or dia not in _MODELOS_DIA:
+        return False
+    with _MODELOS_LOCK:
+        dia_classificador, _, _ = _comparar_com_modelos(vetor)
+        if dia_classificador is not None:
+            if dia_classificador != dia:
+                return False
+            _adicionar_modelo(vetor, dia)
+        else:
+            candidatos = _CANDIDATOS_DIA[dia]
+            candidatos.append(vetor)
+            if len(candidatos) < LEITURAS_CONCORDANTES:
+                return False
+            matriz = np.array(candidatos)
+            _adicionar_modelo(candidatos[int(np.argmax((matriz @ matriz.T).sum(axis=1)))], dia)
+            candidatos.clear()
+    if MODELOS_DIA_PATH:
+        salvar_modelos_dia(MODELOS_DIA_PATH)
+    return True
+
+
+def _descartar_modelos_divergentes(vetor, dia):
+    """
+    A conferência leu `dia` onde o classificador respondeu o outro dia: descarta os modelos
+    do outro dia mais parecidos com a região do que o melhor modelo de `dia`.
+
+    Returns:
+        int: Modelos descartados
+    """
+    global _MODELOS_ALTERADOS
+    outro = 2 if dia == 1 else 1
+    with _MODELOS_LOCK:
+        referencia = max((float(m @ vetor) for m in _MODELOS_DIA[dia]), default=float('-inf'))
+        mantidos = [m for m in _MODELOS_DIA[outro] if float(m @ vetor) < referencia]
+        descartados = len(_MODELOS_DIA[outro]) - len(mantidos)
+        if descartados:
+            _MODELOS_DIA[outro] = mantidos
+            _MODELOS_ALTERADOS = True
+        _ESTATISTICAS['divergencias'] += 1
+        _ESTATISTICAS['modelos_descartados'] += descartados
+    if descartados:
+        print(f"[OCR] Conferência leu dia {dia}; {descartados} modelo(s) do dia {outro} descartado(s)", file=sys.stderr)
+        if MODELOS_DIA_PATH:
+            salvar_modelos_dia(MODELOS_DIA_PATH)
+    return descartados
+
+
+def salvar_modelos_dia(caminho, forcar=False):
+    """
+    Grava os modelos em .npz se mudaram desde a última gravação, no máximo uma vez a
+    cada INTERVALO_SALVAR_MODELOS_S (forcar=True ignora o intervalo). O arquivo é
+    escrito ao lado do destino e trocado com os.replace, então outro processo ou uma
+    queda no meio da escrita nunca deixam um .npz pela metade.
+
+    Returns:
+        bool: True se o arquivo foi gravado
+    """
+    global _MODELOS_ALTERADOS, _ULTIMO_SALVAMENTO
+    with _MODELOS_LOCK:
+        if not _MODELOS_ALTERADOS:
+            return False
+        if not forcar and time.monotonic() - _ULTIMO_SALVAMENTO < INTERVALO_SALVAR_MODELOS_S:
+            return False
+        tamanho = TAMANHO_MODELO[0] * TAMANHO_MODELO[1]
+        dados = {f"dia{d}": np.array(m, dtype=np.float32).reshape(-1, tamanho) for d, m in _MODELOS_DIA.items()}
+        _MODELOS_ALTERADOS = False
+        _ULTIMO_SALVAMENTO = time.monotonic()
+
+    # A escrita fica fora do lock: as requisições não esperam pelo disco
+    temporario = None
+    try:
+        fd, temporario = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(caminho)),
+                                          prefix='.modelos_dia_', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+        return True
+    except OSError as e:
+        print(f"[OCR] Não foi possível salvar modelos do dia: {e}", file=sys.stderr)
+        if temporario and os.path.exists(temporario):
+            os.unlink(temporario)
+        with _MODELOS_LOCK:
+            _MODELOS_ALTERADOS = True
+        return False
+
+
+def carregar_modelos_dia(caminho):
+    """Carrega modelos salvos por registrar_modelo_dia (arquivo .npz com dia1 e dia2)"""
+    with np.load(caminho) as dados:
+        with _MODELOS_LOCK:
+            for dia in _MODELOS_DIA:
+                chave = f"dia{dia}"
+                if chave in dados and dados[chave].shape[1:] == (TAMANHO_MODELO[0] * TAMANHO_MODELO[1],):
+                    _MODELOS_DIA[dia] = list(dados[chave])[-MODELOS_POR_DIA:]
+
+
+def classificar_dia_rapido(image):
+    """
+    Classifica a região pelo modelo mais parecido de cada dia.
+    
+    "1º DIA" e "2º DIA" diferem só no dígito, então a correlação com os dois dias é
+    sempre alta; a confiança é a diferença entre elas dividida pela que haveria se a
+    região fosse exatamente o modelo mais parecido (1 - correlação entre os dois modelos).
+    
+    Returns:
+        tuple: (dia: int ou None, confianca: float) — dia None se ainda não há modelos
+               dos dois dias ou se a confiança fica abaixo de LIMIAR_CLASSIFICADOR
+    """
+    vetor = extrair_caracteristicas_dia(image)
+    if vetor is None:
+        return None, 0.0
+    return _classificar_vetor(vetor)
+
+
+def _classificar_vetor(vetor):
+    with _MODELOS_LOCK:
+        dia, confianca, similaridade = _comparar_com_modelos(vetor)
+    if dia is None or similaridade < SIMILARIDADE_MINIMA or confianca < LIMIAR_CLASSIFICADOR:
+        return None, confianca
+    return dia, confianca
+
+
+def _comparar_com_modelos(vetor):
+    """
+    Dia do modelo mais parecido, sem limiares (chamar com _MODELOS_LOCK)
+
+    Returns:
+        tuple: (dia ou None sem modelos dos dois dias, confianca, similaridade do mais parecido)
+    """
+    if not all(_MODELOS_DIA.values()):
+        return None, 0.0, 0.0
+    mais_parecidos = {}
+    for dia, modelos in _MODELOS_DIA.items():
+        similaridades = np.array(modelos) @ vetor
+        indice = int(np.argmax(similaridades))
+        mais_parecidos[dia] = (float(similaridades[indice]), modelos[indice])
+    
+    (sim_1, modelo_1), (sim_2, modelo_2) = mais_parecidos[1], mais_parecidos[2]
+    dia = 1 if sim_1 >= sim_2 else 2
+    distancia = max(1.0 - float(modelo_1 @ modelo_2), 1e-6)
+    confianca = round(min(abs(sim_1 - sim_2) / distancia, 1.0), 3)
+    return dia, confianca, max(sim_1, sim_2)
+
+
+def get_estatisticas_classificador():
+    """
+    Quantas detecções foram resolvidas pelo classificador rápido e quantas foram ao
+    Tesseract, e quantas respostas rápidas a conferência por amostragem contestou
+    """
+    with _MODELOS_LOCK:
+        estatisticas = dict(_ESTATISTICAS)
+        estatisticas['modelos'] = {dia: len(modelos) for dia, modelos in _MODELOS_DIA.items()}
+    estatisticas['taxa_classificador'] = round(estatisticas['classificador'] / estatisticas['consultas'], 3) if estatisticas['consultas'] else None
+    return estatisticas
+
+
+if MODELOS_DIA_PATH and os.path.exists(MODELOS_DIA_PATH):
+    try:
+        carregar_modelos_dia(MODELOS_DIA_PATH)
+    except Exception as e:
+        print(f"[OCR] Não foi possível carregar modelos do dia ({MODELOS_DIA_PATH}): {e}", file=sys.stderr)
+
+if MODELOS_DIA_PATH:
+    # Modelos aprendidos desde a última gravação (intervalo ainda não vencido)
+    atexit.register(salvar_modelos_dia, MODELOS_DIA_PATH, forcar=True)
+
 def preprocess_day_region(image):
     """
     Pré-processa imagem da day_region para melhorar OCR
@@ -119,30 +477,40 @@ def detect_day_from_text(text):
     return None, 0.0
 
 
-def detect_day_from_image(image_path_or_array, bbox=None):
+def _resultado_dia(dia, confianca, texto, metodo):
+    """Resultado de sucesso com o intervalo de questões do dia"""
+    return {
+        'sucesso': True,
+        'dia': dia,
+        'confianca': confianca,
+        'texto_extraido': texto,
+        'questao_inicial': 1 if dia == 1 else 91,
+        'questao_final': 90 if dia == 1 else 180,
+        'metodo': metodo
+    }
+
+
+def detect_day_from_image(image_path_or_array, bbox=None, classificador=None):
     """
     Detecta o dia da prova ENEM a partir de uma imagem
     
     Args:
         image_path_or_array: Caminho da imagem ou numpy array
         bbox: Bounding box [x, y, w, h] se quiser recortar (opcional)
+        classificador: Tentar o classificador rápido antes do Tesseract (padrão: OCR_CLASSIFICADOR_RAPIDO)
         
     Returns:
-        dict: {sucesso, dia, confianca, texto_extraido, erro}
+        dict: {sucesso, dia, confianca, texto_extraido, metodo ('classificador' ou 'tesseract'), erro}
     """
+    if classificador is None:
+        classificador = CLASSIFICADOR_RAPIDO
     try:
         # Carregar imagem
         if isinstance(image_path_or_array, str):
-            # É caminho de arquivo
-            img = cv2.imread(image_path_or_array)
-            if img is None:
-                # Tentar com encoding especial
-                with open(image_path_or_array, 'rb') as f:
-                    dados = bytearray(f.read())
-                nparr = np.asarray(dados, dtype=np.uint8)
-                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            if img is None:
+            # É caminho de arquivo (caracteres especiais e orientação EXIF tratados no contexto)
+            try:
+                img = ContextoImagem.de_arquivo(image_path_or_array).bgr
+            except (OSError, ValueError):
                 raise ValueError(f"Não foi possível carregar a imagem: {image_path_or_array}")
         else:
             # É numpy array
@@ -153,49 +521,59 @@ def detect_day_from_image(image_path_or_array, bbox=None):
             x, y, w, h = bbox
             img = img[y:y+h, x:x+w]
         
+        vetor = None
+        resultado_rapido = None
+        if classificador:
+            vetor = extrair_caracteristicas_dia(img)
+            dia, confianca = _classificar_vetor(vetor) if vetor is not None else (None, 0.0)
+            conferir = False
+            with _MODELOS_LOCK:
+                _ESTATISTICAS['consultas'] += 1
+                if dia is not None:
+                    _ESTATISTICAS['classificador'] += 1
+                    # Amostra das respostas rápidas também passa pelo Tesseract
+                    conferir = VERIFICACAO_AMOSTRA > 0 and _ESTATISTICAS['classificador'] % VERIFICACAO_AMOSTRA == 0
+                    if conferir:
+                        _ESTATISTICAS['verificacoes'] += 1
+                else:
+                    _ESTATISTICAS['tesseract'] += 1
+            if dia is not None:
+                resultado_rapido = _resultado_dia(dia, confianca, '', 'classificador')
+                if not conferir:
+                    return resultado_rapido
+        
         # Pré-processar (retorna PIL Image)
         pil_img = preprocess_day_region(img)
         
-        # Executar OCR com Tesseract
-        # --psm 7: Treat the image as a single text line.
-        # -l por: Português
-        custom_config = r'--oem 3 --psm 7'
-        try:
-            texto_completo = pytesseract.image_to_string(pil_img, lang='por', config=custom_config)
-        except pytesseract.TesseractError:
-            # Fallback sem linguagem se 'por' não estiver instalado
-            texto_completo = pytesseract.image_to_string(pil_img, config=custom_config)
-        
-        texto_completo = texto_completo.strip()
+        # Executar OCR com Tesseract (motor carregado uma vez por processo)
+        texto_completo = load_ocr_engine().reconhecer(pil_img).strip()
         
         # Detectar dia a partir do texto
         dia, confianca = detect_day_from_text(texto_completo)
         
         if dia is None:
+            # Conferência sem leitura: fica a resposta do classificador
+            if resultado_rapido is not None:
+                return resultado_rapido
             return {
                 'sucesso': False,
                 'dia': None,
                 'confianca': 0.0,
                 'texto_extraido': texto_completo,
+                'metodo': 'tesseract',
                 'erro': 'Não foi possível identificar o dia da prova no texto extraído'
             }
         
-        # Mapear para intervalo de questões
-        if dia == 1:
-            questao_inicial = 1
-            questao_final = 90
-        else:  # dia == 2
-            questao_inicial = 91
-            questao_final = 180
+        # Só leituras por padrão explícito ("1º DIA", "DIA 2"...) contestam o classificador
+        # ou viram modelo dele
+        if classificador and confianca >= 0.9:
+            if resultado_rapido is not None and resultado_rapido['dia'] != dia:
+                _descartar_modelos_divergentes(vetor, dia)
+            _registrar_leitura_tesseract(vetor, dia)
+        elif resultado_rapido is not None:
+            return resultado_rapido
         
-        return {
-            'sucesso': True,
-            'dia': dia,
-            'confianca': confianca,
-            'texto_extraido': texto_completo,
-            'questao_inicial': questao_inicial,
-            'questao_final': questao_final
-        }
+        return _resultado_dia(dia, confianca, texto_completo, 'tesseract')
         
     except Exception as e:
         return {
@@ -220,14 +598,9 @@ def detect_day_from_roi_coords(image_path, roi_coords):
     """
     try:
         # Carregar imagem completa
-        img = cv2.imread(image_path)
-        if img is None:
-            with open(image_path, 'rb') as f:
-                dados = bytearray(f.read())
-            nparr = np.asarray(dados, dtype=np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
+        try:
+            img = ContextoImagem.de_arquivo(image_path).bgr
+        except (OSError, ValueError):
             raise ValueError(f"Não foi possível carregar a imagem: {image_path}")
         
         # Recortar day_region
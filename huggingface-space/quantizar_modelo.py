@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Quantização estática INT8 do detector YOLO
+Gera best_yolo11s_int8.onnx a partir do modelo FP32, calibrando as ativações
+com fotos reais de folhas (mesmo letterbox usado em produção).
+
+Uso: python quantizar_modelo.py <pasta_calibracao> [modelo_saida] [max_imagens]
+
+Requer onnxruntime (o modelo INT8 em formato QDQ deve ser servido com
+YOLO_BACKEND=onnxruntime e YOLO_MODEL=int8).
+"""
+
+import sys
+import json
+import os
+from pathlib import Path
+
+from onnxruntime.quantization import (
+    CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from detector_yolo_enem import MODEL_VARIANTS, INPUT_SIZE, load_image_robust, preprocess_numpy_image
+
+EXTENSOES_IMAGEM = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def listar_imagens(pasta, max_imagens=None):
+    imagens = sorted(p for p in Path(pasta).iterdir() if p.suffix.lower() in EXTENSOES_IMAGEM)
+    return imagens[:max_imagens] if max_imagens else imagens
+
+
+class LeitorCalibracao(CalibrationDataReader):
+    """Entrega ao calibrador um blob NCHW por imagem, pré-processado como em produção"""
+
+    def __init__(self, caminhos, input_name):
+        self.caminhos = list(caminhos)
+        self.input_name = input_name
+        self._iter = iter(self.caminhos)
+
+    def get_next(self):
+        for caminho in self._iter:
+            try:
+                _, blob, _, _ = preprocess_numpy_image(load_image_robust(str(caminho), lado_maximo=max(INPUT_SIZE)))
+                return {self.input_name: blob}
+            except Exception as e:
+                print(f"[QUANTIZAR] Ignorando {caminho}: {e}", file=sys.stderr)
+        return None
+
+    def rewind(self):
+        self._iter = iter(self.caminhos)
+
+
+def quantizar(pasta_calibracao, modelo_saida=None, max_imagens=200):
+    """
+    Quantiza o modelo FP32 para INT8 (pesos por canal, ativações uint8, formato QDQ).
+
+    Args:
+        pasta_calibracao: Pasta com fotos de folhas para calibrar as ativações
+        modelo_saida: Caminho do modelo INT8 (padrão: variante "int8" do detector)
+        max_imagens: Limite de imagens de calibração
+
+    Returns:
+        dict: {sucesso, modelo_saida, imagens_calibracao, tamanho_fp32_mb, tamanho_int8_mb}
+    """
+    import onnxruntime as ort
+
+    modelo_fp32 = MODEL_VARIANTS['fp32']
+    modelo_saida = Path(modelo_saida or MODEL_VARIANTS['int8'])
+    caminhos = listar_imagens(pasta_calibracao, max_imagens)
+    if not caminhos:
+        raise ValueError(f"Nenhuma imagem de calibração em: {pasta_calibracao}")
+
+    # Pré-processamento recomendado (inferência de shapes + fusões) antes de quantizar
+    modelo_preparado = modelo_saida.with_suffix('.prep.onnx')
+    # (shapes do YOLO exportado são estáticos; a inferência simbólica exigiria sympy)
+    quant_pre_process(str(modelo_fp32), str(modelo_preparado), skip_symbolic_shape=True)
+
+    input_name = ort.InferenceSession(str(modelo_preparado), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    try:
+        quantize_static(
+            str(modelo_preparado),
+            str(modelo_saida),
+            LeitorCalibracao(caminhos, input_name),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax
+        )
+    finally:
+        if modelo_preparado.exists():
+            os.remove(modelo_preparado)
+
+    return {
+        'sucesso': True,
+        'modelo_saida': str(modelo_saida),
+        'imagens_calibracao': len(caminhos),
+        'tamanho_fp32_mb': round(modelo_fp32.stat().st_size / 1e6, 2),
+        'tamanho_int8_mb': round(modelo_saida.stat().st_size / 1e6, 2)
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(json.dumps({
+            'sucesso': False,
+            'erro': 'Uso: python quantizar_modelo.py <pasta_calibracao> [modelo_saida] [max_imagens]'
+        }))
+        sys.exit(1)
+
+    pasta = sys.argv[1]
+    saida = sys.argv[2] if len(sys.argv) > 2 else None
+    limite = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    try:
+        resultado = quantizar(pasta, saida, limite)
+    except Exception as e:
+        resultado = {'sucesso': False, 'erro': str(e)}
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
@@ -6,12 +6,16 @@ set -e
 
 # Atualizar e instalar Tesseract
 echo "Instalando dependências do sistema..."
-apt-get update && apt-get install -y tesseract-ocr tesseract-ocr-por libgl1
+apt-get update && apt-get install -y tesseract-ocr tesseract-ocr-por libtesseract-dev libleptonica-dev pkg-config libgl1
 
 # Instalar dependências Python
 echo "Instalando dependências Python..."
 pip install -r backend/scripts/requirements.txt
 
+# tesserocr é opcional (compilação nativa): se falhar, o OCR usa pytesseract
+echo "Instalando tesserocr (opcional)..."
+pip install -r backend/scripts/requirements-ocr.txt || echo "tesserocr não instalado; o OCR do dia usará pytesseract"
+
 # Build do Node.js (se necessário)
 echo "Instalando dependências Node.js..."
 npm install
@@ -185,6 +185,7 @@ app.use(errorHandler);
 // =============================================
 const { createSchema } = require('./backend/migrations/create_schema');
 const db = require('./backend/db');
+const { encerrarWorkers } = require('./backend/utils/pythonWorkerPool');
 
 // Função para verificar se as tabelas já existem
 async function verificarTabelasExistem() {
@@ -218,9 +219,23 @@ async function inicializarBanco() {
   }
 }
 
+// Encerramento (SIGTERM do Render/Docker, Ctrl+C): para de aceitar conexões e
+// finaliza os workers Python do OMR, que senão ficariam órfãos
+let servidor = null;
+function encerrarServidor(sinal) {
+  console.log(`\n🛑 ${sinal} recebido, encerrando servidor...`);
+  encerrarWorkers();
+  if (!servidor) process.exit(0);
+  servidor.close(() => process.exit(0));
+  // Conexões keep-alive podem segurar o close; não esperar indefinidamente
+  setTimeout(() => process.exit(0), 10000).unref();
+}
+process.once('SIGTERM', () => encerrarServidor('SIGTERM'));
+process.once('SIGINT', () => encerrarServidor('SIGINT'));
+
 // Inicializar banco e depois iniciar servidor
 inicializarBanco().then(() => {
-  app.listen(PORT, () => {
+  servidor = app.listen(PORT, () => {
     console.log(`
   ============================================
   ✅ Servidor rodando em: http://localhost:${PORT}